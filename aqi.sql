@@ -2,15 +2,109 @@ USE freedb_aqi_data;
 
 CREATE TABLE history_aqi (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    date DATE NOT NULL UNIQUE,
+    date DATE NOT NULL,
     city VARCHAR(100) NOT NULL,
     AQI INT,
     `PM2.5` DECIMAL(5,1),
     PM10 DECIMAL(5,1),
-    NO2 DECIMAL(5,1)
+    NO2 DECIMAL(5,1),
+    -- The background poller records one row per city per day
+    UNIQUE KEY uq_history_date_city (date, city),
+    -- Serves /history-aqi city filters in date order (keyset pagination on date, id)
+    KEY idx_history_city_date (city, date, id),
+    -- Serves unfiltered and date-range pages in the same order, without a sort
+    KEY idx_history_date_id (date, id)
 );
 
-select *from history_aqi;
+-- Hourly readings per station (UTC), all six pollutants plus us_aqi: the US EPA
+-- AQI (0-500) computed from them, not OpenWeather's 1-5 index in history_aqi.AQI.
+-- inserted_at lets the compaction job (python timeseries.py compact) find new rows.
+CREATE TABLE aqi_readings (
+    station     VARCHAR(100) NOT NULL,
+    ts          DATETIME NOT NULL,
+    us_aqi      FLOAT,
+    `PM2.5`     FLOAT,
+    PM10        FLOAT,
+    NO2         FLOAT,
+    SO2         FLOAT,
+    CO          FLOAT,
+    Ozone       FLOAT,
+    inserted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (station, ts),
+    KEY idx_readings_inserted (inserted_at)
+);
+
+-- Per-station daily mean/max/p95 of every metric, rebuilt by compaction
+CREATE TABLE aqi_rollup_daily (
+    station        VARCHAR(100) NOT NULL,
+    bucket         DATE NOT NULL,
+    n              INT NOT NULL,
+    `us_aqi_mean`   FLOAT,
+    `us_aqi_max`    FLOAT,
+    `us_aqi_p95`    FLOAT,
+    `PM2.5_mean`   FLOAT,
+    `PM2.5_max`    FLOAT,
+    `PM2.5_p95`    FLOAT,
+    `PM10_mean`    FLOAT,
+    `PM10_max`     FLOAT,
+    `PM10_p95`     FLOAT,
+    `NO2_mean`     FLOAT,
+    `NO2_max`      FLOAT,
+    `NO2_p95`      FLOAT,
+    `SO2_mean`     FLOAT,
+    `SO2_max`      FLOAT,
+    `SO2_p95`      FLOAT,
+    `CO_mean`      FLOAT,
+    `CO_max`       FLOAT,
+    `CO_p95`       FLOAT,
+    `Ozone_mean`   FLOAT,
+    `Ozone_max`    FLOAT,
+    `Ozone_p95`    FLOAT,
+    PRIMARY KEY (station, bucket)
+);
+
+-- Same per calendar month (bucket = first day of the month)
+CREATE TABLE aqi_rollup_monthly (
+    station        VARCHAR(100) NOT NULL,
+    bucket         DATE NOT NULL,
+    n              INT NOT NULL,
+    `us_aqi_mean`   FLOAT,
+    `us_aqi_max`    FLOAT,
+    `us_aqi_p95`    FLOAT,
+    `PM2.5_mean`   FLOAT,
+    `PM2.5_max`    FLOAT,
+    `PM2.5_p95`    FLOAT,
+    `PM10_mean`    FLOAT,
+    `PM10_max`     FLOAT,
+    `PM10_p95`     FLOAT,
+    `NO2_mean`     FLOAT,
+    `NO2_max`      FLOAT,
+    `NO2_p95`      FLOAT,
+    `SO2_mean`     FLOAT,
+    `SO2_max`      FLOAT,
+    `SO2_p95`      FLOAT,
+    `CO_mean`      FLOAT,
+    `CO_max`       FLOAT,
+    `CO_p95`       FLOAT,
+    `Ozone_mean`   FLOAT,
+    `Ozone_max`    FLOAT,
+    `Ozone_p95`    FLOAT,
+    PRIMARY KEY (station, bucket)
+);
+
+CREATE TABLE aqi_rollup_state (
+    name      VARCHAR(50) PRIMARY KEY,
+    watermark TIMESTAMP NULL
+);
+
+-- Locations visitors asked about; every gunicorn worker records them here and
+-- the worker running the poller adds them to its cycles
+CREATE TABLE stations (
+    city     VARCHAR(100) PRIMARY KEY,
+    lat      DOUBLE NOT NULL,
+    lon      DOUBLE NOT NULL,
+    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
 
 CREATE TABLE subscriptions (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -18,30 +112,29 @@ CREATE TABLE subscriptions (
     email VARCHAR(100),
     phone VARCHAR(20),
     subscription_type ENUM('email', 'sms'),
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    city VARCHAR(100) NOT NULL,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY (email),
+    UNIQUE KEY (phone)
 );
 
-ALTER TABLE subscriptions
-  ADD UNIQUE(email),
-  ADD UNIQUE(phone);
-
-ALTER TABLE subscriptions
-  ADD COLUMN city VARCHAR(100) NOT NULL AFTER subscription_type;
-  
-select * from subscriptions;
-
 CREATE TABLE notifications (
   id            INT AUTO_INCREMENT PRIMARY KEY,
   subscription_id  INT NOT NULL,                 -- FK to subscriptions.id
   channel       ENUM('sms','email') NOT NULL,
   recipient     VARCHAR(255) NOT NULL,
+  subject       VARCHAR(255),                    -- kept so rows left 'queued' can be resent
   payload       TEXT NOT NULL,                   -- the message body
   provider_id   VARCHAR(255),                    -- e.g. Twilio Message SID or SendGrid ID
   status        ENUM('queued','sent','delivered','failed') DEFAULT 'queued',
   error_message TEXT,
   created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   updated_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-  FOREIGN KEY (subscription_id) REFERENCES subscriptions(id)
+  FOREIGN KEY (subscription_id) REFERENCES subscriptions(id),
+  -- The dispatcher matches status updates by Message-ID (stored in provider_id)
+  KEY idx_notifications_provider (provider_id),
+  -- Finds rows left 'queued' to resend
+  KEY idx_notifications_status_updated (status, updated_at)
 );
 
 -- All attempted sends, newest first
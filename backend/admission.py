@@ -0,0 +1,121 @@
+"""Admission control for /predict: bounded in-flight requests and deadline-aware degrading.
+
+Each worker admits at most ``max_in_flight`` prediction requests; the next one
+is shed with ``Overloaded`` (a 503) instead of queueing behind the others.
+An admitted request then asks ``plan()`` whether the full XGBoost+LSTM
+ensemble fits its deadline. The estimate is the recent ensemble pass time
+times the passes needed for the rows already on the full path
+(``max_batch`` rows per pass, ``concurrency`` passes at once) plus this
+request's own. Requests that would miss their deadline, or that arrive while
+``max_lstm_rows`` rows are already on the full path, get the XGBoost-only
+result instead. Degraded requests never join the full path, so the backlog
+drains and the estimate falls back under budget on its own.
+"""
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+
+class Overloaded(RuntimeError):
+    """Raised when a worker already holds its maximum of in-flight predictions."""
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight=0, budget=0.25, max_lstm_rows=0, degrade=True,
+                 max_batch=1, concurrency=1, smoothing=0.2):
+        self.max_in_flight = max_in_flight  # 0: unbounded
+        self.budget = budget                # default latency budget in seconds; 0: no deadline
+        self.max_lstm_rows = max_lstm_rows  # 0: unbounded
+        self.degrade = degrade              # False: always run the full ensemble
+        self.max_batch = max(1, max_batch)
+        self.concurrency = max(1, concurrency)
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._lstm_rows = 0
+        self._pass_seconds = None  # EWMA of one full ensemble pass
+        self._stats = dict(admitted=0, shed=0, full=0, degraded=0, degraded_deadline=0,
+                           degraded_saturated=0, in_flight_max=0)
+
+    @contextmanager
+    def admit(self):
+        """Hold one in-flight slot for the block; raises Overloaded when none is free."""
+        with self._lock:
+            if self.max_in_flight and self._in_flight >= self.max_in_flight:
+                self._stats["shed"] += 1
+                raise Overloaded(f"Server overloaded: {self._in_flight} predictions in flight")
+            self._in_flight += 1
+            self._stats["admitted"] += 1
+            self._stats["in_flight_max"] = max(self._stats["in_flight_max"], self._in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def estimate(self, n_rows):
+        """Expected seconds until ``n_rows`` more rows get through the full ensemble."""
+        with self._lock:
+            return self._estimate(n_rows)
+
+    def _estimate(self, n_rows):
+        if self._pass_seconds is None:
+            return 0.0
+        # Rows already on the full path go first; a running pass takes no new rows.
+        ahead = math.ceil(self._lstm_rows / self.max_batch)
+        own = math.ceil(n_rows / self.max_batch)
+        return (math.ceil(ahead / self.concurrency) + own) * self._pass_seconds
+
+    def plan(self, n_rows, deadline=None):
+        """True to run ``n_rows`` through the full ensemble, False for XGBoost only.
+
+        ``deadline`` is a ``time.perf_counter()`` value. A True answer reserves
+        the rows on the full path until ``release(n_rows)``.
+        """
+        with self._lock:
+            if self.degrade:
+                reason = None
+                if self.max_lstm_rows and self._lstm_rows >= self.max_lstm_rows:
+                    reason = "degraded_saturated"
+                elif deadline is not None and time.perf_counter() + self._estimate(n_rows) > deadline:
+                    reason = "degraded_deadline"
+                if reason is not None:
+                    self._stats["degraded"] += 1
+                    self._stats[reason] += 1
+                    return False
+            self._lstm_rows += n_rows
+            self._stats["full"] += 1
+            return True
+
+    def release(self, n_rows):
+        with self._lock:
+            self._lstm_rows -= n_rows
+
+    def observe_pass(self, seconds):
+        """Feed the duration of one full ensemble pass into the estimate."""
+        with self._lock:
+            if self._pass_seconds is None:
+                self._pass_seconds = seconds
+            else:
+                self._pass_seconds += self.smoothing * (seconds - self._pass_seconds)
+
+    def deadline(self, started, budget=None):
+        """perf_counter deadline for a request that started at ``started``, or None.
+
+        A requested ``budget`` (seconds, e.g. from a client header) can only
+        tighten the configured one: it is clamped to (0, self.budget], and a
+        non-finite or non-positive value is ignored.
+        """
+        if budget is None or not math.isfinite(budget) or budget <= 0:
+            budget = self.budget
+        elif self.budget > 0:
+            budget = min(budget, self.budget)
+        return started + budget if budget > 0 else None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=self._in_flight, lstm_rows=self._lstm_rows,
+                        max_in_flight=self.max_in_flight, budget_ms=self.budget * 1000,
+                        max_lstm_rows=self.max_lstm_rows, degrade_enabled=self.degrade,
+                        pass_ms=self._pass_seconds * 1000 if self._pass_seconds is not None else None)
@@ -0,0 +1,119 @@
+"""Server-side pollutant threshold alerts with hysteresis and cooldown.
+
+State is kept per (city, pollutant) in arrays: whether the pollutant is above
+its threshold and when it last alerted. ``evaluate`` checks a whole poll cycle
+in one vectorized pass. An alert fires when a value crosses above its threshold
+while not already active and the cooldown since that pair's last alert has
+passed. It stays active (no repeat alerts) until the value drops below
+``threshold * clear_ratio``, so readings hovering around the threshold do not
+flap. A crossing inside the cooldown is recorded but not sent.
+"""
+import time
+import threading
+
+import numpy as np
+
+# OpenWeather component names; units are ug/m3 as in the dashboard defaults.
+DEFAULT_THRESHOLDS = {"pm2_5": 40.0, "pm10": 70.0, "no2": 20.0, "so2": 35.0, "co": 1000.0, "o3": 100.0}
+
+
+def parse_thresholds(spec):
+    """Parse "pm2_5:40,pm10:70" into {pollutant: threshold}; empty means the defaults."""
+    thresholds = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        try:
+            name, value = item.rsplit(":", 1)
+            thresholds[name.strip()] = float(value)
+        except ValueError:
+            raise ValueError(f"Bad threshold {item!r}; expected pollutant:value")
+    return thresholds or dict(DEFAULT_THRESHOLDS)
+
+
+class AlertEngine:
+    def __init__(self, thresholds=DEFAULT_THRESHOLDS, clear_ratio=0.9, cooldown=3600.0, on_alert=None,
+                 capacity=256):
+        self.pollutants = list(thresholds)
+        self.thresholds = np.array([thresholds[p] for p in self.pollutants], dtype=float)
+        self.clear_levels = self.thresholds * clear_ratio
+        self.cooldown = cooldown
+        self.on_alert = on_alert  # called with the list of events from each evaluate()
+        self._lock = threading.Lock()
+        self._index = {}  # city -> row
+        self._cities = []
+        self._active = np.zeros((capacity, len(self.pollutants)), dtype=bool)
+        self._last_alert = np.full((capacity, len(self.pollutants)), -np.inf)
+        self._stats = dict(cycles=0, rows_evaluated=0, alerts=0, suppressed_cooldown=0, cleared=0,
+                           last_eval_ms=None, total_eval_ms=0.0)
+
+    def _rows(self, cities):
+        rows = np.empty(len(cities), dtype=np.int64)
+        for i, city in enumerate(cities):
+            row = self._index.get(city)
+            if row is None:
+                row = self._index[city] = len(self._cities)
+                self._cities.append(city)
+            rows[i] = row
+        if len(self._cities) > len(self._active):
+            grow = max(len(self._cities), 2 * len(self._active)) - len(self._active)
+            self._active = np.vstack([self._active, np.zeros((grow, len(self.pollutants)), dtype=bool)])
+            self._last_alert = np.vstack([self._last_alert, np.full((grow, len(self.pollutants)), -np.inf)])
+        return rows
+
+    def values_from(self, readings):
+        """(cities, (N, pollutants) values) from poller readings; missing components are NaN."""
+        cities = [r["city"] for r in readings]
+        values = np.array([[r["components"].get(p, np.nan) for p in self.pollutants] for r in readings],
+                          dtype=float).reshape(len(readings), len(self.pollutants))
+        return cities, values
+
+    def evaluate(self, cities, values, now=None):
+        """Check one reading per city; returns the alert events fired.
+
+        ``cities`` must be unique within a call. NaN values leave a pair's state
+        unchanged.
+        """
+        now = time.time() if now is None else now
+        t0 = time.perf_counter()
+        values = np.asarray(values, dtype=float)
+        with self._lock:
+            rows = self._rows(cities)
+            active = self._active[rows]
+            over = values > self.thresholds
+            crossed = over & ~active
+            fire = crossed & (now - self._last_alert[rows] >= self.cooldown)
+            cleared = active & (values < self.clear_levels)
+            self._active[rows] = (active | over) & ~cleared
+            hit_rows, hit_cols = np.nonzero(fire)
+            self._last_alert[rows[hit_rows], hit_cols] = now
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            s = self._stats
+            s["cycles"] += 1
+            s["rows_evaluated"] += len(rows)
+            s["alerts"] += len(hit_rows)
+            s["suppressed_cooldown"] += int(crossed.sum()) - len(hit_rows)
+            s["cleared"] += int(cleared.sum())
+            s["last_eval_ms"] = elapsed_ms
+            s["total_eval_ms"] += elapsed_ms
+        events = [dict(city=cities[r], pollutant=self.pollutants[c], value=float(values[r, c]),
+                       threshold=float(self.thresholds[c]), date=now)
+                  for r, c in zip(hit_rows.tolist(), hit_cols.tolist())]
+        if events and self.on_alert is not None:
+            self.on_alert(events)
+        return events
+
+    def active(self, city):
+        """Pollutants currently above threshold for ``city``."""
+        with self._lock:
+            row = self._index.get(city)
+            if row is None:
+                return []
+            return [p for p, on in zip(self.pollutants, self._active[row]) if on]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, cities=len(self._cities), pollutants=self.pollutants,
+                         active=int(self._active.sum()), cooldown_seconds=self.cooldown)
+        stats["mean_eval_ms"] = stats["total_eval_ms"] / stats["cycles"] if stats["cycles"] else None
+        return stats
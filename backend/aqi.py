@@ -0,0 +1,97 @@
+"""AQI from pollutant concentrations, vectorized over rows.
+
+Breakpoint tables are compiled once into per-pollutant segment arrays. Each
+concentration is mapped to its segment with ``np.searchsorted`` and linearly
+interpolated, so an (N, 6) matrix of concentrations is scored in one pass.
+Values above a pollutant's last breakpoint (or NaN) cap at that table's top AQI.
+"""
+import numpy as np
+
+POLLUTANTS = ["PM2.5", "PM10", "NO2", "SO2", "CO", "Ozone"]
+
+# Concentration breakpoints and the AQI at each; the final AQI entry is the cap.
+BREAKPOINTS = {
+    "PM2.5": ([0.0,12.1,35.5,55.5,150.5,250.5,350.5],[0,50,100,150,200,300,400,500]),
+    "PM10":  ([0,55,155,255,355,425,505],[0,50,100,150,200,300,400,500]),
+    "NO2":   ([0,54,101,361,650,1250,1650],[0,50,100,150,200,300,400,500]),
+    "SO2":   ([0,36,76,186,305,605,805],[0,50,100,150,200,300,400,500]),
+    "CO":    ([0,4.5,9.5,12.5,15.5,30.5,40.5],[0,50,100,150,200,300,400,500]),
+    "Ozone": ([0,55,71,86,106,201],[0,50,100,150,200,300,500])
+}
+
+
+class _Table:
+    def __init__(self, conc, aqi):
+        conc = np.asarray(conc, dtype=np.float64)
+        aqi = np.asarray(aqi, dtype=np.float64)
+        n_segments = len(conc) - 1
+        # Segment k covers (conc[k], conc[k+1]]; the first also takes everything below.
+        self.upper = conc[1:]
+        self.conc_lo = conc[:-1]
+        self.aqi_lo = aqi[:n_segments]
+        self.aqi_span = aqi[1:n_segments + 1] - aqi[:n_segments]
+        self.conc_span = conc[1:] - conc[:-1]
+        self.n_segments = n_segments
+        self.cap = int(aqi[-1])
+
+    def evaluate(self, values):
+        seg = np.searchsorted(self.upper, values, side="left")
+        capped = seg >= self.n_segments
+        k = np.minimum(seg, self.n_segments - 1)
+        # Same operation order as the scalar formula, so results match it bit for bit.
+        aqi = self.aqi_lo[k] + (values - self.conc_lo[k]) * self.aqi_span[k] / self.conc_span[k]
+        return np.where(capped, self.cap, aqi), capped
+
+
+TABLES = {pol: _Table(conc, aqi) for pol, (conc, aqi) in BREAKPOINTS.items()}
+
+# Health categories shown by the dashboard; each covers AQI up to its bound.
+CATEGORIES = ["Good", "Moderate", "Unhealthy for Sensitive Groups", "Unhealthy", "Very Unhealthy", "Hazardous"]
+CATEGORY_UPPER = np.array([50, 100, 150, 200, 300], dtype=np.float64)
+
+
+def aqi_categories(overall):
+    """Index into CATEGORIES for each overall AQI value."""
+    return np.searchsorted(CATEGORY_UPPER, np.asarray(overall, dtype=np.float64), side="left")
+
+
+def compute_aqi_array(concentrations, pollutants=POLLUTANTS, return_capped=False):
+    """Score an (N, P) concentration matrix whose columns follow ``pollutants``.
+
+    Returns ``(overall, individual)`` with shapes (N,) and (N, P); with
+    ``return_capped`` also a boolean (N, P) mask of values that hit the cap.
+    """
+    conc = np.asarray(concentrations, dtype=np.float64)
+    if conc.ndim != 2 or conc.shape[1] != len(pollutants):
+        raise ValueError(f"Expected shape (N, {len(pollutants)}), got {conc.shape}")
+    individual = np.empty_like(conc)
+    capped = np.empty(conc.shape, dtype=bool)
+    for j, pol in enumerate(pollutants):
+        individual[:, j], capped[:, j] = TABLES[pol].evaluate(conc[:, j])
+    overall = individual.max(axis=1) if len(pollutants) else np.full(len(conc), np.nan)
+    if return_capped:
+        return overall, individual, capped
+    return overall, individual
+
+
+def compute_real_aqi_rows(concentrations, pollutants=POLLUTANTS):
+    """Per-row ``(overall, {pollutant: aqi})`` tuples for an (N, P) matrix.
+
+    Matches compute_real_aqi exactly, including its int cap values.
+    """
+    _, individual, capped = compute_aqi_array(concentrations, pollutants, return_capped=True)
+    caps = [TABLES[pol].cap for pol in pollutants]
+    rows = []
+    for values, hit_cap in zip(individual.tolist(), capped.tolist()):
+        aqi_vals = {pol: (caps[j] if hit_cap[j] else values[j]) for j, pol in enumerate(pollutants)}
+        rows.append((max(aqi_vals.values()) if aqi_vals else None, aqi_vals))
+    return rows
+
+
+def compute_real_aqi(absolute_pollutants):
+    pollutants = list(absolute_pollutants)
+    for pol in pollutants:
+        if pol not in TABLES:
+            raise KeyError(pol)
+    values = [[absolute_pollutants[pol] for pol in pollutants]]
+    return compute_real_aqi_rows(values, pollutants)[0]
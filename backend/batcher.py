@@ -0,0 +1,136 @@
+"""Micro-batching of concurrent /predict calls into one ensemble pass.
+
+Each request thread hands its rows to ``MicroBatcher.submit`` and blocks. One
+scheduler thread takes the queued requests, waits until the oldest has been
+queued for ``window`` seconds or ``max_batch`` rows are queued, runs the
+batch function once over the concatenated rows and hands every request its
+slice of the result. Requests that queue while a batch is running are picked
+up by the next one without further waiting. The window is only waited out
+while the previous batch served more than one request, so a lone client is
+not delayed; under load a longer window trades latency for larger batches.
+``concurrency`` schedulers let that many batches run at once, for a batch
+function that waits on another process rather than holding the GIL.
+
+The batch function must treat rows independently (the ensemble does), so a
+row's result does not depend on what it was batched with.
+"""
+import os
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class _Request:
+    __slots__ = ("rows", "queued_at", "done", "result", "error")
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queued_at = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    def __init__(self, fn, window=0.002, max_batch=64, concurrency=1):
+        self.fn = fn  # (N, F) array -> (N, ...) array
+        self.window = window
+        self.max_batch = max_batch
+        self.concurrency = concurrency
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._pending_rows = 0
+        self._concurrent = False  # whether the last batch served several requests
+        self._threads = []
+        self._pid = None
+        self._stats = dict(requests=0, rows=0, batches=0, bypassed=0, largest_batch=0,
+                           wait_seconds_total=0.0, wait_seconds_max=0.0, run_seconds_total=0.0)
+
+    @property
+    def enabled(self):
+        return self.max_batch > 1
+
+    def submit(self, rows):
+        """Run ``fn(rows)`` as part of a batch; blocks until its slice is ready."""
+        if not self.enabled or len(rows) >= self.max_batch:
+            with self._cond:
+                self._stats["bypassed"] += 1
+            return self.fn(rows)
+        request = _Request(rows)
+        with self._cond:
+            self._ensure_scheduler()
+            self._pending.append(request)
+            self._pending_rows += len(rows)
+            self._cond.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _ensure_scheduler(self):
+        # Threads do not survive fork(); a forked worker starts its own.
+        if not self._threads or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._threads = [threading.Thread(target=self._run, name=f"predict-batcher-{i}", daemon=True)
+                             for i in range(self.concurrency)]
+            for t in self._threads:
+                t.start()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0].queued_at + self.window
+            while self._concurrent and self._pending_rows < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, n_rows = [], 0
+            while self._pending and (not batch or n_rows + len(self._pending[0].rows) <= self.max_batch):
+                request = self._pending.popleft()
+                batch.append(request)
+                n_rows += len(request.rows)
+            self._pending_rows -= n_rows
+            self._concurrent = len(batch) > 1
+        return batch, n_rows
+
+    def _run(self):
+        while True:
+            batch, n_rows = self._next_batch()
+            started = time.monotonic()
+            try:
+                rows = batch[0].rows if len(batch) == 1 else np.concatenate([r.rows for r in batch])
+                result = self.fn(rows)
+                offset = 0
+                for request in batch:
+                    request.result = result[offset:offset + len(request.rows)]
+                    offset += len(request.rows)
+            except Exception as e:
+                # Raised again in every caller of the batch, which log it.
+                for request in batch:
+                    request.error = e
+            elapsed = time.monotonic() - started
+            waits = [started - r.queued_at for r in batch]
+            with self._cond:
+                s = self._stats
+                s["requests"] += len(batch)
+                s["rows"] += n_rows
+                s["batches"] += 1
+                s["largest_batch"] = max(s["largest_batch"], n_rows)
+                s["wait_seconds_total"] += sum(waits)
+                s["wait_seconds_max"] = max(s["wait_seconds_max"], max(waits))
+                s["run_seconds_total"] += elapsed
+            for request in batch:
+                request.done.set()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats, window_ms=self.window * 1000, max_batch=self.max_batch,
+                         queued=len(self._pending))
+        batches, requests = stats["batches"], stats["requests"]
+        stats["mean_batch_rows"] = stats["rows"] / batches if batches else None
+        stats["mean_wait_ms"] = stats["wait_seconds_total"] * 1000 / requests if requests else None
+        return stats
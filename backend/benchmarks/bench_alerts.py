@@ -0,0 +1,123 @@
+"""Vectorized AlertEngine versus a per-(city, pollutant) Python loop.
+
+Replays a noisy random walk of readings around the thresholds and checks that
+both fire the same alerts, then reports evaluation time per cycle at several
+city counts. Also compares alert counts with and without hysteresis and the
+email volume of the old per-tab check, where every open dashboard posted
+/notify on its own.
+
+Usage:
+    python benchmarks/bench_alerts.py --cities 100 1000 5000 20000 --cycles 100 --tabs 5
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from alerts import AlertEngine, DEFAULT_THRESHOLDS  # noqa: E402
+
+CYCLE_SECONDS = 600
+
+
+def readings(n_cities, cycles, seed=0):
+    rng = np.random.default_rng(seed)
+    thresholds = np.array(list(DEFAULT_THRESHOLDS.values()))
+    level = rng.uniform(0.5, 1.2, size=(n_cities, len(thresholds)))
+    walk = level + np.cumsum(rng.normal(0, 0.03, size=(cycles, n_cities, len(thresholds))), axis=0)
+    noise = rng.normal(0, 0.03, size=walk.shape)  # sensor jitter around the trend
+    values = np.clip(walk + noise, 0, None) * thresholds
+    values[rng.random(values.shape) < 0.01] = np.nan  # missing components
+    return values
+
+
+def reference(cities, values, clear_ratio, cooldown):
+    """What the engine does, one pair at a time."""
+    active, last, events = {}, {}, []
+    names = list(DEFAULT_THRESHOLDS)
+    for t, cycle in enumerate(values):
+        now = t * CYCLE_SECONDS
+        for i, city in enumerate(cities):
+            for j, pollutant in enumerate(names):
+                v = cycle[i, j]
+                if v != v:
+                    continue
+                key = (city, pollutant)
+                threshold = DEFAULT_THRESHOLDS[pollutant]
+                if v > threshold and not active.get(key):
+                    active[key] = True
+                    if now - last.get(key, -np.inf) >= cooldown:
+                        last[key] = now
+                        events.append((t, city, pollutant))
+                elif active.get(key) and v < threshold * clear_ratio:
+                    active[key] = False
+    return events
+
+
+def per_tab(cities, values, cooldown):
+    """The old browser check: above threshold and outside the tab's cooldown."""
+    last, sent = {}, 0
+    names = list(DEFAULT_THRESHOLDS)
+    for t, cycle in enumerate(values):
+        now = t * CYCLE_SECONDS
+        for i, city in enumerate(cities):
+            for j, pollutant in enumerate(names):
+                if cycle[i, j] > DEFAULT_THRESHOLDS[pollutant] and now - last.get((city, pollutant), -np.inf) > cooldown:
+                    last[(city, pollutant)] = now
+                    sent += 1
+    return sent
+
+
+def run_engine(cities, values, clear_ratio, cooldown):
+    engine = AlertEngine(clear_ratio=clear_ratio, cooldown=cooldown)
+    events, times = [], []
+    for t, cycle in enumerate(values):
+        t0 = time.perf_counter()
+        fired = engine.evaluate(cities, cycle, now=t * CYCLE_SECONDS)
+        times.append(time.perf_counter() - t0)
+        events += [(t, e["city"], e["pollutant"]) for e in fired]
+    return events, times, engine.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    parser.add_argument("--cycles", type=int, default=100)
+    parser.add_argument("--clear-ratio", type=float, default=0.9)
+    parser.add_argument("--cooldown", type=float, default=3600)
+    parser.add_argument("--tabs", type=int, default=5, help="open dashboards per city in the old per-tab flow")
+    args = parser.parse_args()
+
+    ok = True
+    print(f"{'cities':>7} {'engine ms/cycle':>16} {'p95':>8} {'loop ms/cycle':>14} {'speedup':>8} {'alerts':>7}")
+    for n in args.cities:
+        cities = [f"City{i}" for i in range(n)]
+        values = readings(n, args.cycles)
+        events, times, stats = run_engine(cities, values, args.clear_ratio, args.cooldown)
+        t0 = time.perf_counter()
+        expected = reference(cities, values, args.clear_ratio, args.cooldown)
+        loop = (time.perf_counter() - t0) / args.cycles
+        if sorted(events) != sorted(expected):
+            print(f"{n} cities: engine fired {len(events)} alerts, reference {len(expected)}")
+            ok = False
+        engine_ms = float(np.median(times)) * 1000
+        print(f"{n:>7} {engine_ms:>16.3f} {np.percentile(times, 95) * 1000:>8.3f} {loop * 1000:>14.2f} "
+              f"{loop * 1000 / engine_ms:>7.0f}x {len(events):>7}")
+
+    n = args.cities[0]
+    cities = [f"City{i}" for i in range(n)]
+    values = readings(n, args.cycles)
+    with_hysteresis = len(run_engine(cities, values, args.clear_ratio, 0)[0])
+    without = len(run_engine(cities, values, 1.0, 0)[0])
+    print(f"\n{n} cities, no cooldown: {without} alerts without hysteresis, {with_hysteresis} with "
+          f"clear ratio {args.clear_ratio}")
+    engine_alerts = len(run_engine(cities, values, args.clear_ratio, args.cooldown)[0])
+    print(f"emails per subscriber: old per-tab check x {args.tabs} tabs = {per_tab(cities, values, args.cooldown) * args.tabs}, "
+          f"engine = {engine_alerts}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
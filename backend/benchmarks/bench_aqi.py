@@ -0,0 +1,76 @@
+"""Throughput of the vectorized AQI computation against the per-dict loop.
+
+The scalar loop below is the original compute_real_aqi; every row of the
+vectorized result is checked against it for exact equality (values and types).
+
+Usage:
+    python benchmarks/bench_aqi.py --rows 1000000
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aqi import BREAKPOINTS, POLLUTANTS, compute_aqi_array, compute_real_aqi  # noqa: E402
+
+def legacy_compute_real_aqi(absolute_pollutants):
+    aqi_vals = {}
+    for pol, val in absolute_pollutants.items():
+        conc, aqi = BREAKPOINTS[pol]
+        for i in range(1, len(conc)):
+            if val <= conc[i]:
+                aqi_val = aqi[i-1] + (val-conc[i-1])*(aqi[i]-aqi[i-1])/(conc[i]-conc[i-1])
+                break
+        else:
+            aqi_val = aqi[-1]
+        aqi_vals[pol] = aqi_val
+    overall = max(aqi_vals.values()) if aqi_vals else None
+    return overall, aqi_vals
+
+def sample_concentrations(n, seed=0):
+    rng = np.random.default_rng(seed)
+    # Span each table past its last breakpoint, plus exact breakpoints and negatives.
+    tops = np.array([BREAKPOINTS[p][0][-1] for p in POLLUTANTS])
+    conc = rng.uniform(-0.05, 1.2, size=(n, len(POLLUTANTS))) * tops
+    edges = [rng.choice(BREAKPOINTS[p][0], size=n // 10) for p in POLLUTANTS]
+    conc[: n // 10] = np.column_stack(edges)
+    return conc
+
+def same(a, b):
+    return a == b and type(a) is type(b)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--check-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    conc = sample_concentrations(args.rows)
+    dicts = [dict(zip(POLLUTANTS, row)) for row in conc[: args.check_rows].tolist()]
+
+    mismatches = 0
+    for d in dicts:
+        exp_overall, exp = legacy_compute_real_aqi(d)
+        got_overall, got = compute_real_aqi(d)
+        if not same(got_overall, exp_overall) or any(not same(got[p], exp[p]) for p in exp):
+            mismatches += 1
+    print(f"checked {len(dicts)} rows against the scalar implementation: {mismatches} mismatches")
+
+    t0 = time.perf_counter()
+    for d in dicts:
+        legacy_compute_real_aqi(d)
+    loop_rate = len(dicts) / (time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    compute_aqi_array(conc)
+    array_rate = args.rows / (time.perf_counter() - t0)
+
+    print(f"scalar loop       : {loop_rate:14,.0f} rows/s")
+    print(f"compute_aqi_array : {array_rate:14,.0f} rows/s ({array_rate / loop_rate:.0f}x)")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
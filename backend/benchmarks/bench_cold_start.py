@@ -0,0 +1,77 @@
+"""Measure worker cold start: process launch to first served request.
+
+Starts real_time_api.py in a subprocess and polls it, reporting when
+/healthz (no models needed), /readyz and the first /predict succeed, along
+with the per-artifact load times the registry reports.
+
+Usage:
+    python benchmarks/bench_cold_start.py --port 5055 --runs 3
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_ROW = {"RH": 60.0, "WS": 2.5, "Temp": 28.0, "BP": 1005.0}
+
+def request(url, payload=None, timeout=2):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"null")
+
+def wait_for(check, deadline):
+    while time.monotonic() < deadline:
+        try:
+            if check():
+                return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    return False
+
+def one_run(port, timeout):
+    base = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, PORT=str(port))
+    t0 = time.monotonic()
+    proc = subprocess.Popen([sys.executable, "real_time_api.py"], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = t0 + timeout
+    result = {}
+    try:
+        if wait_for(lambda: request(f"{base}/healthz")[0] == 200, deadline):
+            result["healthz_s"] = time.monotonic() - t0
+        if wait_for(lambda: request(f"{base}/readyz")[0] == 200, deadline):
+            result["readyz_s"] = time.monotonic() - t0
+        if wait_for(lambda: request(f"{base}/predict", SAMPLE_ROW, timeout=timeout)[0] == 200, deadline):
+            result["first_predict_s"] = time.monotonic() - t0
+        result["artifacts"] = {name: a["load_seconds"] for name, a in request(f"{base}/readyz")[1]["artifacts"].items()}
+    finally:
+        proc.terminate()
+        proc.wait()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    runs = [one_run(args.port, args.timeout) for _ in range(args.runs)]
+    for i, run in enumerate(runs):
+        print(f"run {i}: " + ", ".join(f"{k}={v:.3f}" for k, v in run.items() if k != "artifacts"))
+        print("        load s: " + ", ".join(f"{k}={v:.3f}" for k, v in run["artifacts"].items()))
+    print(json.dumps(runs))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
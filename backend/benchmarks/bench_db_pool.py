@@ -0,0 +1,78 @@
+"""Connection-per-request versus the shared pool under concurrent load.
+
+Runs against a SQLite stand-in by default, or against the MySQL/MariaDB
+configured in .env with --backend mysql (where handshakes make the gap large).
+
+Usage:
+    python benchmarks/bench_db_pool.py --threads 32 --queries 200 --pool-size 8
+"""
+import os
+import sys
+import time
+import sqlite3
+import contextlib
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db import ConnectionPool, connect_mysql  # noqa: E402
+
+def run(threads, queries, checkout):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        for _ in range(queries):
+            t0 = time.perf_counter()
+            with checkout() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                cursor.close()
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    return len(latencies) / elapsed, pct(0.5), pct(0.99)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--pool-size", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.backend == "sqlite":
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        connect = lambda: sqlite3.connect(path, check_same_thread=False)
+    else:
+        connect = connect_mysql
+
+    # Open and close a connection around every query, as the routes used to.
+    rate, p50, p99 = run(args.threads, args.queries, lambda: contextlib.closing(connect()))
+    print(f"connect per query : {rate:10.0f} q/s  p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+
+    pool = ConnectionPool(connect, size=args.pool_size, timeout=30)
+    rate, p50, p99 = run(args.threads, args.queries, pool.get_connection)
+    print(f"pooled (size {args.pool_size:<3}) : {rate:10.0f} q/s  p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+    stats = pool.stats()
+    print(f"pool: created={stats['created']} checkouts={stats['checkouts']} "
+          f"wait avg={stats['wait_seconds_avg'] * 1000:.2f} ms max={stats['wait_seconds_max'] * 1000:.2f} ms "
+          f"timeouts={stats['timeouts']}")
+    pool.close_all()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Compare the fused forest against six separate xgboost Booster.predict calls.
+
+Checks that both agree bit for bit, and that a row gets the same prediction
+alone as inside any batch (the API caches whichever it computes first), then
+times batch sizes 1, 64, 4096
+and 10000 (PREDICT_MAX_BATCH_ROWS) for the boosters, the fused forest and the
+HybridForest the API serves (fused up to ``--max-fused-rows``, boosters above).
+
+Usage:
+    python benchmarks/bench_forest.py --repeat 20
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import xgboost as xgb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from forest import FusedForest, HybridForest, FUSED_MAX_ROWS  # noqa: E402
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+N_POLLUTANTS = 6
+
+def booster_loop(boosters, X):
+    dm = xgb.DMatrix(X)
+    return np.column_stack([bst.predict(dm) for bst in boosters])
+
+def best_time(fn, X, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 64, 4096, 10000])
+    parser.add_argument("--max-fused-rows", type=int, default=FUSED_MAX_ROWS)
+    args = parser.parse_args()
+
+    paths = [os.path.join(MODELS_DIR, f"xgb_booster_{idx}.json") for idx in range(N_POLLUTANTS)]
+    boosters = []
+    for path in paths:
+        bst = xgb.Booster()
+        bst.load_model(path)
+        boosters.append(bst)
+    t0 = time.perf_counter()
+    forest = FusedForest.from_json_files(paths)
+    print(f"compiled {forest.n_trees} trees (depth {forest.depth}) in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    # Scaled inputs live in [0, 1]; go slightly outside and include missing values.
+    rng = np.random.default_rng(0)
+    X = rng.uniform(-0.1, 1.1, size=(max(args.sizes), forest.n_features))
+    X[rng.random(X.shape) < 0.01] = np.nan
+    hybrid = HybridForest(forest, lambda: boosters, args.max_fused_rows)
+    expected = booster_loop(boosters, X)
+    mismatched = [f"{name}@{n}" for name, model in (("fused", forest), ("hybrid", hybrid)) for n in args.sizes
+                  if not np.array_equal(expected[:n], model.predict(X[:n]))]
+    singles = np.vstack([hybrid.predict(X[i:i + 1]) for i in range(min(200, len(X)))])
+    if not np.array_equal(singles, expected[:len(singles)]):
+        mismatched.append("hybrid single rows")
+    print(f"bit-identical to xgboost: {'FAILED for ' + ', '.join(mismatched) if mismatched else 'ok'}")
+
+    print(f"{'batch':>6} {'boosters ms':>12} {'fused ms':>10} {'speedup':>8} {'hybrid ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        ref = best_time(lambda x: booster_loop(boosters, x), X[:n], args.repeat)
+        fused = best_time(forest.predict, X[:n], args.repeat)
+        mixed = best_time(hybrid.predict, X[:n], args.repeat)
+        print(f"{n:>6} {ref * 1000:>12.3f} {fused * 1000:>10.3f} {ref / fused:>7.1f}x "
+              f"{mixed * 1000:>10.3f} {ref / mixed:>7.1f}x")
+    return 1 if mismatched else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
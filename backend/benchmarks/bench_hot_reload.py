@@ -0,0 +1,77 @@
+"""Check that /predict keeps answering while the models hot-reload.
+
+Loads the models, makes every loader sleep ``--delay`` seconds, triggers a
+reload and posts single rows to /predict (and polls /readyz) for the whole
+delay and until the new generation is swapped in. Reports the status codes and latency seen during the
+reload; fails if any request was not a 200, if the slowest one came anywhere
+near the loader delay, or if the generation never advanced.
+
+Usage:
+    python benchmarks/bench_hot_reload.py --delay 2
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.update(POLL_ENABLED="0", STREAM_ENABLED="0", BACKGROUND_SERVICES="0", MODEL_PRELOAD="1",
+                  PREDICT_CACHE_SIZE="0")
+os.environ.pop("INFERENCE_SOCKET", None)
+os.chdir(BACKEND_DIR)
+
+import real_time_api as api  # noqa: E402
+
+
+def slowed(loader, delay):
+    def load():
+        time.sleep(delay)
+        return loader()
+    return load
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=2.0, help="seconds each loader sleeps during the reload")
+    args = parser.parse_args()
+
+    if not api.models.wait(300):
+        print(f"models failed to load: {api.models.status()}")
+        return 1
+    http = api.app.test_client()
+    body = {"RH": 60.0, "WS": 2.5, "Temp": 28.0, "BP": 1005.0}
+    http.post("/predict", json=body)  # warm up
+
+    registry = api.models
+    registry._loaders = {name: slowed(loader, args.delay) for name, loader in registry._loaders.items()}
+    before = registry.generation
+    registry.reload()
+    latencies, codes, ready_codes = [], {}, {}
+    # Keep going for the whole loader delay, then until the new set is swapped in.
+    started = time.monotonic()
+    deadline = started + args.delay * 10 + 30
+    while (time.monotonic() < started + args.delay or registry.generation == before) and time.monotonic() < deadline:
+        t0 = time.perf_counter()
+        resp = http.post("/predict", json=body)
+        latencies.append(time.perf_counter() - t0)
+        codes[resp.status_code] = codes.get(resp.status_code, 0) + 1
+        status = http.get("/readyz").status_code
+        ready_codes[status] = ready_codes.get(status, 0) + 1
+
+    ms = np.asarray(latencies) * 1000
+    swapped = registry.generation > before
+    print(f"reload with {args.delay:g} s loaders: generation {before} -> {registry.generation}"
+          f"{'' if swapped else ' (never swapped)'}")
+    print(f"/predict during reload: {len(ms)} requests, status {codes}, "
+          f"p50 {np.percentile(ms, 50):.2f} ms, max {ms.max():.2f} ms")
+    print(f"/readyz during reload: status {ready_codes}")
+    ok = swapped and set(codes) == {200} and set(ready_codes) == {200} and ms.max() < args.delay * 1000 / 2
+    print("ok" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
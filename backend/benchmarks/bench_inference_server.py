@@ -0,0 +1,215 @@
+"""IPC overhead and process scaling of the out-of-process inference server.
+
+Overhead: one client thread calls a trivial batch function (one multiply, no
+models) at ``--rows`` rows per call three ways: in-process, through an
+``InferenceServer`` (Unix socket plus shared memory), and through a
+``multiprocessing.connection`` pipe that pickles the arrays both ways, which
+is what passing them to a plain worker pool would cost. Reports microseconds
+per call and the overhead over the local call.
+
+Scaling: starts ``inference_server.py --processes P`` for each ``--processes``
+value and drives it with ``--clients`` threads, each with its own connection,
+sending ``--batch`` real rows per call for ``--seconds``. Reports rows/s and
+speedup over one process, next to the in-process ensemble driven by the same
+threads. Speedup is bounded by the CPU count printed first. Also checks that
+the server's results match ``ensemble_predict``. The models must be exported
+under models/.
+
+Usage:
+    python benchmarks/bench_inference_server.py --rows 1 64 1024 --processes 1 2 4 --clients 8 --batch 16
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import threading
+import subprocess
+import multiprocessing
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.update(POLL_ENABLED="0", STREAM_ENABLED="0", MODEL_PRELOAD="1", PREDICT_CACHE_SIZE="0")
+os.environ.pop("INFERENCE_SOCKET", None)
+os.chdir(BACKEND_DIR)
+
+from inference_server import InferenceServer, InferenceClient, ModelNotReady  # noqa: E402
+
+WEIGHTS = np.linspace(0.5, 1.5, 24).reshape(4, 6)
+
+
+def trivial(rows):
+    return rows @ WEIGHTS
+
+
+def rows_for(n, seed=0):
+    return np.random.default_rng(seed).uniform([10, 0, 0, 740], [95, 10, 40, 780], size=(n, 4))
+
+
+# -----------------------------------------------------------------------------
+# IPC overhead
+# -----------------------------------------------------------------------------
+def _pickle_server(address, ready):
+    with Listener(address, family="AF_UNIX") as listener:
+        ready.set()
+        with listener.accept() as conn:
+            while True:
+                try:
+                    rows = conn.recv()
+                except EOFError:
+                    return
+                conn.send(trivial(rows))
+
+
+def per_call_us(fn, rows, seconds):
+    fn(rows)
+    calls, t0 = 0, time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        fn(rows)
+        calls += 1
+    return (time.perf_counter() - t0) / calls * 1e6
+
+
+def overhead(sizes, seconds, tmp):
+    ctx = multiprocessing.get_context("fork")
+    shm_path, pickle_path = os.path.join(tmp, "shm.sock"), os.path.join(tmp, "pickle.sock")
+    server = ctx.Process(target=InferenceServer(shm_path, trivial).serve_forever, daemon=True)
+    ready = ctx.Event()
+    pickler = ctx.Process(target=_pickle_server, args=(pickle_path, ready), daemon=True)
+    server.start()
+    pickler.start()
+    ready.wait(10)
+    client = InferenceClient(shm_path, capacity=max(sizes))
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            client.predict(rows_for(1))
+            break
+        except ModelNotReady:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+    conn = Client(pickle_path, family="AF_UNIX")
+
+    def pickled(rows):
+        conn.send(rows)
+        return conn.recv()
+
+    failed = False
+    print(f"{'rows':>6} {'local us':>9} {'shm us':>9} {'pickle us':>10} {'shm +us':>8} {'pickle +us':>11}")
+    try:
+        for n in sizes:
+            rows = rows_for(n)
+            failed |= not np.array_equal(client.predict(rows), trivial(rows))
+            local = per_call_us(trivial, rows, seconds)
+            shm = per_call_us(client.predict, rows, seconds)
+            pkl = per_call_us(pickled, rows, seconds)
+            print(f"{n:>6} {local:>9.1f} {shm:>9.1f} {pkl:>10.1f} {shm - local:>8.1f} {pkl - local:>11.1f}")
+    finally:
+        conn.close()
+        client.close()
+        server.terminate()
+        server.join(10)
+        pickler.join(10)
+    return failed
+
+
+# -----------------------------------------------------------------------------
+# Scaling across processes
+# -----------------------------------------------------------------------------
+def drive(predict, clients, batch, seconds):
+    """Rows/s with ``clients`` threads each calling ``predict`` on ``batch`` rows."""
+    rows = rows_for(batch * clients, seed=2)
+    start = threading.Barrier(clients + 1)
+    done = [0] * clients
+    stop = [float("inf")]
+
+    def client(k):
+        mine = rows[k * batch:(k + 1) * batch]
+        start.wait()
+        while time.monotonic() < stop[0]:
+            predict(mine)
+            done[k] += batch
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(clients)]
+    for t in threads:
+        t.start()
+    stop[0] = time.monotonic() + seconds
+    t0 = time.perf_counter()
+    start.wait()
+    for t in threads:
+        t.join()
+    return sum(done) / (time.perf_counter() - t0)
+
+
+def start_server(path, processes):
+    env = dict(os.environ, PYTHONWARNINGS="ignore")
+    proc = subprocess.Popen([sys.executable, "inference_server.py", "--socket", path, "--processes", str(processes)],
+                            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = InferenceClient(path)
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("inference server exited during startup")
+        try:
+            client.predict(rows_for(1))
+            return proc, client
+        except ModelNotReady:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("inference server did not become ready")
+
+
+def scaling(processes, clients, batch, seconds, tmp):
+    import real_time_api as api
+
+    api.models.wait()
+    check = rows_for(256, seed=3)
+    expected = api.ensemble_predict(check)
+    drive(api.ensemble_predict, clients, batch, 1.0)  # warm up
+    local = drive(api.ensemble_predict, clients, batch, seconds)
+    print(f"\n{os.cpu_count()} CPUs, {clients} client threads x {batch} rows per call, {seconds:g} s per run")
+    print(f"{'server':<16} {'rows/s':>9} {'vs 1 proc':>9} {'vs local':>9}")
+    print(f"{'in-process':<16} {local:>9.0f} {'':>9} {1:>8.2f}x")
+    failed, base = False, None
+    for p in processes:
+        path = os.path.join(tmp, f"inference-{p}.sock")
+        proc, client = start_server(path, p)
+        try:
+            drift = float(np.max(np.abs(client.predict(check) - expected)))
+            failed |= drift > 1e-6
+            drive(client.predict, clients, batch, 1.0)
+            rate = drive(client.predict, clients, batch, seconds)
+        finally:
+            client.close()
+            proc.terminate()
+            proc.wait(60)
+        base = base or rate
+        print(f"{f'{p} process(es)':<16} {rate:>9.0f} {rate / base:>8.2f}x {rate / local:>8.2f}x"
+              f"   max |diff| vs in-process {drift:.1e}")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 64, 1024])
+    parser.add_argument("--processes", type=int, nargs="+",
+                        default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=16, help="rows per call in the scaling runs")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--skip-scaling", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        failed = overhead(args.rows, min(args.seconds, 2.0), tmp)
+        if not args.skip_scaling:
+            failed |= scaling(args.processes, args.clients, args.batch, args.seconds, tmp)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Notebook-style merge versus the chunked process-pool ingestion.
+
+Generates sample station CSVs, then runs each scenario in a fresh interpreter
+so peak memory is measured in isolation:
+
+  notebook  ThreadPoolExecutor over full pd.read_csv per file, renamed and
+            appended to one merged CSV (what Model_Training_Final.ipynb does)
+  ingest-N  ingest.run with N worker processes, then a no-change re-run
+
+Usage:
+    python benchmarks/bench_ingest.py --stations 60 --days 365 --workers 1,2,4
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import resource
+import subprocess
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+
+def peak_mb():
+    self_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    child_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return self_peak, child_peak
+
+
+def notebook(info, data_dir, out):
+    from concurrent.futures import ThreadPoolExecutor
+    import pandas as pd
+    from ingest import EXPECTED_MAPPING
+
+    def load(name):
+        df = pd.read_csv(os.path.join(data_dir, name + ".csv"), parse_dates=["From Date"], low_memory=False)
+        for canonical, alternatives in EXPECTED_MAPPING.items():
+            for alt in alternatives:
+                if alt in df.columns:
+                    df.rename(columns={alt: canonical}, inplace=True)
+                    break
+        df["Station"] = name
+        return df
+
+    names = pd.read_csv(info)["file_name"].tolist()
+    merged = os.path.join(out, "merged_data.csv")
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        frames = list(pool.map(load, names))
+    for i in range(0, len(frames), 10):
+        pd.concat(frames[i:i + 10], ignore_index=True).to_csv(merged, mode="a", index=False,
+                                                              header=not os.path.exists(merged))
+    return {"seconds": time.perf_counter() - t0, "files": len(names)}
+
+
+def scenario(args):
+    if args.scenario == "notebook":
+        result = notebook(args.info, args.data_dir, args.out)
+    else:
+        from ingest import run
+        workers = int(args.scenario.split("-")[1])
+        first = run(args.info, args.data_dir, args.out, workers=workers, log=lambda *_: None)
+        again = run(args.info, args.data_dir, args.out, workers=workers, log=lambda *_: None)
+        result = {"seconds": first["seconds"], "files": first["files"], "rerun_seconds": again["seconds"],
+                  "rerun_files": again["files"]}
+    result["main_mb"], result["children_mb"] = peak_mb()
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=60)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    parser.add_argument("--info", help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.scenario:
+        return scenario(args)
+
+    from ingest import make_sample
+    root = tempfile.mkdtemp()
+    try:
+        info, data_dir = make_sample(os.path.join(root, "sample"), args.stations, args.days)
+        size_mb = sum(os.path.getsize(os.path.join(data_dir, f)) for f in os.listdir(data_dir)) / 2**20
+        print(f"{args.stations} sample files, {size_mb:.0f} MB of CSV, {os.cpu_count()} CPUs")
+        print(f"{'scenario':<10} {'files/s':>8} {'seconds':>8} {'peak MB (main/workers)':>24} {'re-run':>10}")
+        for name in ["notebook"] + [f"ingest-{w}" for w in args.workers.split(",")]:
+            out = os.path.join(root, name)
+            os.makedirs(out)
+            proc = subprocess.run([sys.executable, __file__, "--scenario", name, "--info", info,
+                                   "--data-dir", data_dir, "--out", out], capture_output=True, text=True, check=True)
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            rerun = f"{r['rerun_seconds'] * 1e3:.0f} ms" if "rerun_seconds" in r else "-"
+            print(f"{name:<10} {r['files'] / r['seconds']:>8.2f} {r['seconds']:>8.1f} "
+                  f"{r['main_mb']:>12.0f} / {r['children_mb']:<9.0f} {rerun:>10}")
+            shutil.rmtree(out)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
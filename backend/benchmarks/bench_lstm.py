@@ -0,0 +1,137 @@
+"""Compare the NumPy LSTM forward pass against Keras.
+
+First checks ``predict`` and ``step`` against Keras outputs stored in
+lstm_reference.npz, which needs no TensorFlow. When TensorFlow is installed it
+also reports the max output difference on fresh inputs, per-call latency at a
+few batch sizes, and the cold start (import + load) time and peak RSS of each
+backend in a fresh process.
+
+Usage:
+    python benchmarks/bench_lstm.py --repeat 20
+    python benchmarks/bench_lstm.py --write-reference  # after re-exporting the model
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+from lstm_numpy import NumpyLSTMModel, DEFAULT_H5, DEFAULT_NPZ  # noqa: E402
+
+REFERENCE = os.path.join(BACKEND_DIR, "benchmarks", "lstm_reference.npz")
+TOLERANCE = 1e-4
+
+# Run in a child process so each backend's import cost and memory are measured in isolation.
+COLD_START = {
+    "numpy": (
+        "from lstm_numpy import NumpyLSTMModel\n"
+        f"m = NumpyLSTMModel.load({DEFAULT_NPZ!r})\n"
+    ),
+    "keras": (
+        "import os\n"
+        "os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'\n"
+        "from tensorflow.keras.models import load_model\n"
+        "from tensorflow.keras.losses import mse\n"
+        f"m = load_model({DEFAULT_H5!r}, custom_objects={{'mse': mse}})\n"
+    ),
+}
+CHILD = (
+    "import time, json, resource\n"
+    "t0 = time.perf_counter()\n"
+    "{body}"
+    "import numpy as np\n"
+    "m.predict(np.zeros((1, 10, 4), dtype=np.float32), verbose=0)\n"
+    "print(json.dumps({{'seconds': time.perf_counter() - t0,"
+    " 'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))\n"
+)
+
+def cold_start(backend):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD.format(body=COLD_START[backend])],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def _sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def load_keras():
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+    from tensorflow.keras.models import load_model
+    from tensorflow.keras.losses import mse
+    return load_model(DEFAULT_H5, custom_objects={"mse": mse})
+
+def write_reference(keras_model, rows=64, path=REFERENCE):
+    x = np.random.default_rng(1).uniform(-0.1, 1.1, size=(rows, 10, 4)).astype(np.float32)
+    np.savez(path, x=x, y=keras_model.predict(x, verbose=0), weights_sha256=np.array(_sha256(DEFAULT_NPZ)))
+    print(f"wrote {rows} Keras reference outputs to {path}")
+
+def check_reference(path=REFERENCE):
+    """True if predict and step match the stored Keras outputs within TOLERANCE."""
+    with np.load(path) as ref:
+        x, y, weights_sha256 = ref["x"], ref["y"], str(ref["weights_sha256"])
+    if weights_sha256 != _sha256(DEFAULT_NPZ):
+        print(f"{os.path.basename(path)} was recorded from another {os.path.basename(DEFAULT_NPZ)}; "
+              "re-run with --write-reference")
+        return False
+    model = NumpyLSTMModel.load(DEFAULT_NPZ)
+    states = model.initial_state(len(x))
+    for t in range(x.shape[1]):
+        stepped, states = model.step(x[:, t], states)
+    errors = {"predict": float(np.abs(model.predict(x) - y).max()), "step": float(np.abs(stepped - y).max())}
+    print("max |keras reference - numpy| = " + ", ".join(f"{k} {v:.3g}" for k, v in errors.items()))
+    return max(errors.values()) < TOLERANCE
+
+def best_time(fn, x, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(x)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 64, 1024])
+    parser.add_argument("--write-reference", action="store_true",
+                        help=f"record Keras outputs to {os.path.basename(REFERENCE)} and exit")
+    args = parser.parse_args()
+
+    if args.write_reference:
+        write_reference(load_keras())
+        return 0
+    if not check_reference():
+        return 1
+    try:
+        keras_model = load_keras()
+    except ImportError:
+        print("TensorFlow is not installed; skipping the live Keras comparison")
+        return 0
+
+    for backend in ("numpy", "keras"):
+        stats = cold_start(backend)
+        print(f"cold start {backend:<5}: {stats['seconds']:.2f} s, peak RSS {stats['max_rss_mb']:.0f} MB")
+
+    numpy_model = NumpyLSTMModel.load(DEFAULT_NPZ)
+
+    x = np.random.default_rng(0).uniform(-0.1, 1.1, size=(max(args.sizes), 10, 4)).astype(np.float32)
+    max_err = float(np.abs(keras_model.predict(x, verbose=0) - numpy_model.predict(x)).max())
+    print(f"max |keras - numpy| = {max_err:.3g}")
+
+    print(f"{'batch':>6} {'keras ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        ref = best_time(lambda b: keras_model.predict(b, verbose=0), x[:n], args.repeat)
+        fast = best_time(numpy_model.predict, x[:n], args.repeat)
+        print(f"{n:>6} {ref * 1000:>10.3f} {fast * 1000:>10.3f} {ref / fast:>7.1f}x")
+    return 0 if max_err < TOLERANCE else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
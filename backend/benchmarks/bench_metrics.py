@@ -0,0 +1,192 @@
+"""Cost of the request instrumentation in metrics.py.
+
+Reports the per-call cost of a histogram observation, a timed block and a
+counter increment (alone and with ``--threads`` threads contending), the
+render time of /metrics, and the p50 latency of /predict (cache hits and
+fresh rows) through the Flask test client with instrumentation on, off (its
+request hooks unregistered and the record methods turned into no-ops) and with every request
+profiled. The models must be exported under models/.
+
+Usage:
+    python benchmarks/bench_metrics.py --requests 2000 --threads 8
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.update(POLL_ENABLED="0", STREAM_ENABLED="0", MODEL_PRELOAD="1", PROFILE_SAMPLE_RATE="0")
+os.chdir(BACKEND_DIR)
+
+import metrics  # noqa: E402
+from metrics import Registry  # noqa: E402
+
+
+def per_call_ns(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e9
+
+
+def contended_ns(fn, n, threads):
+    def work():
+        for _ in range(n):
+            fn()
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return (time.perf_counter() - t0) / (n * threads) * 1e9
+
+
+def micro(args):
+    registry = Registry()
+    hist = registry.histogram("bench_seconds", "bench", ("stage",))
+    counter = registry.counter("bench_total", "bench", ("cache", "result"))
+
+    def timed():
+        with hist.time("scale"):
+            pass
+
+    cases = [
+        ("histogram.observe", lambda: hist.observe(0.0003, "scale")),
+        ("with histogram.time()", timed),
+        ("counter.inc", lambda: counter.inc("predict", "hit")),
+    ]
+    print(f"{'operation':<24} {'ns/call':>9} {f'{args.threads} threads':>11}")
+    for name, fn in cases:
+        print(f"{name:<24} {per_call_ns(fn, args.calls):>9.0f} {contended_ns(fn, args.calls // args.threads, args.threads):>11.0f}")
+
+    for stages in (10, 100):
+        big = Registry()
+        h = big.histogram("bench_seconds", "bench", ("stage",))
+        for i in range(stages):
+            h.observe(0.001, f"s{i}")
+        t0 = time.perf_counter()
+        for _ in range(100):
+            big.render()
+        print(f"render, {stages} histogram series: {(time.perf_counter() - t0) * 10:.2f} ms")
+
+
+def p50_ms(client, bodies):
+    samples = []
+    for body in bodies:
+        t0 = time.perf_counter()
+        resp = client.post("/predict", json=body)
+        samples.append(time.perf_counter() - t0)
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+    return float(np.percentile(samples, 50)) * 1000
+
+
+def patch_records(observe, inc):
+    originals = (metrics.Histogram.observe, metrics.Counter.inc)
+    metrics.Histogram.observe, metrics.Counter.inc = observe, inc
+    return originals
+
+
+def count_records(client, body):
+    """Histogram observations plus counter/gauge updates made by one request."""
+    calls = [0]
+    observe, inc = metrics.Histogram.observe, metrics.Counter.inc
+
+    def counting_observe(self, value, *labels):
+        calls[0] += 1
+        observe(self, value, *labels)
+
+    def counting_inc(self, *labels, amount=1):
+        calls[0] += 1
+        inc(self, *labels, amount=amount)
+
+    patch_records(counting_observe, counting_inc)
+    try:
+        p50_ms(client, [body])
+    finally:
+        patch_records(observe, inc)
+    return calls[0]
+
+
+def requests_overhead(args):
+    import real_time_api as api
+    api.models.wait()
+    client = api.app.test_client()
+    rng = np.random.default_rng(0)
+    hit = [{"RH": 50.0, "WS": 2.0, "Temp": 25.0, "BP": 760.0}] * args.requests
+
+    def fresh(n=args.requests):
+        return [{"RH": float(r[0]), "WS": float(r[1]), "Temp": float(r[2]), "BP": float(r[3])}
+                for r in rng.uniform([10, 0, 0, 740], [95, 10, 40, 780], size=(n, 4))]
+
+    p50_ms(client, hit[:50] + fresh(50))  # warm up
+    records = (count_records(client, hit[0]), count_records(client, fresh(1)[0]))
+
+    hooks = (api.app.before_request_funcs[None], api.app.after_request_funcs[None],
+             api.app.teardown_request_funcs[None])
+    saved = [list(h) for h in hooks]
+
+    def instrumentation_off():
+        for h in hooks:
+            h[:] = [f for f in h if f.__module__ != api.__name__]  # keep flask_cors
+        return patch_records(lambda self, value, *labels: None, lambda self, *labels, amount=1: None)
+
+    def instrumentation_on(originals):
+        patch_records(*originals)
+        for h, funcs in zip(hooks, saved):
+            h[:] = funcs
+
+    # Alternate the modes and keep each one's best p50 so machine noise cancels out.
+    on, off, profiled = [], [], []
+    for _ in range(args.repeats):
+        on.append((p50_ms(client, hit), p50_ms(client, fresh())))
+        originals = instrumentation_off()
+        try:
+            off.append((p50_ms(client, hit), p50_ms(client, fresh())))
+        finally:
+            instrumentation_on(originals)
+        api.profiler.sample_rate, api.profiler.slow_ms = 1.0, float("inf")
+        profiled.append((p50_ms(client, hit), p50_ms(client, fresh())))
+        api.profiler.sample_rate = 0.0
+    on, off, profiled = (tuple(min(col) for col in zip(*runs)) for runs in (on, off, profiled))
+
+    print(f"\n/predict best p50 of {args.repeats} x {args.requests}   {'cache hit':>10} {'fresh row':>10}")
+    for name, (a, b) in (("instrumentation off", off), ("instrumentation on", on),
+                         ("every request profiled", profiled)):
+        print(f"{name:<34} {a:>8.3f}ms {b:>8.3f}ms")
+    print(f"difference: {(on[0] - off[0]) * 1000:+.0f} us per hit ({records[0]} records), "
+          f"{(on[1] - off[1]) * 1000:+.0f} us per fresh row ({records[1]} records)")
+
+    # The end-to-end difference is within run-to-run noise here; time the hooks directly too.
+    response = api.app.response_class("x")
+    with api.app.test_request_context("/predict", method="POST"):
+        t0 = time.perf_counter()
+        for _ in range(args.requests):
+            api.start_request_metrics()
+            api.record_response_status(response)
+            api.finish_request_metrics(None)
+        hooks_us = (time.perf_counter() - t0) / args.requests * 1e6
+    print(f"request hooks alone: {hooks_us:.1f} us per request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=400000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--micro-only", action="store_true")
+    args = parser.parse_args()
+    micro(args)
+    if not args.micro_only:
+        requests_overhead(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
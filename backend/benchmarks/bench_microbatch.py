@@ -0,0 +1,108 @@
+"""Load test for /predict micro-batching at several client concurrencies.
+
+``--clients`` threads each post single rows to /predict through their own
+Flask test client for ``--seconds``, with the prediction cache off so every
+request reaches the models. Each concurrency is run with batching off
+(PREDICT_MAX_BATCH=1) and with each ``--windows`` value, and reports
+requests/s, p50/p99 latency, the mean rows per ensemble pass and the mean time
+requests waited for their batch. First checks that rows predicted in one batch
+match rows predicted one at a time. The models must be exported under models/.
+
+Usage:
+    python benchmarks/bench_microbatch.py --clients 1 16 128 --windows 0 2 5 --seconds 5
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.update(POLL_ENABLED="0", STREAM_ENABLED="0", MODEL_PRELOAD="1", PREDICT_CACHE_SIZE="0")
+os.chdir(BACKEND_DIR)
+
+import real_time_api as api  # noqa: E402
+
+
+def check_parity(n=256, seed=1):
+    rows = np.random.default_rng(seed).uniform([10, 0, 0, 740], [95, 10, 40, 780], size=(n, 4))
+    batched = api.ensemble_predict(rows)
+    single = np.vstack([api.ensemble_predict(rows[i:i + 1]) for i in range(n)])
+    return float(np.max(np.abs(batched - single) / np.maximum(np.abs(single), 1e-6)))
+
+
+def run(clients, seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.uniform([10, 0, 0, 740], [95, 10, 40, 780], size=(4096, 4)).tolist()
+    bodies = [{"RH": r[0], "WS": r[1], "Temp": r[2], "BP": r[3]} for r in rows]
+    latencies, errors = [], [0]
+    start = threading.Barrier(clients + 1)
+    stop = [float("inf")]
+
+    def client(k):
+        http = api.app.test_client()
+        mine, i = [], k
+        start.wait()
+        while time.monotonic() < stop[0]:
+            t0 = time.perf_counter()
+            if http.post("/predict", json=bodies[i % len(bodies)]).status_code != 200:
+                errors[0] += 1
+            mine.append(time.perf_counter() - t0)
+            i += clients
+        latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(clients)]
+    for t in threads:
+        t.start()
+    before = api.predict_batcher.stats()
+    stop[0] = time.monotonic() + seconds
+    t0 = time.perf_counter()
+    start.wait()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    after = api.predict_batcher.stats()
+    ms = np.asarray(latencies) * 1000
+    batches = after["batches"] - before["batches"]
+    requests = after["requests"] - before["requests"]
+    return dict(rps=len(latencies) / elapsed, p50=float(np.percentile(ms, 50)), p99=float(np.percentile(ms, 99)),
+                rows_per_pass=(after["rows"] - before["rows"]) / batches if batches else 1.0,
+                wait_ms=(after["wait_seconds_total"] - before["wait_seconds_total"]) * 1000 / requests
+                if requests else 0.0, errors=errors[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 128])
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 2, 5], help="batch windows in ms")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    api.models.wait()
+    drift = check_parity()
+    print(f"batched vs one-at-a-time: max relative difference {drift:.2e}")
+    run(4, 1.0)  # warm up
+
+    batcher = api.predict_batcher
+    modes = [("off", 1, 0.0)] + [(f"window {w:g} ms", args.max_batch, w / 1000) for w in args.windows]
+    print(f"\n{'clients':>7} {'mode':<14} {'req/s':>8} {'vs off':>7} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'rows/pass':>9} {'wait ms':>8}")
+    failed = drift > 1e-4
+    for clients in args.clients:
+        baseline = None
+        for name, max_batch, window in modes:
+            batcher.max_batch, batcher.window = max_batch, window
+            r = run(clients, args.seconds)
+            baseline = baseline or r["rps"]
+            failed |= r["errors"] > 0
+            print(f"{clients:>7} {name:<14} {r['rps']:>8.0f} {r['rps'] / baseline:>6.2f}x {r['p50']:>8.2f} "
+                  f"{r['p99']:>8.2f} {r['rows_per_pass']:>9.1f} {r['wait_ms']:>8.2f}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Cold load time and memory of the model bundle versus the separate artifacts.
+
+For each source (``artifacts``: six booster JSON files, two joblib scalers and
+the LSTM .npz; ``bundle``: models/aqi_models.bundle) starts ``--processes``
+independent Python processes at once. Each imports the API, loads every model
+through the registry, runs one 256-row ensemble pass and reports how long
+loading took (lazy library imports included) and what the pass cost. With all
+of them loaded, reports the mean RSS growth and PSS/USS per process and the
+summed PSS: bundle pages are shared through the page cache, parsed artifacts
+are private to each process. First checks that both sources give identical
+predictions. Run ``python model_bundle.py export`` first.
+
+Usage:
+    python benchmarks/bench_model_bundle.py --processes 1 4 --runs 3
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from bench_workers import memory_kb  # noqa: E402
+
+SOURCES = ("artifacts", "bundle")
+
+
+def child(source):
+    """Load the models in this process, report, then hold them until stdin closes."""
+    os.environ.update(POLL_ENABLED="0", STREAM_ENABLED="0", BACKGROUND_SERVICES="0", MODEL_PRELOAD="0",
+                      PREDICT_CACHE_SIZE="0")
+    if source == "artifacts":
+        os.environ["MODEL_BUNDLE"] = ""
+    os.chdir(BACKEND_DIR)
+    import real_time_api as api
+
+    before = memory_kb(os.getpid())
+    t0 = time.perf_counter()
+    api.models.start()
+    if not api.models.wait(300):
+        raise RuntimeError(api.models.status())
+    load = time.perf_counter() - t0
+    rows = np.random.default_rng(0).uniform([10, 0, 0, 740], [95, 10, 40, 780], size=(256, 4))
+    t0 = time.perf_counter()
+    out = api.ensemble_predict(rows)
+    first = time.perf_counter() - t0
+    print(json.dumps(dict(load_s=load, first_pass_s=first, rss_before=before[0], out=out.tolist(),
+                          artifacts={k: v["load_seconds"] for k, v in api.models.status()["artifacts"].items()})),
+          flush=True)
+    sys.stdin.readline()
+
+
+def report(proc):
+    # The API logs to stdout as well; the report is the JSON line.
+    for line in proc.stdout:
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError("child exited without a report")
+
+
+def run(source, processes):
+    procs = [subprocess.Popen([sys.executable, "-W", "ignore", os.path.abspath(__file__), "--child", source],
+                              cwd=BACKEND_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True)
+             for _ in range(processes)]
+    try:
+        reports = [report(p) for p in procs]
+        mem = np.array([memory_kb(p.pid) for p in procs]) / 1024
+    finally:
+        for p in procs:
+            p.stdin.close()
+            p.wait(60)
+    rss_growth = mem[:, 0] - np.array([r["rss_before"] for r in reports]) / 1024
+    return dict(load=np.mean([r["load_s"] for r in reports]), first=np.mean([r["first_pass_s"] for r in reports]),
+                rss_growth=rss_growth.mean(), pss=mem[:, 1].mean(), uss=mem[:, 2].mean(), pss_total=mem[:, 1].sum(),
+                out=np.asarray(reports[0]["out"]), artifacts=reports[0]["artifacts"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--runs", type=int, default=3, help="single-process load runs per source")
+    parser.add_argument("--child", choices=SOURCES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return 0
+    if not os.path.exists(os.path.join(BACKEND_DIR, "models", "aqi_models.bundle")):
+        print("models/aqi_models.bundle missing; run python model_bundle.py export")
+        return 1
+
+    outputs = {source: run(source, 1)["out"] for source in SOURCES}
+    drift = float(np.max(np.abs(outputs["artifacts"] - outputs["bundle"])))
+    print(f"artifacts vs bundle predictions: max |diff| {drift:.1e}")
+
+    print(f"\n{'source':<10} {'load s':>8} {'first pass ms':>14}   per-artifact load s (median of {args.runs})")
+    for source in SOURCES:
+        runs = [run(source, 1) for _ in range(args.runs)]
+        per = {k: np.median([r["artifacts"][k] for r in runs]) for k in runs[0]["artifacts"]}
+        print(f"{source:<10} {np.median([r['load'] for r in runs]):>8.3f} "
+              f"{np.median([r['first'] for r in runs]) * 1000:>14.1f}   "
+              + ", ".join(f"{k}={v:.3f}" for k, v in per.items()))
+
+    print("\nmemory in MB, per process unless noted (page cache warm)")
+    print(f"{'source':<10} {'procs':>5} {'RSS growth':>11} {'PSS':>8} {'USS':>8} {'total PSS':>10}")
+    for n in args.processes:
+        for source in SOURCES:
+            r = run(source, n)
+            print(f"{source:<10} {n:>5} {r['rss_growth']:>11.1f} {r['pss']:>8.1f} {r['uss']:>8.1f} "
+                  f"{r['pss_total']:>10.1f}")
+    return 1 if drift > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""Per-message SMTP connections versus the background dispatcher.
+
+Both paths deliver to a local SMTP sink; --connect-delay adds a fixed cost to
+every new connection to stand in for the TCP/STARTTLS/AUTH handshakes of a
+real relay. Status writes go to an in-memory store so no database is needed.
+
+Then checks recovery after a crash: rows are left ``queued`` as if their
+process died, two fresh dispatchers run recover() at once, and every message
+must be delivered exactly once.
+
+Usage:
+    python benchmarks/bench_notify.py --messages 2000 --workers 2 --connect-delay 0.02
+"""
+import os
+import sys
+import time
+import smtplib
+import argparse
+import threading
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from notifier import NotificationDispatcher, SMTPSettings  # noqa: E402
+from stubs import SMTPSink  # noqa: E402
+
+
+class MemoryStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.status = {}
+        self.jobs = {}
+        self.claimed = set()
+        self.writes = 0
+
+    def insert_queued(self, jobs):
+        with self.lock:
+            self.writes += 1
+            for job in jobs:
+                self.status[job["message_id"]] = "queued"
+                self.jobs[job["message_id"]] = dict(job)
+
+    def claim_stale(self, grace, limit=1000):
+        # Ages are not tracked here: every queued, unclaimed row counts as stale.
+        with self.lock:
+            ids = [m for m, s in self.status.items() if s == "queued" and m not in self.claimed][:limit]
+            self.claimed.update(ids)
+            return [dict(self.jobs[m], attempts=0) for m in ids]
+
+    def update_status(self, results):
+        with self.lock:
+            self.writes += 1
+            for message_id, status, _ in results:
+                self.status[message_id] = status
+
+
+def legacy(port, recipients):
+    # What /notify used to do inside the request: one connection per message.
+    t0 = time.perf_counter()
+    for _, email in recipients:
+        msg = MIMEText("PM2.5 is high")
+        msg["Subject"] = "AQI Alert"
+        msg["From"] = "alerts@example.com"
+        msg["To"] = email
+        with smtplib.SMTP("127.0.0.1", port) as smtp:
+            smtp.send_message(msg)
+    return time.perf_counter() - t0
+
+
+def dispatched(port, recipients, args):
+    store = MemoryStore()
+    settings = SMTPSettings(host="127.0.0.1", port=port, user="", password="", starttls=False)
+    settings.sender = "alerts@example.com"
+    dispatcher = NotificationDispatcher(store, settings, workers=args.workers, batch_size=args.batch_size,
+                                        session_max_messages=args.session_max_messages)
+    t0 = time.perf_counter()
+    dispatcher.enqueue("AQI Alert", "PM2.5 is high", recipients)
+    enqueue_seconds = time.perf_counter() - t0
+    dispatcher.join()
+    elapsed = time.perf_counter() - t0
+    dispatcher.stop()
+    sent = sum(1 for s in store.status.values() if s == "sent")
+    return elapsed, enqueue_seconds, sent, store.writes, dispatcher.stats()
+
+
+def recovery(port, recipients, args):
+    store = MemoryStore()
+    settings = SMTPSettings(host="127.0.0.1", port=port, user="", password="", starttls=False)
+    settings.sender = "alerts@example.com"
+    # A process queued these rows and died before sending any of them.
+    store.insert_queued([
+        dict(subscription_id=sub_id, to=email, subject="AQI Alert", body="PM2.5 is high",
+             message_id=f"<recover-{sub_id}@breathe-easy>", attempts=0)
+        for sub_id, email in recipients
+    ])
+    dispatchers = [NotificationDispatcher(store, settings, workers=args.workers, batch_size=args.batch_size)
+                   for _ in range(2)]
+    threads = [threading.Thread(target=d.recover, args=(0,)) for d in dispatchers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for d in dispatchers:
+        d.join()
+        d.stop()
+    recovered = sum(d.stats()["recovered"] for d in dispatchers)
+    sent = sum(1 for s in store.status.values() if s == "sent")
+    return recovered, sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--legacy-messages", type=int, default=200,
+                        help="the per-connection path is slow; time a smaller sample")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--session-max-messages", type=int, default=100)
+    parser.add_argument("--connect-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    recipients = [(i, f"user{i}@example.com") for i in range(args.messages)]
+    with SMTPSink(connect_delay=args.connect_delay) as sink:
+        n_legacy = min(args.legacy_messages, args.messages)
+        elapsed = legacy(sink.port, recipients[:n_legacy])
+        print(f"per-message connections: {n_legacy / elapsed:8.1f} msgs/s  "
+              f"({n_legacy} msgs, {sink.connections} connections)")
+
+        before = sink.connections
+        elapsed, enqueue_seconds, sent, writes, stats = dispatched(sink.port, recipients, args)
+        print(f"dispatcher:              {sent / elapsed:8.1f} msgs/s  "
+              f"({sent}/{args.messages} sent, {sink.connections - before} connections, "
+              f"{writes} status writes, enqueue {enqueue_seconds * 1e3:.1f} ms)")
+        if sent != args.messages or stats["failed"]:
+            raise SystemExit(f"delivery mismatch: {stats}")
+
+        before = sink.messages
+        n_recover = min(args.messages, 500)
+        recovered, sent = recovery(sink.port, recipients[:n_recover], args)
+        delivered = sink.messages - before
+        print(f"recovery:                {recovered}/{n_recover} claimed by two dispatchers, "
+              f"{sent} sent, {delivered} delivered")
+        if recovered != n_recover or sent != n_recover or delivered != n_recover:
+            raise SystemExit("recovery did not deliver every queued message exactly once")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Uncached OpenWeather calls versus the shared cached client.
+
+A burst of dashboard clients asks for a handful of nearby locations against a
+local OpenWeather stub with fixed upstream latency. Reports request latency,
+upstream calls and hit rate for both paths, then checks that an expired entry
+is served stale while a single background refresh runs.
+
+Usage:
+    python benchmarks/bench_openweather.py --clients 64 --requests 20 --locations 4 --latency 0.05
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from openweather import OpenWeatherClient  # noqa: E402
+from stubs import OpenWeatherStub  # noqa: E402
+
+
+def burst(clients, n_requests, locations, fetch):
+    latencies, lock = [], threading.Lock()
+    start = threading.Barrier(clients)
+
+    def client(seed):
+        rng = random.Random(seed)
+        local = []
+        start.wait()
+        for _ in range(n_requests):
+            lat, lon = rng.choice(locations)
+            # GPS jitter below the cache's rounding still lands on the same key
+            lat, lon = lat + rng.uniform(-1e-3, 1e-3), lon + rng.uniform(-1e-3, 1e-3)
+            t0 = time.perf_counter()
+            fetch(lat, lon)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0, np.asarray(latencies) * 1e3
+
+
+def report(label, elapsed, lat_ms, upstream):
+    print(f"{label:<10} {len(lat_ms) / elapsed:9.1f} req/s  p50 {np.percentile(lat_ms, 50):7.2f} ms  "
+          f"p95 {np.percentile(lat_ms, 95):7.2f} ms  upstream calls {upstream}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--locations", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    locations = [(round(rng.uniform(8, 30), 2), round(rng.uniform(70, 90), 2))
+                 for _ in range(args.locations)]
+
+    with OpenWeatherStub(latency=args.latency) as stub:
+        def uncached(lat, lon):
+            resp = requests.get(f"{stub.url}/data/2.5/air_pollution",
+                                params={"lat": lat, "lon": lon, "appid": "x"}, timeout=5)
+            resp.raise_for_status()
+            return resp.json()
+
+        elapsed, lat_ms = burst(args.clients, args.requests, locations, uncached)
+        report("uncached", elapsed, lat_ms, stub.calls)
+
+        before = stub.calls
+        client = OpenWeatherClient("x", base_url=stub.url)
+        elapsed, lat_ms = burst(args.clients, args.requests, locations, client.current)
+        report("cached", elapsed, lat_ms, stub.calls - before)
+        stats = client.stats()
+        print(f"           hit rate {stats['hit_rate']:.3f}, coalesced {stats['coalesced']}, "
+              f"misses {stats['misses']}")
+        if stats["upstream_calls"] != args.locations:
+            raise SystemExit(f"expected one upstream call per location, got {stats}")
+
+        # Stale-while-revalidate: an expired entry is returned immediately and
+        # refreshed once in the background.
+        client.endpoints["current"] = (client.endpoints["current"][0], 0.0)
+        before = stub.calls
+        t0 = time.perf_counter()
+        for _ in range(50):
+            client.current(*locations[0])
+        stale_ms = (time.perf_counter() - t0) / 50 * 1e3
+        time.sleep(args.latency * 4)
+        print(f"stale      {stale_ms:.3f} ms/req while refreshing, "
+              f"background upstream calls {stub.calls - before}")
+
+
+if __name__ == "__main__":
+    main()
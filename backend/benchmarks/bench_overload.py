@@ -0,0 +1,160 @@
+"""Overload test for /predict admission control and the XGBoost-only fallback.
+
+``--clients`` threads each post single rows to /predict through their own
+Flask test client for ``--seconds``, with the prediction cache off so every
+request needs a model. Each concurrency runs once with admission control off
+(no in-flight bound, always the full ensemble) and once per ``--budgets``
+value, and reports requests/s, p50/p99/max latency of all responses, p99 of
+the answered (non-503) ones and the share of degraded and shed responses.
+With a budget, the answered p99 should stay near it however many clients
+there are. ``--ensemble-delay-ms`` adds a sleep to every ensemble pass to
+emulate a saturated LSTM (e.g. on a busy inference server), since here the
+forest, not the LSTM, dominates a pass. First checks that an
+X-Latency-Budget-Ms header can only tighten the server's budget (negative,
+zero, NaN, infinite or larger values leave it in force) and reports how far
+the XGBoost-only result is from the ensemble on random rows (pollutant error
+and AQI difference). The models must be exported under models/.
+
+Usage:
+    python benchmarks/bench_overload.py --clients 4 32 128 --budgets 50 100 --ensemble-delay-ms 50 --seconds 5
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.update(POLL_ENABLED="0", STREAM_ENABLED="0", MODEL_PRELOAD="1", PREDICT_CACHE_SIZE="0")
+os.environ.pop("INFERENCE_SOCKET", None)
+os.chdir(BACKEND_DIR)
+
+import real_time_api as api  # noqa: E402
+
+
+def fallback_error(n=1024, seed=1):
+    rows = np.random.default_rng(seed).uniform([10, 0, 0, 740], [95, 10, 40, 780], size=(n, 4))
+    full, fast = api.ensemble_predict(rows), api.xgboost_predict(rows)
+    aqi_full = [a for a, _ in api.compute_real_aqi_rows(full, api.pollutants)]
+    aqi_fast = [a for a, _ in api.compute_real_aqi_rows(fast, api.pollutants)]
+    diff = np.abs(np.asarray(aqi_full, dtype=float) - np.asarray(aqi_fast, dtype=float))
+    return float(np.mean(np.abs(full - fast))), float(np.mean(diff)), float(np.max(diff))
+
+
+def run(clients, seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.uniform([10, 0, 0, 740], [95, 10, 40, 780], size=(4096, 4)).tolist()
+    bodies = [{"RH": r[0], "WS": r[1], "Temp": r[2], "BP": r[3]} for r in rows]
+    latencies, answered, counts = [], [], dict(ok=0, degraded=0, shed=0, errors=0)
+    lock = threading.Lock()
+    start = threading.Barrier(clients + 1)
+    stop = [float("inf")]
+
+    def client(k):
+        http = api.app.test_client()
+        mine, served, tally, i = [], [], dict.fromkeys(counts, 0), k
+        start.wait()
+        while time.monotonic() < stop[0]:
+            t0 = time.perf_counter()
+            resp = http.post("/predict", json=bodies[i % len(bodies)])
+            mine.append(time.perf_counter() - t0)
+            i += clients
+            if resp.status_code == 503:
+                # Back off as told, like a well-behaved client.
+                tally["shed"] += 1
+                time.sleep(min(float(resp.headers.get("Retry-After", 0)), max(stop[0] - time.monotonic(), 0)))
+                continue
+            served.append(mine[-1])
+            if resp.status_code != 200:
+                tally["errors"] += 1
+            elif "X-Prediction-Degraded" in resp.headers:
+                tally["degraded"] += 1
+            else:
+                tally["ok"] += 1
+        with lock:
+            latencies.extend(mine)
+            answered.extend(served)
+            for key, value in tally.items():
+                counts[key] += value
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(clients)]
+    for t in threads:
+        t.start()
+    stop[0] = time.monotonic() + seconds
+    t0 = time.perf_counter()
+    start.wait()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    ms = np.asarray(latencies) * 1000
+    total = len(latencies)
+    return dict(rps=total / elapsed, p50=float(np.percentile(ms, 50)), p99=float(np.percentile(ms, 99)),
+                max=float(ms.max()), p99_answered=float(np.percentile(answered, 99)) * 1000 if answered else 0.0,
+                degraded=counts["degraded"] / total, shed=counts["shed"] / total, errors=counts["errors"])
+
+
+def check_budget_header(admission, budget=0.1):
+    saved, admission.budget = admission.budget, budget
+    failures = []
+    try:
+        for header, limit in (("-5", budget), ("0", budget), ("nan", budget), ("inf", budget), ("-inf", budget),
+                              ("1e9", budget), ("bogus", budget), ("10", 0.01)):
+            with api.app.test_request_context(headers={"X-Latency-Budget-Ms": header}):
+                deadline = api.request_deadline()
+            remaining = None if deadline is None else deadline - time.perf_counter()
+            if remaining is None or not 0 < remaining <= limit:
+                failures.append(f"X-Latency-Budget-Ms: {header} left {remaining} s, "
+                                f"expected at most {limit:g} s (server budget {budget:g} s)")
+    finally:
+        admission.budget = saved
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[4, 32, 128])
+    parser.add_argument("--budgets", type=float, nargs="+", default=[50, 100], help="latency budgets in ms")
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--ensemble-delay-ms", type=float, default=0, help="sleep added to each ensemble pass")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    api.models.wait()
+    pollutant_err, aqi_mean, aqi_max = fallback_error()
+    print(f"XGBoost-only vs ensemble: mean |pollutant error| {pollutant_err:.3f}, "
+          f"AQI difference mean {aqi_mean:.1f} max {aqi_max:.1f}")
+    if args.ensemble_delay_ms:
+        run_ensemble, delay = api.run_ensemble, args.ensemble_delay_ms / 1000
+
+        def slow_ensemble(arr):
+            time.sleep(delay)
+            return run_ensemble(arr)
+        api.run_ensemble = slow_ensemble
+    admission = api.admission
+    budget_failures = check_budget_header(admission)
+    for failure in budget_failures:
+        print(f"FAILED: {failure}")
+    admission.max_in_flight, admission.degrade = 0, False
+    run(4, 1.0)  # warm up
+
+    modes = [("off", 0, 0.0, False)] + [(f"budget {b:g} ms", args.max_in_flight, b / 1000, True)
+                                        for b in args.budgets]
+    print(f"\n{os.cpu_count()} CPUs, {args.seconds:g} s per run, {args.ensemble_delay_ms:g} ms added per ensemble pass")
+    print(f"{'clients':>7} {'admission':<16} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'p99 200':>8} {'degraded':>9} {'shed':>6}")
+    failed = False
+    for clients in args.clients:
+        for name, max_in_flight, budget, degrade in modes:
+            admission.max_in_flight, admission.budget, admission.degrade = max_in_flight, budget, degrade
+            r = run(clients, args.seconds)
+            failed |= r["errors"] > 0
+            print(f"{clients:>7} {name:<16} {r['rps']:>8.0f} {r['p50']:>8.2f} {r['p99']:>8.2f} {r['max']:>8.1f} "
+                  f"{r['p99_answered']:>8.2f} {r['degraded']:>8.1%} {r['shed']:>6.1%}")
+    return 1 if failed or budget_failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""Sequential fetch-and-insert per city versus one AQIPoller cycle.
+
+Both run against a local OpenWeather stub and a stand-in database that charges
+a fixed round-trip latency per statement and commit. The baseline is what
+write-on-read did for each city: one upstream call, one INSERT and one commit.
+
+Then checks snapshot staleness with a fake clock: a fresh snapshot is served
+as is; one older than ``max_age`` is refetched; if that refetch fails, the old
+reading comes back marked stale; a process whose poller is not running always
+refetches. Finally two pollers share one SQLite database like two gunicorn
+workers: a location first seen by the idle one must be known to, and polled
+by, the running one.
+
+Usage:
+    python benchmarks/bench_poller.py --cities 200 --workers 8 --latency 0.05 --db-latency 0.002
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from openweather import OpenWeatherClient  # noqa: E402
+from poller import AQIPoller  # noqa: E402
+from stubs import OpenWeatherStub, FakeDB, SQLiteDB  # noqa: E402
+from suite import SCHEMA  # noqa: E402
+
+
+def sequential(stub, db, stations):
+    t0 = time.perf_counter()
+    for city, (lat, lon) in stations.items():
+        resp = requests.get(f"{stub.url}/data/2.5/air_pollution", params={"lat": lat, "lon": lon, "appid": "x"}, timeout=5)
+        data = resp.json()["list"][0]
+        comp = data["components"]
+        with db.connect() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT IGNORE INTO history_aqi (date,city,AQI,`PM2.5`,PM10,NO2) VALUES(%s,%s,%s,%s,%s,%s)",
+                ("2024-01-01", city, data["main"]["aqi"], comp.get("pm2_5"), comp.get("pm10"), comp.get("no2"))
+            )
+            conn.commit()
+    return time.perf_counter() - t0
+
+
+class Unreachable:
+    def current(self, lat, lon):
+        raise ConnectionError("upstream down")
+
+
+def check_staleness(stub, db, stations):
+    now = [1_000_000.0]
+    client = OpenWeatherClient("x", base_url=stub.url)
+    poller = AQIPoller(client, db.connect, stations=stations, interval=600, clock=lambda: now[0])
+    poller.start()
+    while not poller.stats()["cycles"]:
+        time.sleep(0.01)
+    city, (lat, lon) = next(iter(stations.items()))
+    failures = []
+    if poller.latest_or_fetch(city, lat, lon)["fetched_at"] != now[0] or poller.stats()["on_demand_fetches"]:
+        failures.append("a fresh snapshot was not served as is")
+    now[0] += poller.max_age + 1  # cycles stopped: the snapshot ages out
+    reading = poller.latest_or_fetch(city, lat, lon)
+    if reading["fetched_at"] != now[0] or reading.get("stale") or poller.stats()["on_demand_fetches"] != 1:
+        failures.append(f"an aged-out snapshot was not refetched: {reading}")
+    now[0] += poller.max_age + 1
+    poller.client = Unreachable()
+    reading = poller.latest_or_fetch(city, lat, lon)
+    if not reading.get("stale") or poller.stats()["stale_served"] != 1:
+        failures.append(f"a failed refetch did not mark the old reading stale: {reading}")
+    poller.client = client
+    poller.latest_or_fetch(city, lat, lon)  # fresh again
+    poller.stop()
+    fetches = poller.stats()["on_demand_fetches"]
+    poller.latest_or_fetch(city, lat, lon)
+    if poller.stats()["on_demand_fetches"] != fetches + 1:
+        failures.append("a process that does not poll served its own snapshot")
+    return failures
+
+
+def check_shared_tracking(stub):
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir:
+        db = SQLiteDB(os.path.join(workdir, "shared.db"))
+        db.raw.executescript(SCHEMA)
+        polling = AQIPoller(OpenWeatherClient("x", base_url=stub.url), lambda: db)
+        idle = AQIPoller(OpenWeatherClient("x", base_url=stub.url), lambda: db)
+        idle.latest_or_fetch("Nagpur", 21.15, 79.09)
+        if not polling.knows("Nagpur"):
+            failures.append("the polling worker does not know a city tracked by another worker")
+        if polling.knows("Atlantis"):
+            failures.append("an unknown city was accepted")
+        if "Nagpur" not in polling._targets():
+            failures.append("the polling worker's cycles leave out a city tracked by another worker")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="upstream latency (s)")
+    parser.add_argument("--db-latency", type=float, default=0.002, help="DB round trip (s)")
+    args = parser.parse_args()
+
+    # Half the cities come from configured stations, half from subscriptions (geocoded).
+    n_stations = args.cities // 2
+    stations = {f"Station{i}": (10 + i * 0.01, 75 + i * 0.01) for i in range(n_stations)}
+    subscriber_cities = [f"City{i}" for i in range(args.cities - n_stations)]
+
+    with OpenWeatherStub(latency=args.latency) as stub:
+        db = FakeDB(latency=args.db_latency)
+        all_stations = dict(stations, **{c: (20 + i * 0.01, 80 + i * 0.01) for i, c in enumerate(subscriber_cities)})
+        elapsed = sequential(stub, db, all_stations)
+        print(f"sequential   {elapsed:7.2f} s  {db.statements} statements, {db.commits} commits, {db.rows} rows")
+
+        db = FakeDB(cities=subscriber_cities, latency=args.db_latency)
+        client = OpenWeatherClient("x", base_url=stub.url, pool_size=args.workers)
+        poller = AQIPoller(client, db.connect, stations=stations, workers=args.workers)
+        for label in ("poller cold", "poller warm"):
+            before = (db.statements, db.commits)
+            written = poller.poll_once()
+            stats = poller.stats()
+            print(f"{label:<12} {stats['last_cycle_seconds']:7.2f} s  {db.statements - before[0]} statements, "
+                  f"{db.commits - before[1]} commits, {written} rows")
+        if written != args.cities or stats["fetch_errors"]:
+            raise SystemExit(f"cycle incomplete: {stats}")
+        print("cold includes one-off geocoding of subscriber cities")
+
+        failures = check_staleness(stub, FakeDB(), dict(list(stations.items())[:3]))
+        if failures:
+            raise SystemExit("staleness: " + "; ".join(failures))
+        print("staleness: fresh served, aged-out refetched, failed refetch marked stale, idle process refetches")
+        failures = check_shared_tracking(stub)
+        if failures:
+            raise SystemExit("shared tracking: " + "; ".join(failures))
+        print("shared tracking: a city seen by one worker is known to and polled by the other")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Accuracy and cost of serving the LSTM at reduced precision (MODEL_PRECISION).
+
+Replays a held-out set of meteorological rows through the /predict ensemble
+with the LSTM at each precision and compares against float32: max and mean
+absolute pollutant error, overall AQI difference and how many rows change
+AQI category (the dashboard's Good ... Hazardous bands). Also reports the
+median latency of the LSTM alone and of the whole ensemble pass at
+``--batch`` sizes, the LSTM weight bytes at rest (int8 counts its scales) and
+as served, and the peak memory NumPy allocates during one 256-row LSTM pass.
+The last line names the fastest precision that flips no category.
+
+``--rows`` reads a CSV with RH, WS (or "WS (m/s)"), Temp and BP (or
+"BP (mmHg)") columns; without it, ``--n`` rows are drawn uniformly over the
+ranges the other benchmarks use. The models must be exported under models/.
+
+Usage:
+    python benchmarks/bench_precision.py --rows heldout.csv --batch 1 256
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.update(POLL_ENABLED="0", STREAM_ENABLED="0", BACKGROUND_SERVICES="0", MODEL_PRELOAD="1")
+os.chdir(BACKEND_DIR)
+
+import real_time_api as api  # noqa: E402
+from aqi import compute_aqi_array, aqi_categories, CATEGORIES  # noqa: E402
+from lstm_numpy import PRECISIONS, NumpyLSTMModel, quantize_int8, read_npz  # noqa: E402
+
+COLUMNS = {"RH": ("RH",), "WS": ("WS", "WS (m/s)"), "Temp": ("Temp",), "BP": ("BP", "BP (mmHg)")}
+
+
+def load_rows(path):
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        names = [next(c for c in candidates if c in reader.fieldnames) for candidates in COLUMNS.values()]
+        rows = [[float(r[name]) for name in names] for r in reader if all(r[name] for name in names)]
+    return np.asarray(rows, dtype=float)
+
+
+def lstm_at(precision):
+    bundle = api.current_bundle()
+    if bundle is not None:
+        return bundle.lstm(precision=precision)
+    return NumpyLSTMModel.load(os.path.join(api.MODELS_DIR, "lstm_multi_pollutants_model.npz"), precision=precision)
+
+
+def stored_bytes(precision):
+    _, arrays = read_npz(os.path.join(api.MODELS_DIR, "lstm_multi_pollutants_model.npz"))
+    total = 0
+    for name, a in arrays.items():
+        if precision == "float16":
+            total += a.size * 2
+        elif precision == "int8" and name.endswith("kernel"):
+            q, scale = quantize_int8(a)
+            total += q.nbytes + scale.nbytes
+        else:
+            total += a.size * 4
+    return total
+
+
+def median_ms(fn, arg, repeat):
+    fn(arg)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", help="CSV of held-out meteorological rows")
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--precisions", nargs="+", default=list(PRECISIONS), choices=PRECISIONS)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 256])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    api.models.wait()
+    scaler = api.models.get("scaler_meteo")
+    forest = api.models.get("forest")
+    pollutant_scaler = api.models.get("pollutant_scaler")
+    if args.rows:
+        rows = load_rows(args.rows)
+    else:
+        rows = np.random.default_rng(args.seed).uniform([10, 0, 0, 740], [95, 10, 40, 780], size=(args.n, 4))
+    scaled = scaler.transform(rows)
+    xgb_out = forest.predict(scaled)
+    seq = np.repeat(scaled[:, None, :], api.LSTM_TIMESTEPS, axis=1)
+
+    def ensemble(lstm):
+        def run(arr):
+            s = scaler.transform(arr)
+            return api.combine_outputs(forest.predict(s), lstm.predict(
+                np.repeat(s[:, None, :], api.LSTM_TIMESTEPS, axis=1)), pollutant_scaler)
+        return run
+
+    results, reference = {}, None
+    for precision in args.precisions if "float32" in args.precisions else ["float32"] + args.precisions:
+        lstm = lstm_at(precision)
+        out = api.combine_outputs(xgb_out, lstm.predict(seq), pollutant_scaler).astype(np.float64)
+        overall, _ = compute_aqi_array(out)
+        if reference is None:
+            reference = (out, overall, aqi_categories(overall))
+        err = np.abs(out - reference[0])
+        aqi_diff = np.abs(overall - reference[1])
+        flips = aqi_categories(overall) != reference[2]
+        sample = rows[:256]
+        tracemalloc.start()
+        lstm.predict(np.repeat(scaler.transform(sample)[:, None, :], api.LSTM_TIMESTEPS, axis=1))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        served = sum(p.nbytes for _, params in lstm.layers for p in params.values())
+        results[precision] = dict(
+            max_err=float(err.max()), mean_err=float(err.mean()), max_aqi=float(aqi_diff.max()),
+            mean_aqi=float(aqi_diff.mean()), flips=int(flips.sum()), stored=stored_bytes(precision), served=served,
+            peak=peak,
+            lstm_ms={b: median_ms(lstm.predict, seq[:b], args.repeat) for b in args.batch},
+            pass_ms={b: median_ms(ensemble(lstm), rows[:b], args.repeat) for b in args.batch},
+        )
+
+    n = len(rows)
+    print(f"{n} rows ({args.rows or 'synthetic'}); errors against float32, categories: {', '.join(CATEGORIES)}")
+    print(f"{'precision':<10} {'max err':>9} {'mean err':>9} {'max dAQI':>9} {'mean dAQI':>10} {'flips':>12}")
+    for precision, r in results.items():
+        print(f"{precision:<10} {r['max_err']:>9.4f} {r['mean_err']:>9.5f} {r['max_aqi']:>9.3f} "
+              f"{r['mean_aqi']:>10.5f} {r['flips']:>5} ({r['flips'] / n:.2%})")
+    print(f"\n{'precision':<10} " + " ".join(f"{f'lstm@{b} ms':>12} {f'pass@{b} ms':>12}" for b in args.batch)
+          + f" {'stored kB':>10} {'served kB':>10} {'peak kB':>8}")
+    for precision, r in results.items():
+        print(f"{precision:<10} " + " ".join(f"{r['lstm_ms'][b]:>12.3f} {r['pass_ms'][b]:>12.3f}" for b in args.batch)
+              + f" {r['stored'] / 1024:>10.1f} {r['served'] / 1024:>10.1f} {r['peak'] / 1024:>8.1f}")
+
+    largest = max(args.batch)
+    safe = [p for p, r in results.items() if r["flips"] == 0]
+    best = min(safe, key=lambda p: results[p]["pass_ms"][largest])
+    print(f"\nfastest precision with no category flips at batch {largest}: {best}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
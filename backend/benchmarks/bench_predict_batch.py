@@ -0,0 +1,54 @@
+"""Compare /predict/batch throughput against looping over /predict.
+
+Usage:
+    python benchmarks/bench_predict_batch.py --rows 500 --repeat 3
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Measure the ensemble itself, not the prediction cache.
+os.environ.setdefault("PREDICT_CACHE_SIZE", "0")
+import real_time_api  # noqa: E402
+
+def random_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {"RH": float(rng.uniform(10, 100)), "WS": float(rng.uniform(0, 15)),
+         "Temp": float(rng.uniform(0, 45)), "BP": float(rng.uniform(720, 1050))}
+        for _ in range(n)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    client = real_time_api.app.test_client()
+    rows = random_rows(args.rows)
+
+    single_best, batch_best = float("inf"), float("inf")
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        singles = [client.post("/predict", json=row).get_json() for row in rows]
+        single_best = min(single_best, time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        batch = client.post("/predict/batch", json={"rows": rows}).get_json()["predictions"]
+        batch_best = min(batch_best, time.perf_counter() - t0)
+
+    mismatches = sum(1 for a, b in zip(singles, batch) if a != b)
+    print(f"rows={args.rows} repeat={args.repeat}")
+    print(f"single-row loop : {args.rows / single_best:10.1f} rows/s ({single_best * 1000:.1f} ms)")
+    print(f"/predict/batch  : {args.rows / batch_best:10.1f} rows/s ({batch_best * 1000:.1f} ms)")
+    print(f"speedup         : {single_best / batch_best:10.1f}x")
+    print(f"rows differing from /predict: {mismatches}")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Check the /predict cache keys and time quantize() over a batch.
+
+By default the cache keys rows on their exact values: a row must come back
+unchanged, and only an identical row may share its key. With a snapping
+resolution, nearby rows must share a key and distinct ones must not. In both
+modes rows holding NaN, an infinity or a value too large to snap (1e300) must
+get no key, so they bypass the cache; before they all shared the key of
+INT64_MIN and were served each other's predictions. Then reports quantize()
+time for ``--rows`` rows.
+
+``--resolution`` also runs ``--rows`` random rows through the ensemble as given
+and snapped to that step, and reports how far snapping moves the predicted
+pollutants and AQI. The models must be exported under models/.
+
+Usage:
+    python benchmarks/bench_prediction_cache.py --rows 10000 --resolution 0.01
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+from prediction_cache import PredictionCache  # noqa: E402
+
+
+def check_exact_keys(cache):
+    rows = np.array([
+        [60.0, 2.5, 28.0, 1005.0],
+        [60.0, 2.5, 28.0, 1005.0],
+        [60.004, 2.5, 28.0, 1005.0],
+        [np.nan, 2.5, 28.0, 1005.0],
+        [1e300, 2.5, 28.0, 1005.0],
+    ])
+    values, keys = cache.quantize(rows)
+    failures = []
+    if not np.array_equal(values, rows, equal_nan=True):
+        failures.append("exact keys altered the rows sent to the model")
+    if keys[0] is None or keys[0] != keys[1] or keys[0] == keys[2]:
+        failures.append(f"exact keys: identical rows must share a key and no others: {keys[:3]}")
+    if keys[3] is not None or keys[4] is None:
+        failures.append(f"exact keys: only the NaN row should bypass: {keys[3:]}")
+    return failures
+
+
+def check_keys(cache):
+    rows = np.array([
+        [60.0, 2.5, 28.0, 1005.0],
+        [60.001, 2.5, 28.0, 1005.0],  # snaps onto the first row
+        [61.0, 2.5, 28.0, 1005.0],
+        [np.nan, 2.5, 28.0, 1005.0],
+        [60.0, np.inf, 28.0, 1005.0],
+        [60.0, 2.5, -np.inf, 1005.0],
+        [1e300, 2.5, 28.0, 1005.0],
+        [60.0, 2.5, 28.0, -1e300],
+    ])
+    snapped, keys = cache.quantize(rows)
+    failures = []
+    if keys[0] is None or keys[0] != keys[1] or keys[0] == keys[2]:
+        failures.append(f"valid rows keyed wrongly: {keys[:3]}")
+    if any(key is not None for key in keys[3:]):
+        failures.append(f"invalid rows got keys: {keys[3:]}")
+    if not np.array_equal(snapped[3:], rows[3:], equal_nan=True):
+        failures.append("invalid rows were altered on their way to the model")
+    cache.put(keys[3], 0, "nan result")
+    if cache.get(keys[6], 0) is not None or cache.stats()["size"] != 0:
+        failures.append("an invalid row was stored or served from the cache")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--resolution", help="snapping step(s) whose prediction error to report")
+    args = parser.parse_args()
+
+    failures = check_exact_keys(PredictionCache(maxsize=16)) + check_keys(PredictionCache(maxsize=16, resolution=0.01))
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    if not failures:
+        print("cache keys: ok (exact by default; NaN, inf and huge rows bypass the cache)")
+
+    rows = np.random.default_rng(0).uniform([10, 0, 0, 740], [95, 10, 40, 780], size=(args.rows, 4))
+    for name, cache in (("exact", PredictionCache(maxsize=16)),
+                        ("snapped", PredictionCache(maxsize=16, resolution=args.resolution or 0.01))):
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            cache.quantize(rows)
+            best = min(best, time.perf_counter() - t0)
+        print(f"quantize {args.rows} rows ({name}): {best * 1000:.2f} ms")
+    if args.resolution:
+        snapping_error(rows, PredictionCache(resolution=args.resolution))
+    return 1 if failures else 0
+
+
+def snapping_error(rows, cache):
+    os.environ.update(POLL_ENABLED="0", STREAM_ENABLED="0", BACKGROUND_SERVICES="0", MODEL_PRELOAD="1")
+    os.chdir(BACKEND_DIR)
+    import real_time_api as api
+    from aqi import compute_aqi_array
+    api.models.wait()
+    exact = api.ensemble_predict(rows).astype(np.float64)
+    snapped = api.ensemble_predict(cache.quantize(rows)[0]).astype(np.float64)
+    err = np.abs(snapped - exact)
+    aqi = np.abs(compute_aqi_array(snapped)[0] - compute_aqi_array(exact)[0])
+    print(f"snapping to {cache.resolution.tolist()}: |pollutant change| mean {err.mean():.3f} max {err.max():.3f}, "
+          f"|AQI change| mean {aqi.mean():.2f} max {aqi.max():.2f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
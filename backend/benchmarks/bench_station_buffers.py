@@ -0,0 +1,162 @@
+"""Per-station LSTM inputs: windowed vs stateful evaluation across many stations.
+
+Feeds every station one synthetic observation per tick and reports, per tick,
+the time to record the observations and to produce LSTM outputs for all
+stations, plus single-station latency and buffer memory. Also checks that the
+ring buffer returns each station's real last observations in order, that a
+single observation matches the old repeated-row input, that a batch at
+capacity never evicts a station it also writes (each row stays in its own
+station's window) and that a batch naming more stations than fit is rejected,
+and how far stateful outputs drift from windowed ones once the history is
+longer than the window.
+
+Usage:
+    python -W ignore benchmarks/bench_station_buffers.py --stations 450 --ticks 40
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+from lstm_numpy import NumpyLSTMModel, DEFAULT_NPZ  # noqa: E402
+from station_buffers import StationBuffers  # noqa: E402
+
+TIMESTEPS = 10
+# RH, WS (m/s), Temp, BP (mmHg)
+LOW = np.array([20.0, 0.0, 5.0, 740.0])
+HIGH = np.array([100.0, 10.0, 45.0, 770.0])
+
+
+def observations(n_stations, ticks, seed=0):
+    rng = np.random.default_rng(seed)
+    start = rng.uniform(LOW, HIGH, size=(n_stations, 4))
+    walk = np.cumsum(rng.normal(0, (HIGH - LOW) / 50, size=(ticks, n_stations, 4)), axis=0)
+    return np.clip(start + walk, LOW, HIGH)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def check_eviction(capacity=4):
+    failures = []
+    buffers = StationBuffers(TIMESTEPS, 4, capacity=capacity)
+    old = [f"old-{i}" for i in range(capacity)]
+    buffers.append(old, np.zeros((capacity, 4)), ts=np.ones(capacity))
+    # The least recently written station comes first, then as many new ones as
+    # leave it room: the new ones must evict the others, not it or each other.
+    batch = old[:1] + [f"new-{i}" for i in range(capacity - 1)]
+    rows = np.arange(capacity * 4, dtype=float).reshape(capacity, 4) + 1
+    buffers.append(batch, rows, ts=np.full(capacity, 2.0))
+    try:
+        windows, _ = buffers.windows(buffers.lookup(batch))
+        if not np.array_equal(windows[:, -1], rows):
+            failures.append("rows of one batch landed in another station's window")
+    except KeyError as e:
+        failures.append(f"a station written by the batch was evicted by it: {e}")
+    try:
+        buffers.append([f"extra-{i}" for i in range(capacity + 1)], np.zeros((capacity + 1, 4)))
+        failures.append(f"a batch of {capacity + 1} stations was accepted by {capacity} slots")
+    except ValueError:
+        pass
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=450)
+    parser.add_argument("--ticks", type=int, default=40)
+    parser.add_argument("--single", type=int, default=500, help="single-station reads per mode")
+    args = parser.parse_args()
+
+    from joblib import load as joblib_load
+    scaler = joblib_load(os.path.join(BACKEND_DIR, "models", "scaler_meteo.joblib"))
+    model = NumpyLSTMModel.load(DEFAULT_NPZ)
+    transform = scaler.transform
+    names = [f"station-{i:04d}" for i in range(args.stations)]
+    obs = observations(args.stations, args.ticks)
+
+    window = StationBuffers(TIMESTEPS, 4, capacity=args.stations, mode="window")
+    stateful = StationBuffers(TIMESTEPS, 4, capacity=args.stations, mode="stateful")
+    timings = {"window": [], "stateful": [], "repeat (old)": []}
+    eviction_failures = check_eviction()
+    for failure in eviction_failures:
+        print(f"eviction: {failure}")
+    ok = not eviction_failures
+    drift = []
+    for t in range(args.ticks):
+        ts = np.full(args.stations, 1_700_000_000.0 + 3600 * t)
+
+        t0 = time.perf_counter()
+        window.append(names, obs[t], ts)
+        slots = window.lookup(names)
+        windows, _ = window.windows(slots)
+        scaled = transform(windows.reshape(-1, 4)).reshape(windows.shape)
+        win_out = model.predict(scaled)
+        timings["window"].append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        stateful.append(names, obs[t], ts, model=model, transform=transform, key=1)
+        state_out = stateful.lstm_outputs(stateful.lookup(names), model, transform, key=1)
+        timings["stateful"].append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        old_out = model.predict(np.repeat(transform(obs[t])[:, None, :], TIMESTEPS, axis=1))
+        timings["repeat (old)"].append(time.perf_counter() - t0)
+
+        expected = obs[max(0, t - TIMESTEPS + 1):t + 1].transpose(1, 0, 2)
+        if not np.array_equal(windows[:, TIMESTEPS - expected.shape[1]:], expected):
+            print(f"tick {t}: ring buffer window does not match the observation history")
+            ok = False
+        if t == 0 and np.abs(win_out - old_out).max() > 1e-6:
+            print("first observation does not match the repeated-row input")
+            ok = False
+        if t == TIMESTEPS - 1 and np.abs(win_out - state_out).max() > 1e-5:
+            print(f"stateful != windowed with exactly {TIMESTEPS} observations")
+            ok = False
+        drift.append(float(np.abs(win_out - state_out).mean()))
+
+    print(f"{args.stations} stations, {args.ticks} ticks (ms per tick, all stations)")
+    print(f"{'mode':<14} {'p50':>8} {'p95':>8} {'per station us':>15}")
+    for mode, samples in timings.items():
+        print(f"{mode:<14} {percentile_ms(samples, 50):>8.3f} {percentile_ms(samples, 95):>8.3f} "
+              f"{np.median(samples) / args.stations * 1e6:>15.2f}")
+
+    # One station at a time, as /predict/station and a single POST /observations would.
+    rng = np.random.default_rng(1)
+    picks = rng.integers(0, args.stations, size=args.single)
+    single = {"window": [], "stateful": []}
+    for n, i in enumerate(picks):
+        row = obs[-1, i:i + 1]
+        ts = [1_700_000_000.0 + 3600 * (args.ticks + n)]
+        t0 = time.perf_counter()
+        window.append([names[i]], row, ts)
+        w, _ = window.windows(window.lookup([names[i]]))
+        model.predict(transform(w.reshape(-1, 4)).reshape(w.shape))
+        single["window"].append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        stateful.append([names[i]], row, ts, model=model, transform=transform, key=1)
+        stateful.lstm_outputs(stateful.lookup([names[i]]), model, transform, key=1)
+        single["stateful"].append(time.perf_counter() - t0)
+    print("single station observe + LSTM output (ms)")
+    for mode, samples in single.items():
+        print(f"{mode:<14} p50 {percentile_ms(samples, 50):.3f}  p95 {percentile_ms(samples, 95):.3f}")
+
+    t0 = time.perf_counter()
+    stateful.lstm_outputs(stateful.lookup(names), model, transform, key=2)
+    print(f"stateful reprime after a model reload: {(time.perf_counter() - t0) * 1000:.2f} ms")
+
+    for name, buffers in (("window", window), ("stateful", stateful)):
+        print(f"{name} buffers: {buffers.nbytes() / 1024:.1f} KiB "
+              f"({buffers.nbytes() / args.stations:.0f} B per station, fixed)")
+    print(f"mean |stateful - window| (scaled units): tick {TIMESTEPS}: {drift[TIMESTEPS - 1]:.2e}, "
+          f"last tick: {drift[-1]:.2e}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
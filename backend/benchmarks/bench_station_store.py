@@ -0,0 +1,124 @@
+"""Windowed reads: merged CSV versus partitioned Parquet versus memmap arrays.
+
+Generates sample station CSVs, ingests them to Parquet (ingest.py), builds the
+memmap store (station_store.py) and a merged CSV like the notebooks use, then
+times reading one station's window of hours from each. Values are checked to
+match across all three.
+
+Usage:
+    python benchmarks/bench_station_store.py --stations 40 --days 730 --window 168
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingest import make_sample, run, VALUE_COLUMNS  # noqa: E402
+from station_store import StationStore, build_from_parquet  # noqa: E402
+
+COLUMNS = ["PM2.5", "PM10", "NO2", "SO2", "CO", "Ozone"]
+
+
+def timed(fn, n):
+    out, lat = None, []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        out = fn()
+        lat.append((time.perf_counter() - t0) * 1e3)
+    return np.percentile(lat, 50), out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=40)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--window", type=int, default=168, help="hours per read")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--csv-queries", type=int, default=3)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        t0 = time.perf_counter()
+        info, data_dir = make_sample(os.path.join(root, "sample"), args.stations, args.days)
+        parquet_dir, arrays_dir = os.path.join(root, "parquet"), os.path.join(root, "arrays")
+        run(info, data_dir, parquet_dir, log=lambda *_: None)
+        build_from_parquet(parquet_dir, arrays_dir, log=lambda *_: None)
+        store = StationStore(arrays_dir)
+        stations = store.stations()
+
+        # The merged CSV the notebooks reload, with canonical column names
+        merged = os.path.join(root, "merged.csv")
+        for i, station in enumerate(stations):
+            w = store.read_window(station, *store.time_range(station)[:1], np.datetime64("2100-01-01"))
+            frame = pd.DataFrame({"From Date": w["ts"], **{c: w[c] for c in VALUE_COLUMNS}})
+            frame["Station"] = station
+            frame.to_csv(merged, mode="a", index=False, header=i == 0)
+        print(f"{len(stations)} stations x {args.days} days prepared in {time.perf_counter() - t0:.0f} s; "
+              f"merged CSV {os.path.getsize(merged) / 2**20:.0f} MB")
+
+        rng = random.Random(0)
+        first, last = store.time_range(stations[0])
+        span_hours = int((last - first) / np.timedelta64(1, "h")) - args.window
+
+        def pick():
+            station = rng.choice(stations)
+            start = first + np.timedelta64(rng.randrange(span_hours), "h")
+            return station, start, start + np.timedelta64(args.window, "h")
+
+        def from_csv():
+            station, start, end = pick()
+            df = pd.read_csv(merged, parse_dates=["From Date"])
+            df = df[(df["Station"] == station) & (df["From Date"] >= start) & (df["From Date"] < end)]
+            return df[COLUMNS].to_numpy(np.float32)
+
+        import pyarrow.dataset as ds
+        dataset = ds.dataset(parquet_dir, format="parquet", partitioning="hive",
+                             exclude_invalid_files=True, ignore_prefixes=[".", "_"])
+
+        def from_parquet():
+            station, start, end = pick()
+            months = {str(m) for m in np.arange(start.astype("datetime64[M]"), end.astype("datetime64[M]") + 1)}
+            flt = ((ds.field("station") == station) & ds.field("month").isin(sorted(months))
+                   & (ds.field("ts") >= pd.Timestamp(start)) & (ds.field("ts") < pd.Timestamp(end)))
+            return dataset.to_table(columns=COLUMNS, filter=flt).to_pandas().to_numpy(np.float32)
+
+        def from_memmap():
+            station, start, end = pick()
+            w = store.read_window(station, start, end, COLUMNS)
+            return np.column_stack([w[c] for c in COLUMNS])
+
+        def from_memmap_cold():
+            station, start, end = pick()
+            w = StationStore(arrays_dir).read_window(station, start, end, COLUMNS)
+            return np.column_stack([w[c] for c in COLUMNS])
+
+        # Same window from all three sources
+        for fn in (from_csv, from_parquet, from_memmap):
+            rng.seed(42)
+            got = fn()
+            ref = got if fn is from_csv else ref
+            if not np.array_equal(got, ref, equal_nan=True):
+                raise SystemExit(f"{fn.__name__} returned different values")
+        print(f"parity: {len(ref)} rows x {len(COLUMNS)} columns identical across sources")
+
+        print(f"{'source':<22} {'p50 ms':>10}")
+        for label, fn, n in [("merged CSV (pandas)", from_csv, args.csv_queries),
+                             ("Parquet (pyarrow)", from_parquet, args.queries),
+                             ("memmap, fresh open", from_memmap_cold, args.queries),
+                             ("memmap, warm", from_memmap, args.queries)]:
+            p50, _ = timed(fn, n)
+            print(f"{label:<22} {p50:>10.3f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
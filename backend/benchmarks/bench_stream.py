@@ -0,0 +1,158 @@
+"""Load test for the SSE stream: connections held and update fan-out latency.
+
+A child process runs StreamServer and publishes on command; this process opens
+``--connections`` idle EventSource-style connections spread over ``--cities``,
+then publishes ``--rounds`` updates per city and measures the delay from
+publish to receipt on every connection. Reports the server's RSS per held
+connection and the p50/p95/p99 delivery latency and the time until the last
+listener of an update has it. ``--slow`` extra connections stop reading after
+the headers; with a large ``--payload-kb`` they fill their socket buffers,
+which exercises superseding and slow-client disconnects without delaying the
+others.
+
+Usage:
+    python benchmarks/bench_stream.py --connections 5000 --cities 10 --rounds 20
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+from stream import raise_fd_limit  # noqa: E402
+
+# Server process: prints its port, then serves commands from stdin.
+SERVER = """
+import sys, json, time
+from stream import StreamServer
+server = StreamServer(port=0, heartbeat=15, write_timeout=float(sys.argv[2])).start()
+pad = "x" * (int(sys.argv[1]) * 1024)
+print(server.port, flush=True)
+for line in sys.stdin:
+    cmd, *args = line.split()
+    if cmd == "pub":
+        server.publish(args[0], "live", {"seq": int(args[1]), "t": time.time(), "AQI": 3, "pad": pad})
+        print("ok", flush=True)
+    elif cmd == "rss":
+        with open("/proc/self/status") as f:
+            rss = next(int(l.split()[1]) for l in f if l.startswith("VmRSS"))
+        print(json.dumps(dict(server.stats(), rss_kb=rss)), flush=True)
+"""
+
+
+class Listener:
+    def __init__(self, city):
+        self.city = city
+        self.latencies = {}  # seq -> seconds
+
+
+async def listen(port, listener, ready, slow=False):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1 << 22)
+    writer.write(f"GET /stream?city={listener.city} HTTP/1.1\r\nHost: x\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    ready()
+    if slow:
+        await asyncio.sleep(3600)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.startswith(b"data: "):
+                data = json.loads(line[6:])
+                listener.latencies[data["seq"]] = time.time() - data["t"]
+    finally:
+        writer.close()
+
+
+async def run(args):
+    raise_fd_limit()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", SERVER, str(args.payload_kb), str(args.write_timeout), cwd=BACKEND_DIR,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE)
+
+    async def command(line):
+        proc.stdin.write((line + "\n").encode())
+        await proc.stdin.drain()
+        return (await proc.stdout.readline()).decode().strip()
+
+    port = int((await proc.stdout.readline()).decode())
+    idle = json.loads(await command("rss"))
+
+    cities = [f"City{i}" for i in range(args.cities)]
+    listeners = [Listener(cities[i % args.cities]) for i in range(args.connections)]
+    slow = [Listener(cities[i % args.cities]) for i in range(args.slow)]
+    connected = 0
+
+    def ready():
+        nonlocal connected
+        connected += 1
+
+    t0 = time.perf_counter()
+    tasks = [asyncio.ensure_future(listen(port, listener, ready, slow=True)) for listener in slow]
+    for start in range(0, len(listeners), 500):
+        tasks += [asyncio.ensure_future(listen(port, listener, ready)) for listener in listeners[start:start + 500]]
+        while connected < min(start + 500, len(listeners)) + len(slow):
+            await asyncio.sleep(0.01)
+    connect_seconds = time.perf_counter() - t0
+    await asyncio.sleep(0.5)
+    held = json.loads(await command("rss"))
+
+    per_listener = args.connections // args.cities
+    delivery, last_listener = [], []
+    for seq in range(args.rounds):
+        for city in cities:
+            await command(f"pub {city} {seq}")
+        deadline = time.monotonic() + 10
+        while any(seq not in listener.latencies for listener in listeners) and time.monotonic() < deadline:
+            await asyncio.sleep(0.005)
+        got = [listener.latencies[seq] for listener in listeners if seq in listener.latencies]
+        delivery += got
+        last_listener.append(max(got))
+        await asyncio.sleep(args.pause)
+    missing = args.connections * args.rounds - len(delivery)
+    final = json.loads(await command("rss"))
+
+    for task in tasks:
+        task.cancel()
+    proc.stdin.close()
+    proc.terminate()
+    await proc.wait()
+
+    ms = lambda values, q: float(np.percentile(values, q)) * 1000  # noqa: E731
+    print(f"{args.connections} connections over {args.cities} cities ({per_listener} listeners per update), "
+          f"{args.rounds} rounds")
+    print(f"connected in {connect_seconds:.2f} s ({args.slow} of them not reading); server held {held['connections']} "
+          f"(peak {final['peak_connections']}), rejected {final['rejected']}")
+    print(f"server RSS idle {idle['rss_kb'] / 1024:.1f} MB, holding {held['rss_kb'] / 1024:.1f} MB "
+          f"({(held['rss_kb'] - idle['rss_kb']) / (args.connections + args.slow):.1f} KB per connection)")
+    print(f"delivery latency  p50 {ms(delivery, 50):.2f} ms  p95 {ms(delivery, 95):.2f} ms  "
+          f"p99 {ms(delivery, 99):.2f} ms")
+    print(f"last listener     p50 {ms(last_listener, 50):.2f} ms  p95 {ms(last_listener, 95):.2f} ms")
+    print(f"frames sent {final['frames_sent']}, superseded {final['superseded']}, "
+          f"slow disconnects {final['slow_disconnects']}, missing deliveries {missing}")
+    return 0 if missing == 0 and held["connections"] == args.connections + args.slow else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--cities", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds between rounds")
+    parser.add_argument("--slow", type=int, default=0, help="extra connections that never read")
+    parser.add_argument("--payload-kb", type=int, default=0, help="padding added to each update")
+    parser.add_argument("--write-timeout", type=float, default=10.0)
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
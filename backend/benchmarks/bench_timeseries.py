@@ -0,0 +1,147 @@
+"""History query latency: raw hourly rows versus the daily/monthly rollups.
+
+Builds a synthetic multi-year hourly dataset for many stations in SQLite (the
+schema mirrors aqi.sql), runs a full compaction, then times typical chart
+queries read from raw readings and from the level fetch_series picks. Also
+checks rollup values against NumPy on raw data, times an incremental
+compaction after one new hour of readings, and checks that a row stamped before
+the watermark (a transaction that committed late) is still rolled up.
+
+Usage:
+    python benchmarks/bench_timeseries.py --stations 450 --years 2 --queries 50
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import timeseries  # noqa: E402
+from timeseries import METRICS, rollup_columns, compact, fetch_series, insert_readings  # noqa: E402
+from stubs import SQLiteDB  # noqa: E402
+
+
+def create_schema(db):
+    metric_cols = ", ".join(f"`{m}` REAL" for m in METRICS)
+    rollup_cols = ", ".join(f"`{c}` REAL" for c in rollup_columns())
+    with db.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE aqi_readings (station TEXT NOT NULL, ts TEXT NOT NULL, {metric_cols}, "
+                       "inserted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (station, ts))")
+        cursor.execute("CREATE INDEX idx_readings_inserted ON aqi_readings (inserted_at)")
+        for table in ("aqi_rollup_daily", "aqi_rollup_monthly"):
+            cursor.execute(f"CREATE TABLE {table} (station TEXT NOT NULL, bucket TEXT NOT NULL, n INTEGER NOT NULL, "
+                           f"{rollup_cols}, PRIMARY KEY (station, bucket))")
+        cursor.execute("CREATE TABLE aqi_rollup_state (name TEXT PRIMARY KEY, watermark TIMESTAMP)")
+    db.commit()
+
+
+def load(db, stations, start, hours, seed=0):
+    rng = np.random.default_rng(seed)
+    ts = (np.datetime64(start, "s") + np.arange(hours) * np.timedelta64(3600, "s")).astype(str)
+    ts = np.char.replace(ts, "T", " ")
+    t = np.arange(hours)
+    seasonal = 1 + 0.5 * np.cos(2 * np.pi * t / 8766)
+    diurnal = 1 + 0.3 * np.sin(2 * np.pi * t / 24)
+    scale = np.array([120, 60, 80, 25, 15, 1.2, 40])
+    cols = ", ".join(["station", "ts"] + [f"`{m}`" for m in METRICS])
+    sql = f"INSERT INTO aqi_readings ({cols}) VALUES ({', '.join(['%s'] * (len(METRICS) + 2))})"
+    for station in stations:
+        values = (seasonal * diurnal)[:, None] * scale * rng.lognormal(0, 0.3, (hours, len(METRICS)))
+        values[rng.random(values.shape) < 0.02] = np.nan  # sensor gaps
+        rows = [[station, t_] + [None if v != v else v for v in row]
+                for t_, row in zip(ts.tolist(), np.round(values, 2).tolist())]
+        with db.cursor() as cursor:
+            cursor.executemany(sql, rows)
+    db.commit()
+
+
+def check_late_commit(db, station, day):
+    with db.cursor() as cursor:
+        cursor.execute("SELECT watermark FROM aqi_rollup_state WHERE name='rollups'")
+        watermark = datetime.fromisoformat(str(cursor.fetchone()["watermark"]))
+        cursor.execute("INSERT INTO aqi_readings (station, ts, us_aqi, inserted_at) VALUES (%s, %s, %s, %s)",
+                       (station, f"{day} 00:00:00", 99.0, f"{watermark - timedelta(seconds=5):%Y-%m-%d %H:%M:%S}"))
+    db.commit()
+    compact(db)
+    rolled = fetch_series(db, (station, day, day, "day", ("us_aqi",)))
+    print(f"late-committed row on {station} {day}: {'rolled up' if rolled else 'missing from rollups'}")
+    if not rolled or rolled[0]["us_aqi_max"] != 99.0:
+        raise SystemExit("compaction skipped a row committed behind the watermark")
+
+
+def timed(fn, n):
+    out, lat = None, []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        out = fn()
+        lat.append((time.perf_counter() - t0) * 1e3)
+    return np.percentile(lat, 50), np.percentile(lat, 95), out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=450)
+    parser.add_argument("--years", type=float, default=2)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--db", default=None, help="SQLite file to reuse (built if missing)")
+    args = parser.parse_args()
+
+    stations = [f"station_{i:03d}" for i in range(args.stations)]
+    start = datetime(2022, 1, 1)
+    hours = int(args.years * 8766)
+    end = (start + timedelta(hours=hours - 1)).date()
+    path = args.db or os.path.join(tempfile.mkdtemp(), "timeseries.sqlite")
+    fresh = not os.path.exists(path)
+    db = SQLiteDB(path)
+    if fresh:
+        create_schema(db)
+        t0 = time.perf_counter()
+        load(db, stations, start, hours)
+        print(f"loaded {len(stations) * hours:,} hourly rows in {time.perf_counter() - t0:.1f} s")
+        time.sleep(1.1)  # let the last inserted_at second elapse so the watermark can advance
+        result = compact(db, full=True)
+        print(f"full compaction: {result['days']:,} daily and {result['months']:,} monthly buckets "
+              f"in {result['seconds']:.1f} s")
+
+    # Rollups agree with NumPy on the raw rows
+    rng = random.Random(0)
+    station, day = rng.choice(stations), start.date() + timedelta(days=rng.randrange(300))
+    raw = fetch_series(db, (station, day, day, "hour", tuple(METRICS)))
+    values = np.array([[np.nan if r[m] is None else r[m] for m in METRICS] for r in raw], dtype=float)
+    rolled = fetch_series(db, (station, day, day, "day", tuple(METRICS)))[0]
+    expected = {"mean": np.nanmean(values, 0), "max": np.nanmax(values, 0), "p95": np.nanpercentile(values, 95, 0)}
+    err = max(abs(rolled[f"{m}_{s}"] - expected[s][j]) for j, m in enumerate(METRICS) for s in expected)
+    print(f"rollup parity on {station} {day}: max abs error {err:.2e}")
+    if err > 1e-6:
+        raise SystemExit("rollup mismatch")
+
+    cases = [("30 days", 30), ("1 year", 365), (f"{args.years:g} years", (end - start.date()).days)]
+    print(f"{'range':<10} {'source':<8} {'rows':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for label, days in cases:
+        q_end = end
+        q_start = q_end - timedelta(days=days - 1)
+        level = timeseries.choose_level(q_start, q_end)
+        for source in dict.fromkeys(["hour", level]):
+            pick = lambda: (rng.choice(stations), q_start, q_end, source, tuple(METRICS))  # noqa: E731
+            p50, p95, rows = timed(lambda: fetch_series(db, pick()), args.queries)
+            print(f"{label:<10} {source:<8} {len(rows):>6} {p50:>8.2f} {p95:>8.2f}")
+
+    # Incremental compaction after one new hour for every station
+    time.sleep(1.1)
+    new_ts = datetime.combine(end + timedelta(days=1), datetime.min.time())
+    with db:
+        insert_readings(db, [dict(station=s, ts=new_ts, **{p: 50.0 for p in METRICS[1:]}) for s in stations])
+        db.commit()
+    result = compact(db, overlap=0)  # the bulk load is still inside the default overlap window
+    print(f"incremental compaction: {result['stations']} stations, {result['days']} days, "
+          f"{result['months']} months in {result['seconds']:.2f} s")
+    check_late_commit(db, stations[0], end + timedelta(days=3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Memory and throughput of the gunicorn serving mode for 1 versus N workers.
+
+Starts ``gunicorn -c gunicorn.conf.py wsgi:app`` for each configuration
+(poller and stream disabled, prediction cache off so every request runs the
+ensemble), drives POST /predict with ``--concurrency`` keep-alive clients for
+``--seconds`` and reports requests/s, p50/p99 latency and memory after the
+load. RSS counts shared pages in every process that maps them; PSS splits
+them between the sharers and USS is what a process holds alone, so the PSS
+total is the real footprint. ``--no-preload`` adds N workers that each load
+their own models, for comparison with copy-on-write sharing.
+
+Usage:
+    python benchmarks/bench_workers.py --workers 1 4 --threads 4 --concurrency 16 --seconds 10
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import http.client
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def memory_kb(pid):
+    """(rss, pss, uss) in kB from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields["Rss"], fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def start_server(workers, threads, preload, port):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), WEB_THREADS=str(threads),
+               WEB_PRELOAD="1" if preload else "0", PORT=str(port), POLL_ENABLED="0", STREAM_ENABLED="0",
+               PREDICT_CACHE_SIZE="0", PYTHONWARNINGS="ignore")
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+                            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        try:
+            # Every worker warms up before it accepts, so readiness plus the full
+            # worker count means all of them are serving.
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/readyz")
+            if conn.getresponse().status == 200 and len(children(proc.pid)) == workers:
+                return proc
+        except OSError:
+            pass
+        time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("gunicorn did not become ready")
+
+
+def load(port, concurrency, seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.uniform([10, 0, 0, 740], [95, 10, 40, 780], size=(4096, 4))
+    bodies = [json.dumps({"RH": r[0], "WS": r[1], "Temp": r[2], "BP": r[3]}) for r in rows.tolist()]
+    latencies, errors = [], [0]
+    stop = time.monotonic() + seconds
+
+    def client(k):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine = []
+        i = k
+        while time.monotonic() < stop:
+            t0 = time.perf_counter()
+            try:
+                conn.request("POST", "/predict", bodies[i % len(bodies)], {"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    errors[0] += 1
+            except (OSError, http.client.HTTPException):
+                errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            mine.append(time.perf_counter() - t0)
+            i += concurrency
+        latencies.extend(mine)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    ms = np.asarray(latencies) * 1000
+    return dict(rps=len(latencies) / elapsed, p50=float(np.percentile(ms, 50)), p99=float(np.percentile(ms, 99)),
+                errors=errors[0])
+
+
+def run(name, workers, preload, args):
+    port = free_port()
+    proc = start_server(workers, args.threads, preload, port)
+    try:
+        load(port, args.concurrency, 1.0)  # warm connections and caches
+        result = load(port, args.concurrency, args.seconds)
+        pids = children(proc.pid)
+        mem = np.array([memory_kb(pid) for pid in pids]) / 1024
+        master = np.array(memory_kb(proc.pid)) / 1024
+    finally:
+        proc.terminate()
+        proc.wait(60)
+    print(f"{name:<22} {result['rps']:>8.0f} {result['p50']:>8.2f} {result['p99']:>8.2f} "
+          f"{mem[:, 0].mean():>9.1f} {mem[:, 1].mean():>9.1f} {mem[:, 2].mean():>9.1f} "
+          f"{mem[:, 1].sum() + master[1]:>10.1f} {result['errors']:>6}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--no-preload", action="store_true", help="also run the largest count without preload_app")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.threads} threads per worker, {args.concurrency} clients, "
+          f"{args.seconds:g} s per run; memory in MB per worker (total PSS includes the master)")
+    print(f"{'config':<22} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'RSS':>9} {'PSS':>9} {'USS':>9} "
+          f"{'total PSS':>10} {'errors':>6}")
+    failed = 0
+    for n in args.workers:
+        failed += run(f"{n} worker(s), preload", n, True, args)["errors"]
+    if args.no_preload:
+        n = max(args.workers)
+        failed += run(f"{n} worker(s), no preload", n, False, args)["errors"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+"""In-process stand-ins for external services used by the benchmarks."""
+import json
+import time
+import sqlite3
+from datetime import date, datetime
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        if server.connect_delay:
+            # Stands in for TCP + STARTTLS + AUTH round trips on a real relay.
+            time.sleep(server.connect_delay)
+        self._reply("220 sink ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode("latin-1").strip().split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self._reply("250-sink")
+                self._reply("250 8BITMIME")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                with server.lock:
+                    server.messages += 1
+                self._reply("250 OK queued")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                # HELO, MAIL, RCPT, RSET, NOOP
+                self._reply("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server that accepts and discards every message."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, connect_delay=0.0):
+        super().__init__((host, port), _SMTPHandler)
+        self.connect_delay = connect_delay
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class _OpenWeatherHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        with server.lock:
+            server.calls += 1
+        time.sleep(server.latency)
+        if url.path == "/json":
+            # ipinfo.io lookup used by get_dynamic_location
+            return self._send_json({"city": "Pune", "loc": "18.52,73.86"})
+        if url.path == "/geo/1.0/direct":
+            # Deterministic fake coordinates per city name
+            h = sum(map(ord, query["q"][0]))
+            return self._send_json([{"name": query["q"][0], "lat": 8 + h % 22, "lon": 70 + h % 20}])
+        components = {"co": 201.9, "no": 0.02, "no2": 0.77, "o3": 68.66, "so2": 0.64,
+                      "pm2_5": 0.5, "pm10": 0.54, "nh3": 0.12}
+        item = {"main": {"aqi": 2}, "components": components, "dt": int(time.time())}
+        items = [dict(item, dt=item["dt"] + 3600 * i) for i in range(96)] if url.path.endswith("/forecast") else [item]
+        self._send_json({"coord": {"lat": float(query["lat"][0]), "lon": float(query["lon"][0])}, "list": items})
+
+
+class OpenWeatherStub(ThreadingHTTPServer):
+    """Answers /data/2.5/air_pollution[/forecast], geocoding and the ipinfo /json
+    lookup with canned data after ``latency`` seconds."""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05):
+        super().__init__((host, port), _OpenWeatherHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = -1
+        self._rows = []
+
+    def execute(self, sql, params=()):
+        self.db._round_trip(sql, [params])
+        if "FROM subscriptions" in sql:
+            self._rows = [{"city": c} for c in self.db.cities]
+        self.rowcount = len(self._rows)
+
+    def executemany(self, sql, seq):
+        seq = list(seq)
+        # pymysql folds an INSERT executemany into one multi-row statement
+        self.db._round_trip(sql, seq)
+        self.rowcount = len(seq)
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeDB:
+    """Records statements and charges ``latency`` seconds per round trip.
+
+    ``connect()`` returns a context-managed connection like the shared pool's.
+    """
+
+    def __init__(self, cities=(), latency=0.0):
+        self.cities = list(cities)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.statements = 0
+        self.rows = 0
+        self.commits = 0
+
+    def _round_trip(self, sql, rows):
+        time.sleep(self.latency)
+        with self.lock:
+            self.statements += 1
+            if sql.lstrip().upper().startswith("INSERT"):
+                self.rows += len(rows)
+
+    def connect(self):
+        return _FakeConnection(self)
+
+
+class _FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        time.sleep(self.db.latency)
+        with self.db.lock:
+            self.db.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _SQLiteCursor:
+    """pymysql-flavoured cursor over sqlite3: %s placeholders and dict rows."""
+
+    def __init__(self, raw):
+        self._cursor = raw.cursor()
+
+    @staticmethod
+    def _sql(sql):
+        return sql.replace("%s", "?").replace("%%", "%").replace("INSERT IGNORE", "INSERT OR IGNORE")
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(self._sql(sql), tuple(params))
+
+    def executemany(self, sql, seq):
+        self._cursor.executemany(self._sql(sql), seq)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def _row(self, row):
+        return {d[0]: v for d, v in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return None if row is None else self._row(row)
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _date_format(value, fmt):
+    # MySQL's %Y/%m/%d/%H/%i/%s subset, enough for the queries the app sends.
+    if value is None:
+        return None
+    ts = datetime.fromisoformat(str(value))
+    return ts.strftime(fmt.replace("%i", "%M").replace("%s", "%S"))
+
+
+class SQLiteDB:
+    """Stand-in for the MySQL connection pool backed by one SQLite file.
+
+    CURDATE() and DATE_FORMAT() are registered so MySQL queries run unchanged.
+    """
+
+    def __init__(self, path):
+        self.raw = sqlite3.connect(path, check_same_thread=False)
+        self.raw.execute("PRAGMA journal_mode=WAL")
+        self.raw.execute("PRAGMA synchronous=OFF")
+        self.raw.create_function("CURDATE", 0, lambda: date.today().isoformat(), deterministic=True)
+        self.raw.create_function("DATE_FORMAT", 2, _date_format, deterministic=True)
+
+    def cursor(self):
+        return _SQLiteCursor(self.raw)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
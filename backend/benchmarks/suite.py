@@ -0,0 +1,283 @@
+"""Latency/throughput suite for the serving hot paths, with local stand-ins.
+
+Runs headless and CPU-only. OpenWeather and ipinfo are served by a local HTTP
+stub, email goes to a local SMTP sink and the database is SQLite through the
+pymysql-flavoured shim in stubs.py. Requests go through the Flask test client,
+so the numbers cover routing, parsing, the models and the queries but not a
+network hop.
+
+Scenarios: /predict (fresh rows and cache hits), /predict/batch,
+compute_real_aqi, /history-aqi at several table sizes (cache miss and hit),
+/live-aqi, and /notify (enqueue latency and delivery to the SMTP sink).
+
+Each scenario reports p50/p95/p99/mean latency and throughput. Results are
+written as JSON with ``--output``; ``--baseline`` compares them with a stored
+run and exits 1 when a p95 or a throughput regresses beyond ``--tolerance``.
+
+Usage:
+    python benchmarks/suite.py --output results.json --baseline benchmarks/baseline.json
+    python benchmarks/suite.py --only predict_single history_aqi --save-baseline benchmarks/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import date, timedelta, datetime, timezone
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stubs import OpenWeatherStub, SMTPSink, SQLiteDB  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE history_aqi (id INTEGER PRIMARY KEY AUTOINCREMENT, date DATE NOT NULL, city VARCHAR(100) NOT NULL,
+                          AQI INT, `PM2.5` DECIMAL(5,1), PM10 DECIMAL(5,1), NO2 DECIMAL(5,1), UNIQUE(date, city));
+CREATE INDEX idx_history_city_date ON history_aqi (city, date, id);
+CREATE INDEX idx_history_date_id ON history_aqi (date, id);
+CREATE TABLE subscriptions (id INTEGER PRIMARY KEY AUTOINCREMENT, name VARCHAR(100), email VARCHAR(100),
+                            phone VARCHAR(20), subscription_type VARCHAR(5), city VARCHAR(100));
+CREATE TABLE notifications (id INTEGER PRIMARY KEY AUTOINCREMENT, subscription_id INT NOT NULL, channel VARCHAR(5),
+                            recipient VARCHAR(255), subject VARCHAR(255), payload TEXT, provider_id VARCHAR(255),
+                            status VARCHAR(10) DEFAULT 'queued', error_message TEXT);
+CREATE INDEX idx_notifications_provider ON notifications (provider_id);
+CREATE TABLE stations (city VARCHAR(100) PRIMARY KEY, lat DOUBLE NOT NULL, lon DOUBLE NOT NULL);
+"""
+HISTORY_CITIES = 50
+CITY = "Pune"  # what the ipinfo stub reports
+
+
+def summarize(timing, **extra):
+    samples, elapsed, errors = timing
+    ms = np.asarray(samples) * 1000
+    return dict(n=len(samples), errors=errors, p50_ms=float(np.percentile(ms, 50)),
+                p95_ms=float(np.percentile(ms, 95)),
+                p99_ms=float(np.percentile(ms, 99)), mean_ms=float(ms.mean()),
+                throughput_per_s=len(samples) / elapsed, **extra)
+
+
+def timed(fn, n, warmup=5):
+    """(latencies, total seconds, error responses) of ``fn(i)`` for i in range(n)."""
+    for i in range(min(warmup, n)):
+        fn(i)
+    samples, errors = [], 0
+    t_start = time.perf_counter()
+    for i in range(n):
+        t0 = time.perf_counter()
+        resp = fn(i)
+        samples.append(time.perf_counter() - t0)
+        errors += getattr(resp, "status_code", 200) >= 400
+    return samples, time.perf_counter() - t_start, errors
+
+
+def make_db(path, history_rows, subscribers):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    rng = random.Random(0)
+    days = -(-history_rows // HISTORY_CITIES)
+    start = date.today() - timedelta(days=days + 1)
+    rows = [((start + timedelta(days=i // HISTORY_CITIES)).isoformat(),
+             CITY if i % HISTORY_CITIES == 0 else f"City{i % HISTORY_CITIES}",
+             rng.randint(20, 300), round(rng.uniform(5, 250), 1), round(rng.uniform(10, 400), 1),
+             round(rng.uniform(5, 120), 1)) for i in range(history_rows)]
+    conn.executemany("INSERT INTO history_aqi (date,city,AQI,`PM2.5`,PM10,NO2) VALUES(?,?,?,?,?,?)", rows)
+    conn.executemany("INSERT INTO subscriptions (name,email,subscription_type,city) VALUES(?,?,'email',?)",
+                     [(f"user{i}", f"user{i}@example.com", CITY) for i in range(subscribers)])
+    conn.commit()
+    conn.close()
+
+
+def use_db(api, path):
+    connect = lambda: SQLiteDB(path)  # noqa: E731
+    api.get_db_connection = connect
+    api.notifications.store.get_connection = connect
+    api.aqi_poller.get_connection = connect
+
+
+def meteo_rows(n, seed):
+    rng = np.random.default_rng(seed)
+    return [{"RH": float(rng.uniform(10, 100)), "WS": float(rng.uniform(0, 15)),
+             "Temp": float(rng.uniform(0, 45)), "BP": float(rng.uniform(720, 1050))} for _ in range(n)]
+
+
+# -- scenarios -------------------------------------------------------------------
+def bench_predict(api, client, args):
+    rows = meteo_rows(args.requests, 1)
+    timing = timed(lambda i: client.post("/predict", json=rows[i]), len(rows))
+    yield "predict_single", summarize(timing)
+    timing = timed(lambda i: client.post("/predict", json=rows[0]), args.requests)
+    yield "predict_single_cached", summarize(timing)
+    batches = [meteo_rows(args.batch_rows, 100 + i) for i in range(max(5, args.requests // 20))]
+    timing = timed(lambda i: client.post("/predict/batch", json=batches[i % len(batches)]), len(batches))
+    yield f"predict_batch_{args.batch_rows}", summarize(timing, rows_per_s=len(batches) * args.batch_rows / timing[1])
+
+
+def bench_aqi(api, client, args):
+    from aqi import compute_real_aqi
+    rng = np.random.default_rng(2)
+    values = rng.uniform([0, 0, 0, 0, 0, 0], [300, 500, 400, 800, 30, 400], size=(args.requests, 6))
+    timing = timed(lambda i: compute_real_aqi(dict(zip(api.pollutants, values[i]))), len(values))
+    yield "compute_real_aqi", summarize(timing)
+
+
+def bench_history(api, client, args):
+    from history import DayCache
+    cache = api.history_cache
+    for size in args.history_sizes:
+        path = os.path.join(args.workdir, f"history_{size}.db")
+        make_db(path, size, args.subscribers)
+        use_db(api, path)
+        queries = ["/history-aqi?limit=366", f"/history-aqi?city={CITY}&limit=100",
+                   "/history-aqi?columns=AQI,PM2.5&limit=500"]
+
+        api.history_cache = DayCache(maxsize=0)  # keeps nothing: every request misses
+        timing = timed(lambda i: client.get(queries[i % len(queries)]), args.requests)
+        yield f"history_aqi_{size}_miss", summarize(timing)
+        api.history_cache = DayCache(maxsize=cache.maxsize)
+        timing = timed(lambda i: client.get(queries[i % len(queries)]), args.requests)
+        yield f"history_aqi_{size}_hit", summarize(timing)
+    api.history_cache = cache
+
+
+def bench_live(api, client, args):
+    timing = timed(lambda i: client.get("/live-aqi"), args.requests)
+    yield "live_aqi", summarize(timing)
+
+
+def bench_notify(api, client, args):
+    path = os.path.join(args.workdir, "notify.db")
+    make_db(path, 0, args.subscribers)
+    use_db(api, path)
+    sink = args.sink
+    before = sink.messages
+    alert = {"city": CITY, "pollutant": "PM2.5", "message": "PM2.5 is high: 180", "date": "2024-01-01"}
+    n = max(5, args.requests // 20)
+    timing = timed(lambda i: client.post("/notify", json=alert), n, warmup=0)
+    yield "notify_enqueue", summarize(timing, subscribers=args.subscribers)
+    elapsed = timing[1]
+    expected = before + n * args.subscribers
+    t0 = time.perf_counter()
+    while sink.messages < expected and time.perf_counter() - t0 < 120:
+        time.sleep(0.01)
+    delivered = sink.messages - before
+    drain = time.perf_counter() - t0 + elapsed
+    yield "notify_delivery", dict(n=delivered, errors=int(sink.messages < expected), messages_per_s=delivered / drain, seconds=drain,
+                                  throughput_per_s=delivered / drain, complete=sink.messages >= expected)
+
+
+SCENARIOS = {"predict": bench_predict, "compute_real_aqi": bench_aqi, "history_aqi": bench_history,
+             "live_aqi": bench_live, "notify": bench_notify}
+
+
+# -- baseline ----------------------------------------------------------------------
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Rows of (name, metric, baseline, current, change, regressed)."""
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if "p95_ms" in current and "p95_ms" in base:
+            change = current["p95_ms"] / base["p95_ms"] - 1
+            regressed = change > tolerance and current["p95_ms"] - base["p95_ms"] > min_delta_ms
+            rows.append((name, "p95_ms", base["p95_ms"], current["p95_ms"], change, regressed))
+        if base.get("throughput_per_s"):
+            change = current["throughput_per_s"] / base["throughput_per_s"] - 1
+            rows.append((name, "throughput_per_s", base["throughput_per_s"], current["throughput_per_s"], change,
+                         change < -tolerance))
+    return rows
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--batch-rows", type=int, default=100)
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--subscribers", type=int, default=50)
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="stub OpenWeather/ipinfo latency (s)")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--save-baseline", help="also write the results as a baseline here")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore p95 changes smaller than this")
+    args = parser.parse_args()
+    cwd = os.getcwd()
+    for name in ("output", "baseline", "save_baseline"):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+
+    with OpenWeatherStub(latency=args.upstream_latency) as weather, SMTPSink() as sink, \
+            tempfile.TemporaryDirectory() as workdir:
+        # Set everything the app reads so a developer's .env cannot point the run at real services.
+        os.environ.update(
+            OPENWEATHER_API_KEY="bench", OPENWEATHER_BASE_URL=weather.url, IPINFO_URL=weather.url + "/json",
+            SMTP_HOST="127.0.0.1", SMTP_PORT=str(sink.port), SMTP_USER="", SMTP_PASS="",
+            SMTP_STARTTLS="0", SMTP_FROM="bench@example.com",
+            POLL_ENABLED="0", STREAM_ENABLED="0", NOTIFY_RECOVERY="0", MODEL_PRELOAD="1",
+        )
+        os.chdir(workdir)  # app.log goes to the scratch directory
+        import real_time_api as api
+        if not api.models.wait(120):
+            print("models failed to load:", json.dumps(api.models.status()))
+            return 2
+        args.workdir, args.sink = workdir, sink
+        make_db(os.path.join(workdir, "base.db"), 0, args.subscribers)
+        use_db(api, os.path.join(workdir, "base.db"))
+        client = api.app.test_client()
+
+        results = {}
+        for name in args.only:
+            for key, result in SCENARIOS[name](api, client, args):
+                results[key] = result
+                if result["errors"]:
+                    print(f"{key}: {result['errors']} failed requests")
+                extra = f"  {result['rows_per_s']:.0f} rows/s" if "rows_per_s" in result else ""
+                if "p50_ms" in result:
+                    print(f"{key:<28} p50 {result['p50_ms']:8.3f}  p95 {result['p95_ms']:8.3f}  "
+                          f"p99 {result['p99_ms']:8.3f} ms  {result['throughput_per_s']:9.1f}/s{extra}")
+                else:
+                    print(f"{key:<28} {result['throughput_per_s']:9.1f}/s  ({result['n']} in {result['seconds']:.2f} s)")
+        api.notifications.stop()
+        os.chdir(cwd)
+
+    report = dict(
+        meta=dict(commit=git_commit(), python=platform.python_version(), platform=platform.platform(),
+                  cpus=os.cpu_count(), created_at=datetime.now(timezone.utc).isoformat(),
+                  requests=args.requests, upstream_latency=args.upstream_latency),
+        results=results,
+    )
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=1)
+
+    status = int(any(r["errors"] for r in results.values()))
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nvs baseline {args.baseline} ({baseline['meta'].get('commit')}), tolerance {args.tolerance:.0%}")
+        for name, metric, base, current, change, regressed in compare(results, baseline["results"], args.tolerance,
+                                                                     args.min_delta_ms):
+            flag = "REGRESSION" if regressed else ""
+            print(f"{name:<28} {metric:<17} {base:10.3f} -> {current:10.3f}  {change:+7.1%}  {flag}")
+            status = max(status, int(regressed))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
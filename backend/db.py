@@ -1,14 +1,240 @@
-import mysql.connector
 import os
+import time
+import logging
+import threading
+
+import pymysql
 from dotenv import load_dotenv
 
+from metrics import outbound
+
 load_dotenv()
 
-def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv("DB_HOST"),
-        port=int(os.getenv("DB_PORT")),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        database=os.getenv("DB_NAME")
+DB_HOST = os.getenv("DB_HOST", "127.0.0.1")
+DB_PORT = int(os.getenv("DB_PORT", 3306))
+DB_NAME = os.getenv("DB_NAME")
+DB_USER = os.getenv("DB_USER")
+DB_PASS = os.getenv("DB_PASSWORD")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", 3600))
+DB_POOL_PING_INTERVAL = float(os.getenv("DB_POOL_PING_INTERVAL", 30))
+
+
+class PoolTimeout(RuntimeError):
+    """No connection became free within the checkout timeout."""
+
+
+def default_ping(conn):
+    # pymysql and mysql.connector both expose ping(); DB-API drivers such as sqlite3 do not.
+    if hasattr(conn, "ping"):
+        conn.ping(reconnect=False)
+    else:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.close()
+
+
+class TimedCursor:
+    """Cursor proxy that records execute/executemany latency under the ``db`` target."""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def execute(self, *args, **kwargs):
+        with outbound("db"):
+            return self._raw.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        with outbound("db"):
+            return self._raw.executemany(*args, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._raw.close()
+
+
+class PooledConnection:
+    """Proxy for a pooled DB-API connection; close() hands it back to the pool.
+
+    Usable as ``with get_db_connection() as conn:`` like a plain pymysql connection.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self.created_at = created_at
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise AttributeError(f"Connection already returned to the pool ({name})")
+        return getattr(raw, name)
+
+    def cursor(self, *args, **kwargs):
+        if self._raw is None:
+            raise AttributeError("Connection already returned to the pool (cursor)")
+        return TimedCursor(self._raw.cursor(*args, **kwargs))
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._release(self, raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """Thread-safe, bounded pool of DB-API connections.
+
+    Connections are created on demand up to ``size``. Checkout blocks up to
+    ``timeout`` seconds for a free one, pings connections idle longer than
+    ``ping_interval`` and replaces those older than ``recycle``. Returned
+    connections are rolled back so no transaction snapshot leaks between users.
+    """
+
+    def __init__(self, connect, size=10, timeout=10.0, recycle=3600.0, ping_interval=30.0, ping=default_ping):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self._ping = ping
+        self._cond = threading.Condition()
+        self._idle = []  # (raw connection, created_at, last_used), most recently used last
+        self._in_use = 0
+        self._waiters = 0
+        self._stats = dict(checkouts=0, created=0, recycled=0, ping_failures=0,
+                           discarded=0, timeouts=0, wait_seconds_total=0.0, wait_seconds_max=0.0)
+
+    def _open(self):
+        with outbound("db_connect"):
+            raw = self._connect()
+        with self._cond:
+            self._stats["created"] += 1
+        return raw
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def get_connection(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        t0 = time.monotonic()
+        deadline = t0 + timeout
+        with self._cond:
+            if not self._idle and self._in_use >= self.size:
+                self._waiters += 1
+                try:
+                    while not self._idle and self._in_use >= self.size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._stats["timeouts"] += 1
+                            raise PoolTimeout(f"No DB connection free within {timeout:.1f}s (pool size {self.size})")
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+            entry = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            waited = time.monotonic() - t0
+            self._stats["checkouts"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+
+        try:
+            raw, created_at = self._validate(entry)
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw, created_at)
+
+    def _validate(self, entry):
+        now = time.monotonic()
+        if entry is not None:
+            raw, created_at, last_used = entry
+            if self.recycle and now - created_at > self.recycle:
+                self._discard(raw)
+                with self._cond:
+                    self._stats["recycled"] += 1
+            elif self.ping_interval is not None and now - last_used > self.ping_interval:
+                try:
+                    self._ping(raw)
+                    return raw, created_at
+                except Exception:
+                    logging.warning("Discarding DB connection that failed its liveness ping")
+                    self._discard(raw)
+                    with self._cond:
+                        self._stats["ping_failures"] += 1
+            else:
+                return raw, created_at
+        return self._open(), time.monotonic()
+
+    def _release(self, pooled, raw):
+        healthy = True
+        try:
+            raw.rollback()
+        except Exception:
+            healthy = False
+            self._discard(raw)
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((raw, pooled.created_at, time.monotonic()))
+            else:
+                self._stats["discarded"] += 1
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for raw, _, _ in idle:
+            self._discard(raw)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(size=self.size, in_use=self._in_use, idle=len(self._idle), waiters=self._waiters)
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        return stats
+
+
+def connect_mysql():
+    return pymysql.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASS,
+        db=DB_NAME,
+        cursorclass=pymysql.cursors.DictCursor
     )
+
+
+# One pool per process, shared by every backend module.
+pool = ConnectionPool(
+    connect_mysql,
+    size=DB_POOL_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    recycle=DB_POOL_RECYCLE,
+    ping_interval=DB_POOL_PING_INTERVAL,
+)
+
+
+def get_db_connection():
+    return pool.get_connection()
@@ -3,14 +3,6 @@ import sys
 import io
 import contextlib
 import logging
-import warnings
-
-# -----------------------------------------------------------------------------
-# Suppress TensorFlow INFO logs and Keras metric warnings
-# -----------------------------------------------------------------------------
-os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
-logging.getLogger("tensorflow").setLevel(logging.ERROR)
-warnings.filterwarnings("ignore", message="Compiled the loaded model, but the compiled metrics have yet to be built")
 
 # -----------------------------------------------------------------------------
 # Prevent Flask development banner
@@ -32,18 +24,19 @@ from datetime import datetime, timedelta, timezone, date
 
 import numpy as np
 import requests
-import pymysql
 import smtplib
 from email.mime.text import MIMEText
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
-from tensorflow.keras.models import load_model
-from tensorflow.keras.losses import mse
 from joblib import load as joblib_load
 import xgboost as xgb
 
+from db import get_db_connection
+from lstm_numpy import NumpyLSTMModel
+from aqi import compute_real_aqi
+
 # -----------------------------------------------------------------------------
 # Configure application & logging
 # -----------------------------------------------------------------------------
@@ -66,12 +59,6 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
-DB_HOST = os.getenv("DB_HOST", "127.0.0.1")
-DB_PORT = int(os.getenv("DB_PORT", 3306))
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASS = os.getenv("DB_PASSWORD")
-
 meteorological_features = ["RH", "WS (m/s)", "Temp", "BP (mmHg)"]
 pollutants = ["PM2.5", "PM10", "NO2", "SO2", "CO", "Ozone"]
 
@@ -79,19 +66,6 @@ cached_location = None
 cached_location_time = None
 LOCATION_CACHE_DURATION = timedelta(minutes=10)
 
-# -----------------------------------------------------------------------------
-# Database helper
-# -----------------------------------------------------------------------------
-def get_db_connection():
-    return pymysql.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        user=DB_USER,
-        password=DB_PASS,
-        db=DB_NAME,
-        cursorclass=pymysql.cursors.DictCursor
-    )
-
 # -----------------------------------------------------------------------------
 # Email helper
 # -----------------------------------------------------------------------------
@@ -126,12 +100,8 @@ for idx in range(n_boosters):
 scaler_meteo     = joblib_load(os.path.join(MODELS_DIR, "scaler_meteo.joblib"))
 pollutant_scaler = joblib_load(os.path.join(MODELS_DIR, "pollutant_scaler.joblib"))
 
-# 3) Keras LSTM model, then compile to silence metric warning
-lstm_model = load_model(
-    os.path.join(MODELS_DIR, "lstm_multi_pollutants_model.h5"),
-    custom_objects={"mse": mse}
-)
-lstm_model.compile(optimizer="adam", loss=mse, metrics=["mse"] )
+# 3) LSTM weights exported from the Keras .h5 (python lstm_numpy.py export), run with NumPy
+lstm_model = NumpyLSTMModel.load(os.path.join(MODELS_DIR, "lstm_multi_pollutants_model.npz"))
 
 # -----------------------------------------------------------------------------
 # Location utility
@@ -155,31 +125,6 @@ def get_dynamic_location():
         return (None, None, None)
     return cached_location
 
-# -----------------------------------------------------------------------------
-# AQI computation
-# -----------------------------------------------------------------------------
-def compute_real_aqi(absolute_pollutants):
-    breakpoints = {
-        "PM2.5": ([0.0,12.1,35.5,55.5,150.5,250.5,350.5],[0,50,100,150,200,300,400,500]),
-        "PM10":  ([0,55,155,255,355,425,505],[0,50,100,150,200,300,400,500]),
-        "NO2":   ([0,54,101,361,650,1250,1650],[0,50,100,150,200,300,400,500]),
-        "SO2":   ([0,36,76,186,305,605,805],[0,50,100,150,200,300,400,500]),
-        "CO":    ([0,4.5,9.5,12.5,15.5,30.5,40.5],[0,50,100,150,200,300,400,500]),
-        "Ozone": ([0,55,71,86,106,201],[0,50,100,150,200,300,500])
-    }
-    aqi_vals = {}
-    for pol, val in absolute_pollutants.items():
-        conc, aqi = breakpoints[pol]
-        for i in range(1, len(conc)):
-            if val <= conc[i]:
-                aqi_val = aqi[i-1] + (val-conc[i-1])*(aqi[i]-aqi[i-1])/(conc[i]-conc[i-1])
-                break
-        else:
-            aqi_val = aqi[-1]
-        aqi_vals[pol] = aqi_val
-    overall = max(aqi_vals.values()) if aqi_vals else None
-    return overall, aqi_vals
-
 # -----------------------------------------------------------------------------
 # Routes
 # -----------------------------------------------------------------------------
@@ -210,8 +155,7 @@ def subscribe():
         if not name or not contact or not city:
             return jsonify(success=False, message="Name, contact, and location are required"), 400
 
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        with get_db_connection() as conn, conn.cursor() as cursor:
             if sub_type=='email':
                 cursor.execute("SELECT id FROM subscriptions WHERE email=%s", (contact,))
             else:
@@ -225,7 +169,6 @@ def subscribe():
                  sub_type, city)
             )
             conn.commit()
-        conn.close()
         return jsonify(success=True, message="Subscription successful!", city=city), 200
     except Exception:
         logging.exception("Error in /api/subscribe")
@@ -307,11 +250,9 @@ def forecast_aqi():
 @app.route('/history-aqi',methods=['GET'])
 def history_aqi():
     try:
-        conn=get_db_connection()
-        with conn.cursor() as cursor:
+        with get_db_connection() as conn, conn.cursor() as cursor:
             cursor.execute("SELECT DATE_FORMAT(date,'%Y-%m-%d') AS date,city,AQI,`PM2.5`,PM10,NO2 FROM history_aqi WHERE date<CURDATE() ORDER BY date DESC")
             rows=cursor.fetchall()
-        conn.close()
         return jsonify(rows)
     except Exception:
         logging.exception("Error fetching history from DB")
@@ -324,11 +265,9 @@ def notify_subscribers():
     subject=f"AQI Alert for {city}: {alert.get('pollutant')} High"
     body=f"{alert.get('message')}\n\nLocation: {city}\nTime:     {alert.get('date')}\n"
     try:
-        conn=get_db_connection()
-        with conn.cursor() as cursor:
+        with get_db_connection() as conn, conn.cursor() as cursor:
             cursor.execute("SELECT email FROM subscriptions WHERE subscription_type='email' AND email IS NOT NULL AND city=%s",(city,))
             subs=cursor.fetchall()
-        conn.close()
         for row in subs:
             send_email(row['email'],subject,body)
         return jsonify(success=True),200
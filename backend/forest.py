@@ -0,0 +1,245 @@
+"""Array-backed evaluator for the per-pollutant XGBoost boosters.
+
+All trees from all boosters are compiled into one forest laid out as perfect
+binary trees (heap order), so a batch of rows walks every tree of every
+pollutant in ``max_depth`` vectorized steps instead of six Booster.predict calls.
+
+That wins for small batches, where the fixed cost of six DMatrix predictions
+dominates, but loses to xgboost's own predictor past a few dozen rows.
+``HybridForest`` picks between the two by batch size. Leaf values are summed
+the way xgboost's CPU predictor sums them (float32, base score first, then
+tree by tree), so both give bit-identical predictions at every batch size.
+"""
+import json
+import threading
+
+import numpy as np
+
+# Rows evaluated per traversal; keeps the (rows, trees) working set cache-resident.
+PREDICT_CHUNK_ROWS = 256
+# Largest batch sent through the fused traversal; bigger ones use the native
+# boosters. Crossover measured with benchmarks/bench_forest.py (~32-64 rows).
+FUSED_MAX_ROWS = 32
+# Heap layout stores 2**depth leaves per tree; deeper trees would blow up memory.
+MAX_HEAP_DEPTH = 12
+
+
+def _parse_base_score(value):
+    # xgboost >= 3 stores base_score as a JSON-encoded vector, older releases as a scalar string.
+    value = str(value).strip()
+    if value.startswith("["):
+        return float(json.loads(value)[0])
+    return float(value)
+
+
+def _tree_depth(left, right):
+    depth, stack = 0, [(0, 0)]
+    while stack:
+        node, d = stack.pop()
+        if left[node] == -1:
+            depth = max(depth, d)
+        else:
+            stack.append((left[node], d + 1))
+            stack.append((right[node], d + 1))
+    return depth
+
+
+def pack_nodes(features, thresholds):
+    """Pack each node's float32 threshold and int32 feature into one int64 record."""
+    nodes = np.empty(features.size, dtype=[("threshold", "<f4"), ("feature", "<i4")])
+    nodes["threshold"] = thresholds.ravel()
+    nodes["feature"] = features.ravel()
+    return nodes.view(np.int64).reshape(features.shape)
+
+
+class FusedForest:
+    """Multi-output regression forest evaluated in one vectorized traversal.
+
+    ``nodes``/``default_left`` have shape (n_trees, 2**depth - 1), with each
+    node's threshold and feature packed by ``pack_nodes``, and ``leaf_values``
+    has shape (n_trees, 2**depth). Trees are grouped by output column;
+    ``tree_offsets`` marks where each output's trees start. The arrays are
+    used as given, so they may be read-only views (e.g. of a model bundle).
+    """
+
+    def __init__(self, nodes, default_left, leaf_values, tree_offsets, base_scores, n_features):
+        self.nodes = nodes
+        self.default_left = default_left
+        self.leaf_values = leaf_values
+        self.tree_offsets = tree_offsets
+        self.base_scores = base_scores
+        self.n_features = n_features
+        self.n_trees, self.n_internal = nodes.shape
+        self.depth = int(np.log2(self.n_internal + 1))
+        # Flattened views used by predict(); node ids are global offsets into them.
+        # Threshold and feature of a node share one 8-byte record so each
+        # traversal step needs a single gather for both.
+        self._nodes = nodes.ravel()
+        self._default_left = default_left.ravel()
+        self._leaf_values = leaf_values.ravel()
+        self._base_scores32 = np.asarray(base_scores, dtype=np.float32)
+        self._tree_ends = np.append(tree_offsets[1:], self.n_trees)
+        self._tree_base = (np.arange(self.n_trees, dtype=np.int32) * self.n_internal)[None, :]
+        # Final node ids run past each tree's internal block; map them to leaf slots.
+        self._leaf_shift = self._tree_base + self.n_internal - np.arange(self.n_trees, dtype=np.int32)[None, :] * (self.n_internal + 1)
+
+    @property
+    def n_outputs(self):
+        return len(self.base_scores)
+
+    @classmethod
+    def from_json_files(cls, paths):
+        return cls.from_models([json.load(open(p, encoding="utf-8")) for p in paths])
+
+    @classmethod
+    def from_models(cls, models):
+        """Compile parsed xgboost JSON models, one per output column."""
+        trees, tree_offsets, base_scores, n_features = [], [], [], None
+        for model in models:
+            learner = model["learner"]
+            booster = learner["gradient_booster"]
+            if booster.get("name", "gbtree") != "gbtree":
+                raise ValueError(f"Unsupported booster type: {booster.get('name')}")
+            objective = learner.get("objective", {}).get("name", "reg:squarederror")
+            if not objective.startswith("reg:squared"):
+                raise ValueError(f"Unsupported objective: {objective}")
+            params = learner["learner_model_param"]
+            if n_features is None:
+                n_features = int(params["num_feature"])
+            tree_offsets.append(len(trees))
+            base_scores.append(_parse_base_score(params["base_score"]))
+            trees.extend(booster["model"]["trees"])
+
+        depth = max(_tree_depth(t["left_children"], t["right_children"]) for t in trees)
+        if depth > MAX_HEAP_DEPTH:
+            raise ValueError(f"Tree depth {depth} exceeds MAX_HEAP_DEPTH={MAX_HEAP_DEPTH}")
+        depth = max(depth, 1)
+        n_internal, n_leaves = 2 ** depth - 1, 2 ** depth
+
+        features = np.zeros((len(trees), n_internal), dtype=np.intp)
+        # Padding nodes under a shallow leaf always go left (x < inf, NaN defaults left).
+        thresholds = np.full((len(trees), n_internal), np.inf, dtype=np.float32)
+        default_left = np.ones((len(trees), n_internal), dtype=bool)
+        leaf_values = np.zeros((len(trees), n_leaves), dtype=np.float32)
+
+        for t, tree in enumerate(trees):
+            if tree.get("categories_nodes"):
+                raise ValueError("Categorical splits are not supported")
+            left, right = tree["left_children"], tree["right_children"]
+            split_idx, split_cond = tree["split_indices"], tree["split_conditions"]
+            dleft = tree["default_left"]
+            stack = [(0, 0, 0)]  # (node id, heap position, depth)
+            while stack:
+                node, pos, d = stack.pop()
+                if left[node] == -1:
+                    # Fill every heap leaf below this position with the leaf value.
+                    span = 2 ** (depth - d)
+                    first = (pos + 1) * span - 1 - n_internal
+                    leaf_values[t, first:first + span] = split_cond[node]
+                    continue
+                features[t, pos] = split_idx[node]
+                thresholds[t, pos] = split_cond[node]
+                default_left[t, pos] = bool(dleft[node])
+                stack.append((left[node], 2 * pos + 1, d + 1))
+                stack.append((right[node], 2 * pos + 2, d + 1))
+
+        return cls(
+            pack_nodes(features, thresholds), default_left, leaf_values,
+            np.asarray(tree_offsets, dtype=np.intp),
+            np.asarray(base_scores, dtype=np.float64),
+            n_features,
+        )
+
+    def predict(self, X):
+        """Return an (N, n_outputs) float32 array of predictions for an (N, F) input."""
+        # DMatrix stores features as float32; compare in the same precision.
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows = X.shape[0]
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (N, {self.n_features}), got {X.shape}")
+        if n_rows == 0:
+            return np.zeros((0, self.n_outputs), dtype=np.float32)
+
+        out = np.empty((n_rows, self.n_outputs), dtype=np.float32)
+        for start in range(0, n_rows, PREDICT_CHUNK_ROWS):
+            out[start:start + PREDICT_CHUNK_ROWS] = self._predict_chunk(X[start:start + PREDICT_CHUNK_ROWS])
+        return out
+
+    def _predict_chunk(self, X):
+        n_rows = X.shape[0]
+        flat_x = X.ravel()
+        row_base = (np.arange(n_rows, dtype=np.int32) * self.n_features)[:, None]
+        node = np.broadcast_to(self._tree_base, (n_rows, self.n_trees))
+        has_missing = np.isnan(X).any()
+        for _ in range(self.depth):
+            rec = self._nodes.take(node)
+            threshold = rec.view(np.float32)[..., 0::2]
+            feature = rec.view(np.int32)[..., 1::2]
+            x = flat_x.take(row_base + feature)
+            go_left = x < threshold
+            if has_missing:
+                go_left = np.where(np.isnan(x), self._default_left.take(node), go_left)
+            # Heap children of node i are 2i+1 and 2i+2 within the tree's block.
+            node = 2 * node - self._tree_base + 2 - go_left
+
+        leaf_vals = self._leaf_values.take(node - self._leaf_shift)
+        # xgboost starts each output at its base score and adds trees in order,
+        # in float32; cumsum keeps that order (a sum would reduce pairwise).
+        leaf_vals[:, self.tree_offsets] += self._base_scores32
+        out = np.empty((n_rows, self.n_outputs), dtype=np.float32)
+        for k, (start, end) in enumerate(zip(self.tree_offsets, self._tree_ends)):
+            out[:, k] = np.cumsum(leaf_vals[:, start:end], axis=1)[:, -1]
+        return out
+
+
+class BoosterForest:
+    """The per-output xgboost Boosters behind the FusedForest predict() interface."""
+
+    def __init__(self, boosters):
+        self.boosters = list(boosters)
+
+    @property
+    def n_outputs(self):
+        return len(self.boosters)
+
+    def predict(self, X):
+        import xgboost
+        dm = xgboost.DMatrix(np.asarray(X, dtype=np.float32))
+        return np.column_stack([booster.predict(dm) for booster in self.boosters]).astype(np.float32, copy=False)
+
+
+class HybridForest:
+    """FusedForest for batches up to ``max_fused_rows``, native xgboost above.
+
+    ``load_boosters`` returns the Boosters (one per output, in column order). It
+    runs on the first large batch, so processes that only see single rows never
+    import xgboost; without it every batch goes through the fused forest. Both
+    paths return the same bits, so the switch never changes a prediction.
+    """
+
+    def __init__(self, fused, load_boosters=None, max_fused_rows=FUSED_MAX_ROWS):
+        self.fused = fused
+        self.load_boosters = load_boosters
+        self.max_fused_rows = max_fused_rows
+        self._native = None
+        self._lock = threading.Lock()
+
+    @property
+    def n_features(self):
+        return self.fused.n_features
+
+    @property
+    def n_outputs(self):
+        return self.fused.n_outputs
+
+    def native(self):
+        if self._native is None:
+            with self._lock:
+                if self._native is None:
+                    self._native = BoosterForest(self.load_boosters())
+        return self._native
+
+    def predict(self, X):
+        if self.load_boosters is None or len(X) <= self.max_fused_rows:
+            return self.fused.predict(X)
+        return self.native().predict(X)
@@ -0,0 +1,49 @@
+"""gunicorn settings for serving the API: ``gunicorn -c gunicorn.conf.py wsgi:app`` from backend/.
+
+WEB_CONCURRENCY worker processes (default: one per CPU) with WEB_THREADS
+threads each share the models loaded once in the master (WEB_PRELOAD=0 loads
+them in every worker instead). SIGTERM stops accepting, lets in-flight
+requests finish within WEB_GRACEFUL_TIMEOUT and flushes queued notifications.
+"""
+import os
+import tempfile
+
+# One BLAS/OpenMP thread per worker; the workers are the parallelism. Must be
+# set before numpy is imported by the preloaded app.
+for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(var, os.getenv("WEB_BLAS_THREADS", "1"))
+
+bind = os.getenv("BIND", f"{os.getenv('HOST', '127.0.0.1')}:{os.getenv('PORT', 5000)}")
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+threads = int(os.getenv("WEB_THREADS", 4))
+worker_class = "gthread"
+preload_app = os.getenv("WEB_PRELOAD", "1") == "1"
+timeout = int(os.getenv("WEB_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("WEB_KEEPALIVE", 5))
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv("WEB_ACCESS_LOG") or None
+
+
+def services_lock(server):
+    """Lock file electing the worker that runs the poller and stream server."""
+    return os.path.join(os.getenv("SERVICES_LOCK_DIR", tempfile.gettempdir()),
+                        f"breathe-easy-services-{server.pid}.lock")
+
+
+def post_fork(server, worker):
+    import wsgi
+    wsgi.post_fork(services_lock(server))
+
+
+def worker_exit(server, worker):
+    import wsgi
+    wsgi.shutdown()
+
+
+def on_exit(server):
+    try:
+        os.remove(services_lock(server))
+    except OSError:
+        pass
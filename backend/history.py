@@ -0,0 +1,188 @@
+"""Query building and response caching for the /history-aqi endpoint.
+
+History rows only cover days before today and past days never change, so a
+page of results stays valid until the next day boundary. "Today" comes from
+the cache's clock, for the SQL bound as well, so the rows left out and the
+moment the cache empties agree whatever timezone the database runs in.
+
+Without ``limit`` or ``cursor`` a request returns every row, as it always did.
+Pages are fetched with keyset pagination on (date, id) so deep pages cost the
+same as the first.
+"""
+import base64
+import hashlib
+import threading
+from datetime import date, datetime, timedelta
+from collections import OrderedDict
+
+# Selectable columns and their SQL; '%' is doubled because queries are parameterized.
+HISTORY_COLUMNS = OrderedDict([
+    ("date", "DATE_FORMAT(date,'%%Y-%%m-%%d') AS date"),
+    ("city", "city"),
+    ("AQI", "AQI"),
+    ("PM2.5", "`PM2.5`"),
+    ("PM10", "PM10"),
+    ("NO2", "NO2"),
+])
+DEFAULT_PAGE_SIZE = 366  # for a cursor without a limit
+MAX_PAGE_SIZE = 5000
+
+
+def encode_cursor(row_date, row_id):
+    return base64.urlsafe_b64encode(f"{row_date}|{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        row_date, row_id = raw.split("|")
+        return date.fromisoformat(row_date).isoformat(), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"'{name}' must be a YYYY-MM-DD date")
+
+
+def parse_history_query(args, default_limit=DEFAULT_PAGE_SIZE, max_limit=MAX_PAGE_SIZE):
+    """Validate request args into a hashable query tuple.
+
+    Supported args: from, to (inclusive dates), city, columns (comma list),
+    limit and cursor (opaque, from the previous page's X-Next-Cursor header).
+    Without either the limit is None: every matching row, in one response.
+    """
+    columns = args.get("columns")
+    if columns:
+        columns = tuple(c.strip() for c in columns.split(",") if c.strip())
+        unknown = [c for c in columns if c not in HISTORY_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    else:
+        columns = tuple(HISTORY_COLUMNS)
+    cursor = decode_cursor(args["cursor"]) if args.get("cursor") else None
+    if args.get("limit") or cursor:
+        try:
+            limit = int(args.get("limit") or default_limit)
+        except ValueError:
+            raise ValueError("'limit' must be an integer")
+        if not 1 <= limit <= max_limit:
+            raise ValueError(f"'limit' must be between 1 and {max_limit}")
+    else:
+        limit = None
+    start = _parse_date(args["from"], "from") if args.get("from") else None
+    end = _parse_date(args["to"], "to") if args.get("to") else None
+    city = args.get("city", "").strip() or None
+    return (start, end, city, columns, limit, cursor)
+
+
+def build_history_sql(query, today):
+    """SQL and params for ``query``; ``today`` (a date) is the first day left out."""
+    start, end, city, columns, limit, cursor = query
+    if cursor:
+        # Cursor rows all predate today, so the cursor is the upper bound the
+        # index seeks to; a separate date<today would compete with it.
+        where = ["date<=%s", "(date<%s OR (date=%s AND id<%s))"]
+        params = [cursor[0], cursor[0], cursor[0], cursor[1]]
+    else:
+        where, params = ["date<%s"], [today.isoformat()]
+    if start:
+        where.append("date>=%s")
+        params.append(start)
+    if end:
+        where.append("date<=%s")
+        params.append(end)
+    if city:
+        where.append("city=%s")
+        params.append(city)
+    select = ", ".join([HISTORY_COLUMNS[c] for c in columns]
+                       + ["id AS _cursor_id", "DATE_FORMAT(date,'%%Y-%%m-%%d') AS _cursor_date"])
+    # Qualified: a bare "date" here would mean the DATE_FORMAT alias above, a
+    # string no index can return in order.
+    sql = (f"SELECT {select} FROM history_aqi WHERE {' AND '.join(where)} "
+           f"ORDER BY history_aqi.date DESC, history_aqi.id DESC")
+    if limit is not None:
+        # One extra row tells us whether another page follows.
+        sql += " LIMIT %s"
+        params.append(limit + 1)
+    return sql, params
+
+
+def fetch_history_page(conn, query, today):
+    """Return (rows, next_cursor) for a parsed query."""
+    limit = query[4]
+    sql, params = build_history_sql(query, today)
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = list(cursor.fetchall())
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["_cursor_date"], rows[-1]["_cursor_id"])
+    for row in rows:
+        row.pop("_cursor_id", None)
+        row.pop("_cursor_date", None)
+    return rows, next_cursor
+
+
+class DayCache:
+    """LRU of rendered responses that empties itself when the date changes."""
+
+    def __init__(self, maxsize=256, today=date.today):
+        self.maxsize = maxsize
+        self._today = today
+        self._day = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _roll(self):
+        today = self._today()
+        if today != self._day:
+            self._entries.clear()
+            self._day = today
+
+    def today(self):
+        """The day this cache is serving; pass it to fetch_history_page."""
+        with self._lock:
+            self._roll()
+            return self._day
+
+    def get(self, key):
+        with self._lock:
+            self._roll()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, day=None, **meta):
+        """Store a response computed for ``day``; one from before a rollover is
+        returned but not kept."""
+        entry = dict(meta, body=body, etag=hashlib.sha1(body).hexdigest())
+        if self.maxsize <= 0:
+            return entry
+        with self._lock:
+            self._roll()
+            if day is not None and day != self._day:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def seconds_until_rollover(self):
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        return max(1, int((midnight - now).total_seconds()))
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
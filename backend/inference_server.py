@@ -0,0 +1,357 @@
+"""Out-of-process ensemble inference over a Unix socket and shared memory.
+
+    python inference_server.py --socket /tmp/aqi-inference.sock --processes 4
+
+The server loads the models once, then forks ``--processes`` inference
+processes that share them copy-on-write and accept on one listening Unix
+socket. Web processes started with ``INFERENCE_SOCKET`` set send their
+/predict rows here instead of loading the models themselves.
+
+Arrays never go through pickle. Each client connection creates a
+``multiprocessing.shared_memory`` segment holding a rows buffer and a results
+buffer and sends its name once; a request is then a 5-byte header with the row
+count, and the reply carries a status and the model generation while the
+results are written in place. A segment too small for a request is replaced
+by a larger one.
+"""
+import os
+import sys
+import signal
+import socket
+import struct
+import logging
+import argparse
+import threading
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from model_registry import ModelNotReady
+
+N_FEATURES = 4
+N_OUTPUTS = 6
+ROW_BYTES = (N_FEATURES + N_OUTPUTS) * 8
+
+REQUEST = struct.Struct("<BI")   # op, row count (or name length for attach)
+REPLY = struct.Struct("<BII")    # status, model generation, message length
+OP_ATTACH, OP_PREDICT, OP_PREDICT_FALLBACK = 1, 2, 3
+STATUS_OK, STATUS_NOT_READY, STATUS_ERROR = 0, 1, 2
+
+
+class InferenceUnavailable(ModelNotReady):
+    """The inference server could not be reached."""
+
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if k == 0:
+            raise ConnectionError("inference connection closed")
+        got += k
+    return bytes(buf)
+
+
+def _views(shm, capacity):
+    rows = np.ndarray((capacity, N_FEATURES), dtype=np.float64, buffer=shm.buf)
+    results = np.ndarray((capacity, N_OUTPUTS), dtype=np.float64, buffer=shm.buf,
+                         offset=capacity * N_FEATURES * 8)
+    return rows, results
+
+
+# -----------------------------------------------------------------------------
+# Client (web processes)
+# -----------------------------------------------------------------------------
+class _Channel:
+    """One connection plus its shared-memory segment; used by one thread at a time."""
+
+    def __init__(self, path, capacity, timeout):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.shm = None
+        try:
+            self.sock.connect(path)
+            self.attach(capacity)
+        except BaseException:
+            self.close()
+            raise
+
+    def attach(self, capacity):
+        old = self.shm
+        self.shm = shared_memory.SharedMemory(create=True, size=capacity * ROW_BYTES)
+        self.capacity = capacity
+        self.rows, self.results = _views(self.shm, capacity)
+        name = self.shm.name.encode()
+        self.sock.sendall(REQUEST.pack(OP_ATTACH, len(name)) + name)
+        self._reply()
+        if old is not None:
+            self._release(old)
+
+    def predict(self, rows, op=OP_PREDICT):
+        n = len(rows)
+        if n > self.capacity:
+            self.attach(max(n, 2 * self.capacity))
+        self.rows[:n] = rows
+        self.sock.sendall(REQUEST.pack(op, n))
+        generation = self._reply()
+        return self.results[:n].copy(), generation
+
+    def _reply(self):
+        status, generation, length = REPLY.unpack(_recv_exact(self.sock, REPLY.size))
+        message = _recv_exact(self.sock, length).decode() if length else ""
+        if status == STATUS_NOT_READY:
+            raise ModelNotReady(message)
+        if status != STATUS_OK:
+            raise RuntimeError(f"Inference server error: {message}")
+        return generation
+
+    @staticmethod
+    def _release(shm):
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        self.sock.close()
+        if self.shm is not None:
+            self.rows = self.results = None
+            self._release(self.shm)
+            self.shm = None
+
+
+class InferenceClient:
+    """Thread-safe client; each calling thread gets its own connection and segment."""
+
+    def __init__(self, path, capacity=256, timeout=30.0):
+        self.path = path
+        self.capacity = capacity
+        self.timeout = timeout
+        self.generation = 0  # model generation reported by the last reply
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._channels = set()
+        self._pid = os.getpid()
+        self._stats = dict(calls=0, rows=0, connects=0, reconnects=0, unavailable=0)
+
+    def _channel(self):
+        channel = getattr(self._local, "channel", None)
+        if channel is not None and self._pid == os.getpid():
+            return channel
+        channel = _Channel(self.path, self.capacity, self.timeout)
+        self._local.channel = channel
+        with self._lock:
+            if self._pid != os.getpid():  # forked: the parent's channels are not ours
+                self._pid, self._channels = os.getpid(), set()
+            self._channels.add(channel)
+            self._stats["connects"] += 1
+        return channel
+
+    def _drop(self):
+        channel = getattr(self._local, "channel", None)
+        self._local.channel = None
+        if channel is not None:
+            with self._lock:
+                self._channels.discard(channel)
+            channel.close()
+
+    def predict(self, rows, fallback=False):
+        """(N, 6) ensemble output for (N, 4) raw rows, computed by the server.
+
+        ``fallback`` asks for the server's degraded (XGBoost-only) function.
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        op = OP_PREDICT_FALLBACK if fallback else OP_PREDICT
+        for attempt in (0, 1):
+            try:
+                result, self.generation = self._channel().predict(rows, op)
+                break
+            except OSError as e:
+                # A restarted server drops open connections; retry once on a fresh one.
+                self._drop()
+                if attempt:
+                    with self._lock:
+                        self._stats["unavailable"] += 1
+                    raise InferenceUnavailable(f"Inference server at {self.path} unavailable: {e}") from e
+                with self._lock:
+                    self._stats["reconnects"] += 1
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["rows"] += len(rows)
+        return result
+
+    def close(self):
+        with self._lock:
+            channels, self._channels = self._channels, set()
+        for channel in channels:
+            channel.close()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, connections=len(self._channels), generation=self.generation)
+
+
+# -----------------------------------------------------------------------------
+# Server
+# -----------------------------------------------------------------------------
+class InferenceServer:
+    """Pre-forked inference processes accepting on one Unix socket.
+
+    ``predict`` maps (N, 4) rows to (N, 6) outputs and ``generation`` returns
+    the current model generation; both run in the forked processes. Requests
+    for the fallback go to ``fallback`` (``predict`` when not given).
+    """
+
+    def __init__(self, path, predict, processes=1, generation=lambda: 0, backlog=256, fallback=None):
+        self.path = path
+        self.predict = predict
+        self.fallback = fallback or predict
+        self.processes = processes
+        self.generation = generation
+        self.backlog = backlog
+        self._children = {}  # pid -> slot
+
+    def _listen(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.path)
+        os.chmod(self.path, 0o600)
+        sock.listen(self.backlog)
+        return sock
+
+    def _spawn(self, sock, slot):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                self._accept_loop(sock)
+            except BaseException:
+                logging.exception("Inference process %d failed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        self._children[pid] = slot
+
+    def _accept_loop(self, sock):
+        logging.info("Inference process %d accepting on %s", os.getpid(), self.path)
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except InterruptedError:
+                continue
+            threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def _serve_connection(self, conn):
+        shm = rows = results = None
+        capacity = 0
+        try:
+            while True:
+                op, n = REQUEST.unpack(_recv_exact(conn, REQUEST.size))
+                if op == OP_ATTACH:
+                    name = _recv_exact(conn, n).decode()
+                    if shm is not None:
+                        rows = results = None
+                        shm.close()
+                    shm = shared_memory.SharedMemory(name=name)
+                    # Only the client that created the segment may unlink it.
+                    resource_tracker.unregister(shm._name, "shared_memory")
+                    capacity = shm.size // ROW_BYTES
+                    rows, results = _views(shm, capacity)
+                    conn.sendall(REPLY.pack(STATUS_OK, self.generation(), 0))
+                elif op in (OP_PREDICT, OP_PREDICT_FALLBACK) and shm is not None and n <= capacity:
+                    try:
+                        generation = self.generation()
+                        predict = self.predict if op == OP_PREDICT else self.fallback
+                        results[:n] = predict(rows[:n])
+                        reply = REPLY.pack(STATUS_OK, generation, 0)
+                    except ModelNotReady as e:
+                        message = str(e).encode()
+                        reply = REPLY.pack(STATUS_NOT_READY, 0, len(message)) + message
+                    except Exception as e:
+                        logging.exception("Inference failed")
+                        message = str(e).encode()[:1000]
+                        reply = REPLY.pack(STATUS_ERROR, 0, len(message)) + message
+                    conn.sendall(reply)
+                else:
+                    raise ValueError(f"bad inference request op={op} n={n}")
+        except (ConnectionError, OSError):
+            pass  # client went away
+        except ValueError as e:
+            logging.warning("Dropping inference connection: %s", e)
+        finally:
+            conn.close()
+            if shm is not None:
+                rows = results = None
+                shm.close()
+
+    def serve_forever(self):
+        """Fork the inference processes and restart any that die, until SIGTERM/SIGINT."""
+        sock = self._listen()
+
+        def terminate(signum, frame):
+            raise SystemExit(0)
+        signal.signal(signal.SIGTERM, terminate)
+        signal.signal(signal.SIGINT, terminate)
+        try:
+            for slot in range(self.processes):
+                self._spawn(sock, slot)
+            logging.info("Inference server on %s with %d processes", self.path, self.processes)
+            while True:
+                pid, status = os.wait()
+                slot = self._children.pop(pid, None)
+                if slot is not None:
+                    logging.warning("Inference process %d exited (status %d); restarting", pid, status)
+                    self._spawn(sock, slot)
+        finally:
+            for pid in list(self._children):
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                    os.waitpid(pid, 0)
+                except (ProcessLookupError, ChildProcessError):
+                    pass
+            sock.close()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve ensemble inference on a Unix socket.")
+    parser.add_argument("--socket", default=os.getenv("INFERENCE_SOCKET", "/tmp/aqi-inference.sock"))
+    parser.add_argument("--processes", type=int, default=int(os.getenv("INFERENCE_PROCESSES", os.cpu_count() or 1)))
+    args = parser.parse_args()
+
+    # One BLAS thread per inference process; the processes are the parallelism.
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, "1")
+    # This process computes locally; background services belong to the web tier.
+    os.environ.pop("INFERENCE_SOCKET", None)
+    os.environ["BACKGROUND_SERVICES"] = "0"
+    # Importing the API opens its log with mode="w"; keep the web tier's app.log intact.
+    os.environ.setdefault("APP_LOG", "inference_server.log")
+    import gc
+    import real_time_api as api
+
+    api.models.start()
+    if not api.models.wait(float(os.getenv("MODEL_LOAD_TIMEOUT", 300))):
+        logging.error("Models failed to load: %s", api.models.status())
+        return 1
+    api.ensemble_predict(np.zeros((1, N_FEATURES)))  # warm-up before forking
+    gc.collect()
+    gc.freeze()
+    InferenceServer(args.socket, api.ensemble_predict, args.processes,
+                    generation=api.models.reload_if_changed, fallback=api.xgboost_predict).serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""Station CSV ingestion into a Parquet store partitioned by station and month.
+
+The schema mapping, time-alignment check and missing-fraction filter from
+training/Model_Training_Final.ipynb, run across a process pool. Each file is
+streamed in chunks (only the mapped columns are parsed), normalized to the
+canonical column names and written to
+
+    <out>/station=<id>/month=<YYYY-MM>/part-0.parquet
+
+via a staging directory that replaces the station's partitions only once the
+file passes its checks. ``<out>/_manifest.json`` records each source file's
+size and mtime so re-runs skip files that have not changed.
+
+Usage:
+    python ingest.py run --stations-info ../datasets2/stations_info.csv --data-dir ../datasets2/datasets --out store
+    python ingest.py sample --out /tmp/aqi_sample --stations 40 --days 365
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+# Canonical column -> accepted header variants (first match wins)
+EXPECTED_MAPPING = {
+    "From Date": ["From Date"],
+    "To Date": ["To Date"],
+    "PM2.5": ["PM2.5", "PM2.5 (ug/m3)"],
+    "PM10": ["PM10", "PM10 (ug/m3)"],
+    "NO": ["NO", "NO (ug/m3)"],
+    "NO2": ["NO2", "NO2 (ug/m3)"],
+    "NOx": ["NOx", "NOx (ppb)"],
+    "NH3": ["NH3", "NH3 (ug/m3)"],
+    "SO2": ["SO2", "SO2 (ug/m3)"],
+    "CO": ["CO", "CO (mg/m3)"],
+    "Ozone": ["Ozone", "Ozone (ug/m3)"],
+    "Benzene": ["Benzene", "Benzene (ug/m3)"],
+    "Toluene": ["Toluene", "Toluene (ug/m3)"],
+    "Temp": ["Temp", "AT (degree C)", "Temp (degree C)"],
+    "RH": ["RH", "RH (%)"],
+}
+# Meteorological inputs of the prediction models, kept when present
+EXTRA_MAPPING = {
+    "WS (m/s)": ["WS (m/s)", "WS"],
+    "BP (mmHg)": ["BP (mmHg)", "BP"],
+}
+VALUE_COLUMNS = [c for c in list(EXPECTED_MAPPING) + list(EXTRA_MAPPING) if c not in ("From Date", "To Date")]
+
+EXPECTED_DIFF = pd.Timedelta(hours=1)
+TOLERANCE = pd.Timedelta(minutes=5)
+MIN_COVERAGE = 0.8
+MAX_MISSING = 0.40
+CHUNK_ROWS = 100_000
+NA_VALUES = ["None", "NA", "N/A", "NaN", "-", ""]
+MANIFEST = "_manifest.json"
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def resolve_columns(header):
+    """Map actual header names to canonical ones; returns ({actual: canonical}, coverage)."""
+    rename = {}
+    for canonical, variants in list(EXPECTED_MAPPING.items()) + list(EXTRA_MAPPING.items()):
+        for alt in variants:
+            if alt in header:
+                rename[alt] = canonical
+                break
+    found = sum(1 for canonical in EXPECTED_MAPPING if canonical in rename.values())
+    return rename, found / len(EXPECTED_MAPPING)
+
+
+def _fingerprint(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+# -----------------------------------------------------------------------------
+# One file (runs in a worker process)
+# -----------------------------------------------------------------------------
+def ingest_file(path, station, out_dir, chunk_rows=CHUNK_ROWS, min_coverage=MIN_COVERAGE, max_missing=MAX_MISSING):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    t0 = time.perf_counter()
+    result = {"station": station, "path": path, **_fingerprint(path)}
+    header = list(pd.read_csv(path, nrows=0).columns)
+    rename, coverage = resolve_columns(header)
+    result["coverage"] = coverage
+    if coverage < min_coverage or "From Date" not in rename.values():
+        return dict(result, status="rejected", reason=f"schema coverage {coverage:.0%}")
+
+    staging = os.path.join(out_dir, f".staging-{station}-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    schema = pa.schema([("ts", pa.timestamp("s"))] + [(c, pa.float32()) for c in VALUE_COLUMNS])
+    writers = {}
+    stamps, missing, rows = [], np.zeros(len(VALUE_COLUMNS)), 0
+    date_col = next(a for a, c in rename.items() if c == "From Date")
+    try:
+        # Only the mapped columns are parsed. Known placeholders become NaN in the
+        # C parser; any other stray text leaves a column as object, coerced below.
+        for chunk in pd.read_csv(path, usecols=[a for a, c in rename.items() if c != "To Date"],
+                                 na_values=NA_VALUES, chunksize=chunk_rows):
+            chunk = chunk.rename(columns=rename)
+            ts = pd.to_datetime(chunk.pop("From Date"), errors="coerce")
+            keep = ts.notna().to_numpy()
+            frame = pd.DataFrame({"ts": ts[keep].astype("datetime64[s]").to_numpy()})
+            for j, col in enumerate(VALUE_COLUMNS):
+                if col in chunk:
+                    column = chunk[col][keep]
+                    if column.dtype == object or column.dtype == "str":
+                        column = pd.to_numeric(column, errors="coerce")
+                    values = column.to_numpy(np.float32)
+                else:
+                    values = np.full(int(keep.sum()), np.nan, dtype=np.float32)
+                frame[col] = values
+                if col in EXPECTED_MAPPING:
+                    missing[j] += np.isnan(values).sum()
+            rows += len(frame)
+            stamps.append(frame["ts"].to_numpy().astype(np.int64))
+            months = frame["ts"].dt.strftime("%Y-%m")
+            for month, part in frame.groupby(months.to_numpy(), sort=False):
+                writer = writers.get(month)
+                if writer is None:
+                    part_dir = os.path.join(staging, f"month={month}")
+                    os.makedirs(part_dir, exist_ok=True)
+                    writer = writers[month] = pq.ParquetWriter(os.path.join(part_dir, "part-0.parquet"), schema)
+                writer.write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False))
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    result.update(rows=rows, months=len(writers), peak_rss_mb=_peak_rss_mb())
+    expected_cols = [j for j, c in enumerate(VALUE_COLUMNS) if c in EXPECTED_MAPPING and c in rename.values()]
+    avg_missing = float(np.mean(missing[expected_cols] / rows)) if rows and expected_cols else 1.0
+    result["avg_missing"] = avg_missing
+    median_diff = None
+    if rows > 1:
+        stamps = np.sort(np.concatenate(stamps))
+        median_diff = pd.Timedelta(seconds=float(np.median(np.diff(stamps))))
+        result["median_diff_s"] = median_diff.total_seconds()
+
+    reason = None
+    if median_diff is None or abs(median_diff - EXPECTED_DIFF) >= TOLERANCE:
+        reason = f"time alignment (median step {median_diff})"
+    elif avg_missing > max_missing:
+        reason = f"average missing fraction {avg_missing:.0%}"
+    if reason:
+        shutil.rmtree(staging, ignore_errors=True)
+        return dict(result, status="rejected", reason=reason, seconds=time.perf_counter() - t0)
+
+    final = os.path.join(out_dir, f"station={station}")
+    shutil.rmtree(final, ignore_errors=True)
+    os.replace(staging, final)
+    return dict(result, status="ingested", seconds=time.perf_counter() - t0)
+
+
+# -----------------------------------------------------------------------------
+# Whole run
+# -----------------------------------------------------------------------------
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def station_files(stations_info, data_dir):
+    """(station, csv path) for every file_name in stations_info.csv."""
+    names = pd.read_csv(stations_info, usecols=["file_name"])["file_name"].astype(str)
+    out = []
+    for name in names:
+        station = os.path.splitext(name)[0]
+        out.append((station, os.path.join(data_dir, name if os.path.splitext(name)[1] else name + ".csv")))
+    return out
+
+
+def run(stations_info, data_dir, out_dir, workers=None, chunk_rows=CHUNK_ROWS, force=False,
+        min_coverage=MIN_COVERAGE, max_missing=MAX_MISSING, log=print):
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    files = station_files(stations_info, data_dir)
+    todo, skipped, missing_files = [], 0, []
+    for station, path in files:
+        if not os.path.exists(path):
+            missing_files.append(path)
+            continue
+        entry = manifest.get(station)
+        if not force and entry and entry.get("path") == path and \
+                {k: entry.get(k) for k in ("size", "mtime_ns")} == _fingerprint(path):
+            skipped += 1
+            continue
+        todo.append((station, path))
+
+    t0 = time.perf_counter()
+    summary = {"ingested": 0, "rejected": 0, "failed": 0, "rows": 0}
+    worker_peak = 0.0
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(ingest_file, path, station, out_dir, chunk_rows, min_coverage, max_missing): station
+                       for station, path in todo}
+            for future in as_completed(futures):
+                station = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    summary["failed"] += 1
+                    log(f"  {station}: failed: {e}")
+                    continue
+                summary[result["status"]] += 1
+                summary["rows"] += result.get("rows", 0)
+                worker_peak = max(worker_peak, result.get("peak_rss_mb", 0.0))
+                if result["status"] == "rejected":
+                    log(f"  {station}: rejected ({result['reason']})")
+                    shutil.rmtree(os.path.join(out_dir, f"station={station}"), ignore_errors=True)
+                manifest[station] = result
+                save_manifest(out_dir, manifest)
+
+    elapsed = time.perf_counter() - t0
+    summary.update(
+        files=len(todo), skipped=skipped, missing=len(missing_files), seconds=elapsed,
+        files_per_second=len(todo) / elapsed if todo and elapsed else None,
+        peak_rss_mb=_peak_rss_mb(), worker_peak_rss_mb=worker_peak,
+    )
+    return summary
+
+
+# -----------------------------------------------------------------------------
+# Sample data
+# -----------------------------------------------------------------------------
+def make_sample(out_dir, n_stations=40, days=365, seed=0):
+    """Write stations_info.csv and datasets/<id>.csv files shaped like the CPCB exports,
+    including header variants, text placeholders, one sparse and one 15-minute file."""
+    rng = np.random.default_rng(seed)
+    data_dir = os.path.join(out_dir, "datasets")
+    os.makedirs(data_dir, exist_ok=True)
+    plain = {c: c for c in VALUE_COLUMNS}
+    units = {c: v[-1] for c, v in list(EXPECTED_MAPPING.items()) + list(EXTRA_MAPPING.items())}
+    scale = {"PM2.5": 60, "PM10": 110, "NO": 15, "NO2": 30, "NOx": 35, "NH3": 25, "SO2": 12, "CO": 1.1,
+             "Ozone": 35, "Benzene": 2, "Toluene": 8, "Temp": 27, "RH": 65, "WS (m/s)": 1.5, "BP (mmHg)": 750}
+    info = []
+    for i in range(n_stations):
+        station = f"ST{i:03d}"
+        step = "15min" if i == 1 else "1h"
+        index = pd.date_range("2019-01-01", periods=days * (96 if i == 1 else 24), freq=step)
+        names = units if i % 2 else plain
+        frame = {"From Date": index.strftime("%Y-%m-%d %H:%M:%S"),
+                 "To Date": (index + pd.Timedelta(step)).strftime("%Y-%m-%d %H:%M:%S")}
+        for col in VALUE_COLUMNS:
+            values = np.round(scale[col] * rng.lognormal(0, 0.25, len(index)), 2).astype(object)
+            values[rng.random(len(index)) < (0.6 if i == 2 else 0.05)] = ""
+            values[rng.random(len(index)) < 0.001] = "None"
+            frame[names[col]] = values
+        pd.DataFrame(frame).to_csv(os.path.join(data_dir, f"{station}.csv"), index=False)
+        info.append({"file_name": station, "state": "Sample", "city": f"City{i}", "agency": "SAMPLE",
+                     "station_location": f"Site {i}", "start_month": "January", "start_month_num": 1,
+                     "start_year": 2019})
+    pd.DataFrame(info).to_csv(os.path.join(out_dir, "stations_info.csv"), index=False)
+    return os.path.join(out_dir, "stations_info.csv"), data_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest station CSVs into partitioned Parquet.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("run", help="ingest new or changed station files")
+    p.add_argument("--stations-info", default="../datasets2/stations_info.csv")
+    p.add_argument("--data-dir", default="../datasets2/datasets")
+    p.add_argument("--out", default="store")
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    p.add_argument("--min-coverage", type=float, default=MIN_COVERAGE)
+    p.add_argument("--max-missing", type=float, default=MAX_MISSING)
+    p.add_argument("--force", action="store_true", help="re-ingest files even if unchanged")
+    s = sub.add_parser("sample", help="generate sample station CSVs")
+    s.add_argument("--out", default="sample_data")
+    s.add_argument("--stations", type=int, default=40)
+    s.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    if args.command == "sample":
+        info, data_dir = make_sample(args.out, args.stations, args.days)
+        print(f"Wrote {args.stations} station files to {data_dir} and {info}")
+        return
+    summary = run(args.stations_info, args.data_dir, args.out, args.workers, args.chunk_rows, args.force,
+                  args.min_coverage, args.max_missing)
+    rate = summary["files_per_second"]
+    print(f"{summary['files']} files ({summary['skipped']} unchanged, {summary['missing']} missing): "
+          f"{summary['ingested']} ingested, {summary['rejected']} rejected, {summary['failed']} failed, "
+          f"{summary['rows']:,} rows in {summary['seconds']:.1f}s"
+          + (f" ({rate:.2f} files/s)" if rate else ""))
+    print(f"Peak RSS: {summary['peak_rss_mb']:.0f} MB main, {summary['worker_peak_rss_mb']:.0f} MB per worker")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""NumPy forward pass for the Keras LSTM pollutant model.
+
+The serving path only needs inference, so the stacked LSTM/Dense weights are
+exported once from the Keras .h5 into a small .npz and evaluated here without
+importing TensorFlow.
+
+Export:
+    python lstm_numpy.py export [--h5 models/lstm_multi_pollutants_model.h5] [--out models/lstm_multi_pollutants_model.npz]
+"""
+import os
+import json
+import argparse
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+DEFAULT_H5 = os.path.join(MODELS_DIR, "lstm_multi_pollutants_model.h5")
+DEFAULT_NPZ = os.path.join(MODELS_DIR, "lstm_multi_pollutants_model.npz")
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _hard_sigmoid(x):
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "tanh": np.tanh,
+    "sigmoid": _sigmoid,
+    "hard_sigmoid": _hard_sigmoid,
+}
+
+# -----------------------------------------------------------------------------
+# Export from Keras .h5
+# -----------------------------------------------------------------------------
+def read_h5(h5_path=DEFAULT_H5):
+    """(layer specs, weight arrays) of a Sequential .h5, in the form NumpyLSTMModel takes."""
+    import h5py
+
+    arrays, layers = {}, []
+    with h5py.File(h5_path, "r") as f:
+        config = json.loads(f.attrs["model_config"])
+        if config["class_name"] != "Sequential":
+            raise ValueError(f"Only Sequential models are supported, got {config['class_name']}")
+        weights = f["model_weights"]
+        for layer in config["config"]["layers"]:
+            kind, cfg = layer["class_name"], layer["config"]
+            if kind in ("InputLayer", "Dropout"):
+                continue
+            if kind not in ("LSTM", "Dense"):
+                raise ValueError(f"Unsupported layer type: {kind}")
+            group = weights[cfg["name"]]
+            values = [np.asarray(group[name], dtype=np.float32)
+                      for name in group.attrs["weight_names"]]
+            spec = {"type": kind, "activation": cfg["activation"]}
+            if kind == "LSTM":
+                if cfg.get("go_backwards") or cfg.get("stateful"):
+                    raise ValueError(f"Layer {cfg['name']}: go_backwards/stateful LSTMs are not supported")
+                spec["recurrent_activation"] = cfg["recurrent_activation"]
+                spec["return_sequences"] = cfg["return_sequences"]
+                names = ["kernel", "recurrent_kernel", "bias"]
+            else:
+                names = ["kernel", "bias"]
+            if not cfg.get("use_bias", True):
+                names.remove("bias")
+            idx = len(layers)
+            for name, value in zip(names, values):
+                arrays[f"{idx}_{name}"] = value
+            layers.append(spec)
+    return layers, arrays
+
+
+def export_h5(h5_path=DEFAULT_H5, out_path=DEFAULT_NPZ):
+    """Write the LSTM/Dense weights and layer config of a Sequential .h5 to .npz."""
+    layers, arrays = read_h5(h5_path)
+    np.savez(out_path, layers=np.array(json.dumps(layers)), **arrays)
+    return out_path
+
+def read_npz(path=DEFAULT_NPZ):
+    with np.load(path) as data:
+        layers = json.loads(str(data["layers"]))
+        arrays = {k: data[k] for k in data.files if k != "layers"}
+    return layers, arrays
+
+# -----------------------------------------------------------------------------
+# Reduced precision
+# -----------------------------------------------------------------------------
+PRECISIONS = ("float32", "float16", "int8")
+
+
+def quantize_int8(w):
+    """Symmetric int8 weights with one float32 scale per output column."""
+    scale = np.abs(w).max(axis=0).astype(np.float32) / 127
+    scale[scale == 0] = 1
+    q = np.clip(np.round(w / scale), -127, 127).astype(np.int8)
+    return q, scale
+
+
+def with_precision(arrays, precision):
+    """(weight arrays, compute dtype) for serving at ``precision``.
+
+    float16 runs the whole forward pass in half precision. int8 rounds every
+    kernel to int8 (biases stay float32) and computes in float32 on the
+    dequantized weights: NumPy has no int8 matmul, so this gives int8 accuracy
+    but not its speed.
+    """
+    if precision == "float32":
+        return arrays, np.float32
+    if precision == "float16":
+        return {k: np.asarray(v, dtype=np.float16) for k, v in arrays.items()}, np.float16
+    if precision == "int8":
+        reduced = {}
+        for k, v in arrays.items():
+            if k.endswith("kernel"):
+                q, scale = quantize_int8(np.asarray(v, dtype=np.float32))
+                v = q.astype(np.float32) * scale
+            reduced[k] = v
+        return reduced, np.float32
+    raise ValueError(f"Unknown precision {precision!r}; expected one of {', '.join(PRECISIONS)}")
+
+# -----------------------------------------------------------------------------
+# Forward pass
+# -----------------------------------------------------------------------------
+class NumpyLSTMModel:
+    """Stacked LSTM/Dense model evaluated with NumPy, matching Keras inference.
+
+    ``precision`` other than float32 serves reduced-precision weights (see
+    ``with_precision``) and overrides ``dtype``.
+    """
+
+    def __init__(self, layers, arrays, dtype=np.float32, precision="float32"):
+        if precision != "float32":
+            arrays, dtype = with_precision(arrays, precision)
+        self.precision = precision
+        self.dtype = np.dtype(dtype)
+        self.layers = []
+        for idx, spec in enumerate(layers):
+            # No copy when the stored dtype already matches (e.g. memory-mapped bundle arrays).
+            params = {name: np.asarray(arrays[f"{idx}_{name}"], dtype=self.dtype)
+                      for name in ("kernel", "recurrent_kernel", "bias") if f"{idx}_{name}" in arrays}
+            self.layers.append((spec, params))
+
+    @classmethod
+    def load(cls, path=DEFAULT_NPZ, dtype=np.float32, precision="float32"):
+        layers, arrays = read_npz(path)
+        return cls(layers, arrays, dtype=dtype, precision=precision)
+
+    def predict(self, x, verbose=0):
+        """Return the model output for an (N, timesteps, features) input."""
+        out = np.asarray(x, dtype=self.dtype)
+        for spec, params in self.layers:
+            if spec["type"] == "LSTM":
+                out = self._lstm(out, spec, params)
+            else:
+                out = self._dense(out, spec, params)
+        return out
+
+    def initial_state(self, n_rows):
+        """Zero (h, c) pairs, one per LSTM layer, for ``n_rows`` independent sequences."""
+        return [(np.zeros((n_rows, p["recurrent_kernel"].shape[0]), dtype=self.dtype),
+                 np.zeros((n_rows, p["recurrent_kernel"].shape[0]), dtype=self.dtype))
+                for spec, p in self.layers if spec["type"] == "LSTM"]
+
+    def step(self, x, states):
+        """Advance every sequence by one (N, features) timestep.
+
+        Returns (output, new states). Feeding a sequence one step at a time
+        from ``initial_state`` gives the same output as ``predict`` on the
+        whole sequence; carrying the states on past ``timesteps`` steps is the
+        stateful (unbounded history) variant of the model.
+        """
+        out = np.asarray(x, dtype=self.dtype)
+        new_states, k = [], 0
+        for spec, params in self.layers:
+            if spec["type"] == "LSTM":
+                h, c = states[k]
+                units = params["recurrent_kernel"].shape[0]
+                z = out @ params["kernel"] + h @ params["recurrent_kernel"]
+                if "bias" in params:
+                    z = z + params["bias"]
+                out, c = self._cell(z, c, spec, units)
+                new_states.append((out, c))
+                k += 1
+            else:
+                out = self._dense(out, spec, params)
+        return out, new_states
+
+    @staticmethod
+    def _dense(x, spec, params):
+        out = x @ params["kernel"]
+        if "bias" in params:
+            out = out + params["bias"]
+        return ACTIVATIONS[spec["activation"]](out)
+
+    @staticmethod
+    def _cell(z, c, spec, units):
+        act = ACTIVATIONS[spec["activation"]]
+        rec_act = ACTIVATIONS[spec["recurrent_activation"]]
+        # Keras gate order: input, forget, cell, output.
+        i = rec_act(z[:, :units])
+        f = rec_act(z[:, units:2 * units])
+        g = act(z[:, 2 * units:3 * units])
+        o = rec_act(z[:, 3 * units:])
+        c = f * c + i * g
+        return o * act(c), c
+
+    def _lstm(self, x, spec, params):
+        kernel, recurrent = params["kernel"], params["recurrent_kernel"]
+        units = recurrent.shape[0]
+        n_rows, timesteps, _ = x.shape
+
+        # Input projections for every timestep in one matmul; only h @ U stays in the loop.
+        xz = x @ kernel
+        if "bias" in params:
+            xz = xz + params["bias"]
+        h = np.zeros((n_rows, units), dtype=self.dtype)
+        c = np.zeros((n_rows, units), dtype=self.dtype)
+        seq = np.empty((n_rows, timesteps, units), dtype=self.dtype) if spec["return_sequences"] else None
+        for t in range(timesteps):
+            z = xz[:, t] + h @ recurrent
+            h, c = self._cell(z, c, spec, units)
+            if seq is not None:
+                seq[:, t] = h
+        return seq if seq is not None else h
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Keras LSTM weights for NumPy inference")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="convert an .h5 model to .npz")
+    export.add_argument("--h5", default=DEFAULT_H5)
+    export.add_argument("--out", default=DEFAULT_NPZ)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        path = export_h5(args.h5, args.out)
+        print(f"Exported LSTM weights → {path}")
+
+
+if __name__ == "__main__":
+    main()
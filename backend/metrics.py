@@ -0,0 +1,300 @@
+"""In-process metrics for the API, exposed in Prometheus text format at /metrics.
+
+Hot-path instrumentation has to stay cheap: an observation is a perf_counter
+pair, a bisect over fixed bucket bounds and one locked increment. Labels are
+passed positionally and must come from a small fixed set (stage names, route
+rules, upstream names), never from request data, so the number of series stays
+bounded. Component ``stats()`` dicts are attached as collectors and only read
+when /metrics is scraped.
+
+``Profiler`` runs cProfile on a sampled fraction of requests and keeps the
+stats of those slower than a threshold, for ``python -m pstats``.
+"""
+import os
+import re
+import time
+import random
+import logging
+import cProfile
+import threading
+from bisect import bisect_left
+
+# Seconds; spans a cache hit (~50 us) to a slow upstream call.
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _fmt(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> value
+
+    def _check(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {labels}")
+
+    def lines(self):
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, value in series:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_fmt(value)}"
+
+    def value(self, *labels):
+        with self._lock:
+            return self._series.get(labels, 0)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            value = self._series.get(labels)
+            if value is None:
+                self._check(labels)
+                value = 0
+            self._series[labels] = value + amount
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        self._check(labels)
+        with self._lock:
+            self._series[labels] = value
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "errors", "t0")
+
+    def __init__(self, histogram, labels, errors):
+        self.histogram = histogram
+        self.labels = labels
+        self.errors = errors
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.t0, *self.labels)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc(*self.labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                self._check(labels)
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels, errors=None):
+        """Context manager observing the block's duration; ``errors`` counts exceptions."""
+        return _Timer(self, labels, errors)
+
+    def value(self, *labels):
+        """(count, sum) for one series."""
+        with self._lock:
+            series = self._series.get(labels)
+            return (series[2], series[1]) if series else (0, 0.0)
+
+    def lines(self):
+        with self._lock:
+            series = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _fmt(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_fmt(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+        self._collectors = []  # (prefix, help, callable returning a stats dict)
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def collector(self, prefix, help, stats):
+        """Export the numeric top-level fields of ``stats()`` as ``<prefix>_<field>`` at scrape time."""
+        with self._lock:
+            self._collectors.append((prefix, help, stats))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        out = []
+        for metric in metrics:
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            out.extend(metric.lines())
+        for prefix, help, stats in collectors:
+            try:
+                values = stats()
+            except Exception:
+                logging.exception("Metrics collector %s failed", prefix)
+                continue
+            for key, value in values.items():
+                if value is None or not isinstance(value, (int, float)):
+                    continue
+                name = prefix + "_" + re.sub(r"[^a-zA-Z0-9_]", "_", key)
+                out.append(f"# HELP {name} {help}: {key}")
+                out.append(f"# TYPE {name} untyped")
+                out.append(f"{name} {_fmt(value)}")
+        return "\n".join(out) + "\n"
+
+
+# -----------------------------------------------------------------------------
+# Process-wide registry and the metrics the backend modules record into
+# -----------------------------------------------------------------------------
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "aqi_http_request_duration_seconds", "Request latency by route and method.", ("route", "method"))
+REQUESTS = REGISTRY.counter(
+    "aqi_http_requests_total", "Requests by route, method and status code.", ("route", "method", "status"))
+REQUEST_ERRORS = REGISTRY.counter(
+    "aqi_http_request_errors_total", "Requests answered with a 5xx or an unhandled exception.", ("route",))
+IN_FLIGHT = REGISTRY.gauge("aqi_http_requests_in_flight", "Requests being handled right now.")
+STAGE_SECONDS = REGISTRY.histogram(
+    "aqi_stage_duration_seconds", "Time spent per request pipeline stage.", ("stage",))
+CACHE_LOOKUPS = REGISTRY.counter(
+    "aqi_cache_lookups_total", "Response cache lookups by cache and result (hit/miss/bypass).", ("cache", "result"))
+OUTBOUND_SECONDS = REGISTRY.histogram(
+    "aqi_outbound_duration_seconds", "Latency of calls to OpenWeather, ipinfo, the database and SMTP.",
+    ("target",))
+OUTBOUND_ERRORS = REGISTRY.counter(
+    "aqi_outbound_errors_total", "Outbound calls that raised.", ("target",))
+
+
+def outbound(target):
+    """Time a call to an upstream service; exceptions count towards its errors."""
+    return OUTBOUND_SECONDS.time(target, errors=OUTBOUND_ERRORS)
+
+
+# -----------------------------------------------------------------------------
+# Sampled slow-request profiling
+# -----------------------------------------------------------------------------
+class Profiler:
+    """Profile a ``sample_rate`` fraction of requests; dump those over ``slow_ms``.
+
+    One request is profiled at a time (cProfile instances cannot overlap from
+    Python 3.12 on), so under concurrency the effective rate is lower. Only the
+    newest ``keep`` dumps are kept in ``directory``.
+    """
+
+    def __init__(self, sample_rate=0.0, slow_ms=500.0, directory="profiles", keep=50):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.directory = directory
+        self.keep = keep
+        self._busy = threading.Lock()
+        self._stats = dict(sampled=0, dumped=0, skipped_busy=0)
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def start(self):
+        """A running profile for this request, or None when it is not sampled."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._busy.acquire(blocking=False):
+            self._stats["skipped_busy"] += 1
+            return None
+        profile = cProfile.Profile()
+        profile.enable()
+        self._stats["sampled"] += 1
+        return profile
+
+    def finish(self, profile, elapsed, name):
+        """Stop ``profile``; write it out if the request took ``elapsed`` seconds or more than slow_ms."""
+        profile.disable()
+        self._busy.release()
+        ms = elapsed * 1000
+        if ms < self.slow_ms:
+            return None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            slug = re.sub(r"[^a-zA-Z0-9]+", "_", name).strip("_") or "root"
+            path = os.path.join(self.directory, f"{time.strftime('%Y%m%dT%H%M%S')}_{slug}_{ms:.0f}ms.prof")
+            profile.dump_stats(path)
+            self._stats["dumped"] += 1
+            self._prune()
+            logging.info("Profiled slow request %s (%.0f ms): %s", name, ms, path)
+            return path
+        except OSError:
+            logging.exception("Could not write request profile")
+            return None
+
+    def _prune(self):
+        dumps = sorted(f for f in os.listdir(self.directory) if f.endswith(".prof"))
+        for name in dumps[:max(0, len(dumps) - self.keep)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def stats(self):
+        return dict(self._stats, sample_rate=self.sample_rate, slow_ms=self.slow_ms)
@@ -0,0 +1,366 @@
+"""Single-file, memory-mappable bundle of every serving model artifact.
+
+    python model_bundle.py export [--out models/aqi_models.bundle] [--version LABEL]
+    python model_bundle.py verify [models/aqi_models.bundle]
+    python model_bundle.py info [models/aqi_models.bundle]
+
+``export`` reads the artifacts the API used to load one by one: the
+xgb_booster_{idx}.json files (or, with ``--xgb-pickle``, the estimators of a
+pickled MultiOutputRegressor), the two MinMaxScalers (joblib or plain pickle)
+and the LSTM weights (.npz, or the Keras .h5). It writes one file holding:
+
+- the boosters compiled into the FusedForest arrays the API evaluates, plus
+  each booster in xgboost's binary UBJSON form for xgboost tooling;
+- each scaler's ``scale_``/``min_`` as raw arrays, served by ``MinMaxTransform``
+  without importing scikit-learn;
+- the LSTM weights as contiguous float32 arrays.
+
+Layout: the magic ``AQIBNDL\\0``, a uint32 format version, a uint32 manifest
+length, the JSON manifest, then every array's raw bytes at a 64-byte aligned
+offset. The manifest records the bundle version, each array's dtype, shape,
+offset and sha256, and the sha256 of every source artifact; it holds no
+timestamp, so exporting the same artifacts gives the same bytes. The bundle is
+a build output, not committed: ``stale_sources()`` tells the API when the
+artifacts on disk no longer match it. ``ModelBundle``
+maps the file read-only and hands out views into it, so nothing is parsed or
+copied at load and processes that open the same file share its pages through
+the page cache. Export writes a temporary file and renames it over the old
+bundle, so a running process keeps its mapping of the previous version.
+"""
+import os
+import sys
+import json
+import glob
+import struct
+import hashlib
+import argparse
+import threading
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+DEFAULT_BUNDLE = os.path.join(MODELS_DIR, "aqi_models.bundle")
+
+MAGIC = b"AQIBNDL\0"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII")  # magic, format version, manifest length
+ALIGN = 64
+
+FOREST_ARRAYS = ("nodes", "default_left", "leaf_values", "tree_offsets", "base_scores")
+SCALERS = ("scaler_meteo", "pollutant_scaler")
+
+
+class BundleError(ValueError):
+    """The bundle is malformed, from a newer format or fails its checksums."""
+
+
+def _sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# -----------------------------------------------------------------------------
+# Served objects
+# -----------------------------------------------------------------------------
+class MinMaxTransform:
+    """transform/inverse_transform of a fitted sklearn MinMaxScaler (clip=False).
+
+    Same arithmetic and dtype rules as sklearn, so results match it exactly.
+    """
+
+    def __init__(self, scale, min_, feature_names=None):
+        self.scale_ = scale
+        self.min_ = min_
+        self.feature_names_in_ = feature_names
+        self.n_features_in_ = len(scale)
+
+    def _validated(self, X):
+        X = np.asarray(X)
+        dtype = X.dtype if X.dtype in (np.float64, np.float32, np.float16) else np.float64
+        X = np.array(X, dtype=dtype, ndmin=2)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the scaler expects {self.n_features_in_}")
+        return X
+
+    def transform(self, X):
+        X = self._validated(X)
+        X *= self.scale_
+        X += self.min_
+        return X
+
+    def inverse_transform(self, X):
+        X = self._validated(X)
+        X -= self.min_
+        X /= self.scale_
+        return X
+
+
+# -----------------------------------------------------------------------------
+# Reading
+# -----------------------------------------------------------------------------
+class ModelBundle:
+    def __init__(self, path=DEFAULT_BUNDLE, verify=True):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise BundleError(f"{path}: truncated header")
+            magic, fmt, length = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise BundleError(f"{path}: not a model bundle")
+            if fmt > FORMAT_VERSION:
+                raise BundleError(f"{path}: bundle format {fmt} is newer than supported ({FORMAT_VERSION})")
+            self.manifest = json.loads(f.read(length))
+        self._sources_lock = threading.Lock()
+        self._sources_checked = None  # (source file stats, stale paths)
+        if verify:
+            self.verify()
+        self._map = np.memmap(path, dtype=np.uint8, mode="r")
+
+    @property
+    def version(self):
+        return self.manifest["version"]
+
+    def array(self, name):
+        """Read-only view of one array in the mapped file."""
+        spec = self.manifest["arrays"][name]
+        return np.ndarray(tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]), buffer=self._map,
+                          offset=spec["offset"])
+
+    def verify(self):
+        """Check every array against its manifest checksum; raises BundleError."""
+        # Plain reads rather than the mapping, so checking leaves no pages mapped in.
+        with open(self.path, "rb") as f:
+            for name, spec in self.manifest["arrays"].items():
+                f.seek(spec["offset"])
+                data = f.read(spec["nbytes"])
+                if len(data) != spec["nbytes"] or hashlib.sha256(data).hexdigest() != spec["sha256"]:
+                    raise BundleError(f"{self.path}: checksum mismatch in {name}")
+
+    def stale_sources(self, models_dir=MODELS_DIR):
+        """Source artifacts under ``models_dir`` whose sha256 differs from the one
+        exported. Missing files are not stale (a deploy may ship only the bundle).
+        Rehashes only when a source file's size or mtime changed."""
+        paths = [os.path.join(models_dir, source["path"]) for sources in self.manifest["sources"].values()
+                 for source in sources]
+        expected = [source["sha256"] for sources in self.manifest["sources"].values() for source in sources]
+        stats = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                stats.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stats.append(None)
+        with self._sources_lock:
+            if self._sources_checked is None or self._sources_checked[0] != stats:
+                stale = [os.path.relpath(path, models_dir) for path, sha, st in zip(paths, expected, stats)
+                         if st is not None and _sha256_file(path) != sha]
+                self._sources_checked = (stats, stale)
+            return list(self._sources_checked[1])
+
+    def forest(self):
+        from forest import FusedForest
+        meta = self.manifest["forest"]
+        return FusedForest(*(self.array(f"forest/{name}") for name in FOREST_ARRAYS), meta["n_features"])
+
+    def hybrid_forest(self, max_fused_rows=None):
+        """forest() for small batches, this bundle's boosters (loaded on first use) for large ones."""
+        from forest import HybridForest, FUSED_MAX_ROWS
+        n_outputs = self.manifest["forest"]["n_outputs"]
+        return HybridForest(self.forest(), lambda: [self.booster(idx) for idx in range(n_outputs)],
+                            FUSED_MAX_ROWS if max_fused_rows is None else max_fused_rows)
+
+    def scaler(self, name):
+        return MinMaxTransform(self.array(f"{name}/scale"), self.array(f"{name}/min"),
+                               self.manifest["scalers"][name].get("feature_names"))
+
+    def lstm(self, dtype=np.float32, precision="float32"):
+        from lstm_numpy import NumpyLSTMModel
+        prefix = "lstm/"
+        arrays = {name[len(prefix):]: self.array(name) for name in self.manifest["arrays"] if name.startswith(prefix)}
+        return NumpyLSTMModel(self.manifest["lstm"]["layers"], arrays, dtype=dtype, precision=precision)
+
+    def booster(self, idx):
+        """The idx-th booster as an xgboost.Booster (needs xgboost)."""
+        import xgboost
+        booster = xgboost.Booster()
+        booster.load_model(bytearray(self.array(f"xgboost/booster_{idx}").tobytes()))
+        return booster
+
+
+_open_lock = threading.Lock()
+_open_bundles = {}
+
+
+def open_bundle(path=DEFAULT_BUNDLE, verify=True):
+    """A shared ModelBundle for ``path``, reopened when the file is replaced.
+
+    The API's loaders each take their part of the same bundle; this maps and
+    verifies it once per version rather than once per loader.
+    """
+    stat = os.stat(path)
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _open_lock:
+        cached = _open_bundles.get(path)
+        if cached is None or cached[0] != key:
+            cached = _open_bundles[path] = (key, ModelBundle(path, verify=verify))
+        return cached[1]
+
+
+# -----------------------------------------------------------------------------
+# Writing
+# -----------------------------------------------------------------------------
+def write_bundle(path, arrays, manifest):
+    """Write ``arrays`` (name -> ndarray) and ``manifest`` atomically to ``path``."""
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+    specs = {name: dict(dtype=a.dtype.newbyteorder("<").str, shape=list(a.shape), nbytes=a.nbytes,
+                        sha256=hashlib.sha256(a.astype(a.dtype.newbyteorder("<"), copy=False).tobytes()).hexdigest())
+             for name, a in arrays.items()}
+    # Offsets depend on the manifest length, which depends on the offsets;
+    # iterate until the layout is stable (normally twice).
+    data_start = 0
+    while True:
+        offset = data_start
+        for spec in specs.values():
+            offset = -(-offset // ALIGN) * ALIGN
+            spec["offset"] = offset
+            offset += spec["nbytes"]
+        body = json.dumps(dict(manifest, format=FORMAT_VERSION, arrays=specs), indent=1).encode()
+        start = -(-(HEADER.size + len(body)) // ALIGN) * ALIGN
+        if start == data_start:
+            break
+        data_start = start
+
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(body)))
+        f.write(body)
+        for name, a in arrays.items():
+            f.write(b"\0" * (specs[name]["offset"] - f.tell()))
+            f.write(a.astype(a.dtype.newbyteorder("<"), copy=False).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def _booster_sources(models_dir, xgb_pickle):
+    """(source paths, xgboost Boosters) from the per-pollutant JSON files or a pickle."""
+    import xgboost
+    if xgb_pickle:
+        from pickle import load as pkl_load
+        with open(xgb_pickle, "rb") as f:
+            mor = pkl_load(f)
+        return [xgb_pickle], [est.get_booster() for est in mor.estimators_]
+    paths = sorted(glob.glob(os.path.join(models_dir, "xgb_booster_*.json")),
+                   key=lambda p: int(p.rsplit("_", 1)[1].split(".")[0]))
+    if not paths:
+        raise FileNotFoundError(f"No xgb_booster_*.json in {models_dir}")
+    boosters = []
+    for p in paths:
+        booster = xgboost.Booster()
+        booster.load_model(p)
+        boosters.append(booster)
+    return paths, boosters
+
+
+def export(out=DEFAULT_BUNDLE, models_dir=MODELS_DIR, xgb_pickle=None, scaler_meteo=None,
+           pollutant_scaler=None, lstm=None, version=None):
+    """Build a bundle from the separate artifacts; returns its manifest."""
+    from joblib import load as joblib_load  # also reads plain pickles
+    from forest import FusedForest
+    from lstm_numpy import read_h5, read_npz
+
+    arrays, sources = {}, {}
+
+    booster_paths, boosters = _booster_sources(models_dir, xgb_pickle)
+    models = [json.loads(b.save_raw("json")) for b in boosters]
+    forest = FusedForest.from_models(models)
+    for name in FOREST_ARRAYS:
+        arrays[f"forest/{name}"] = getattr(forest, name)
+    for idx, booster in enumerate(boosters):
+        arrays[f"xgboost/booster_{idx}"] = np.frombuffer(booster.save_raw("ubj"), dtype=np.uint8)
+    sources["boosters"] = booster_paths
+
+    scaler_meta = {}
+    for name, path in (("scaler_meteo", scaler_meteo), ("pollutant_scaler", pollutant_scaler)):
+        path = path or os.path.join(models_dir, f"{name}.joblib")
+        scaler = joblib_load(path)
+        if getattr(scaler, "clip", False) or not hasattr(scaler, "min_"):
+            raise ValueError(f"{path}: only MinMaxScaler with clip=False is supported")
+        arrays[f"{name}/scale"] = scaler.scale_
+        arrays[f"{name}/min"] = scaler.min_
+        names = getattr(scaler, "feature_names_in_", None)
+        scaler_meta[name] = dict(feature_names=[str(n) for n in names] if names is not None else None,
+                                 data_min=scaler.data_min_.tolist(), data_max=scaler.data_max_.tolist())
+        sources[name] = [path]
+
+    lstm = lstm or os.path.join(models_dir, "lstm_multi_pollutants_model.npz")
+    layers, lstm_arrays = read_h5(lstm) if lstm.endswith(".h5") else read_npz(lstm)
+    for name, a in lstm_arrays.items():
+        arrays[f"lstm/{name}"] = np.asarray(a, dtype=np.float32)
+    sources["lstm"] = [lstm]
+
+    digest = hashlib.sha256()
+    for name, a in arrays.items():
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(a).tobytes())
+    manifest = dict(
+        version=version or digest.hexdigest()[:12],
+        sources={kind: [dict(path=os.path.relpath(p, models_dir), sha256=_sha256_file(p)) for p in paths]
+                 for kind, paths in sources.items()},
+        forest=dict(n_features=forest.n_features, n_trees=forest.n_trees, depth=forest.depth,
+                    n_outputs=forest.n_outputs),
+        scalers=scaler_meta,
+        lstm=dict(layers=layers),
+    )
+    write_bundle(out, arrays, manifest)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and check the serving model bundle")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ex = sub.add_parser("export", help="bundle the separate model artifacts")
+    ex.add_argument("--models-dir", default=MODELS_DIR)
+    ex.add_argument("--out", default=DEFAULT_BUNDLE)
+    ex.add_argument("--xgb-pickle", help="pickled MultiOutputRegressor to take the boosters from")
+    ex.add_argument("--scaler-meteo", help="default: <models-dir>/scaler_meteo.joblib")
+    ex.add_argument("--pollutant-scaler", help="default: <models-dir>/pollutant_scaler.joblib")
+    ex.add_argument("--lstm", help=".npz or Keras .h5; default: <models-dir>/lstm_multi_pollutants_model.npz")
+    ex.add_argument("--version", help="version label; default: content hash")
+    for name in ("verify", "info"):
+        p = sub.add_parser(name)
+        p.add_argument("path", nargs="?", default=DEFAULT_BUNDLE)
+        p.add_argument("--models-dir", default=MODELS_DIR, help="where the source artifacts are compared")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        manifest = export(args.out, args.models_dir, args.xgb_pickle, args.scaler_meteo,
+                          args.pollutant_scaler, args.lstm, args.version)
+        print(f"Wrote {args.out} version {manifest['version']} ({os.path.getsize(args.out) / 1e6:.1f} MB)")
+        return 0
+    try:
+        bundle = ModelBundle(args.path, verify=args.command == "verify")
+    except BundleError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.command == "verify":
+        stale = bundle.stale_sources(args.models_dir)
+        if stale:
+            print(f"{args.path}: built from other artifacts than {', '.join(stale)}; re-export it", file=sys.stderr)
+            return 1
+        print(f"{args.path}: version {bundle.version}, {len(bundle.manifest['arrays'])} arrays OK")
+    else:
+        m = dict(bundle.manifest)
+        m["arrays"] = {name: f"{s['dtype']} {tuple(s['shape'])}" for name, s in m["arrays"].items()}
+        print(json.dumps(m, indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
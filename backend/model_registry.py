@@ -0,0 +1,202 @@
+"""Background, concurrent loading of the serving model artifacts.
+
+Each artifact is registered with a zero-argument loader. Loaders run on a
+thread pool as soon as ``start()`` is called, so routes that never touch a
+model can serve while the ensemble is still loading; ``get()`` blocks until a
+given artifact is ready (or the caller's timeout runs out).
+
+``reload()`` loads a complete new set beside the one being served and swaps
+it in only once every artifact has loaded, so a hot reload never blocks
+``get()``; a failed reload leaves the current set in place.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait as wait_futures
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+
+class ModelNotReady(RuntimeError):
+    """Raised when an artifact is still loading or failed to load."""
+
+
+class ModelRegistry:
+    def __init__(self, loaders, max_workers=None, watch_paths=(), watch_interval=5.0):
+        self._loaders = dict(loaders)
+        self._max_workers = max_workers or len(self._loaders) or 1
+        self._lock = threading.Lock()
+        self._executor = None
+        self._futures = {}
+        self._state = self._new_state()
+        self._reloading = None  # per-artifact state of a reload being staged
+        self._reload_id = 0
+        self.reload_error = None
+        self.started_at = None
+        self.ready_at = None
+        # Bumped on every reload so caches of model outputs know to drop entries.
+        self.generation = 0
+        self._watch_paths = list(watch_paths)
+        self._watch_interval = watch_interval
+        self._fingerprint = None
+        self._checked_at = 0.0
+
+    def start(self):
+        """Submit every loader to the pool; safe to call more than once."""
+        with self._lock:
+            if self._executor is None:
+                self._fingerprint = self._artifact_fingerprint()
+                self._checked_at = time.monotonic()
+                self._submit_all()
+        return self
+
+    def reload(self):
+        """Re-run every loader in the background; get() keeps returning the
+        current artifacts until all new ones have loaded, then the new set and
+        generation are swapped in together."""
+        with self._lock:
+            self._fingerprint = self._artifact_fingerprint()
+            self._reload_id += 1
+            if not self._serving():
+                # Nothing complete to keep serving: load in place.
+                self.generation += 1
+                self._reloading = None
+                self._submit_all()
+                logging.info("Reloading model artifacts in place (generation %d)", self.generation)
+                return self
+            reload_id, state = self._reload_id, self._new_state()
+            self._reloading = state
+            futures = self._submit(state)
+        logging.info("Reloading model artifacts (serving generation %d meanwhile)", self.generation)
+        threading.Thread(target=self._swap_when_loaded, args=(reload_id, futures, state, time.monotonic()),
+                         name="model-reload", daemon=True).start()
+        return self
+
+    def _new_state(self):
+        return {name: {"state": PENDING, "load_seconds": None, "error": None} for name in self._loaders}
+
+    def _serving(self):
+        # Caller holds the lock.
+        return bool(self._futures) and all(f.done() and f.exception() is None for f in self._futures.values())
+
+    def _submit(self, state):
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="model-loader")
+        futures = {name: self._executor.submit(self._load, name, loader, state)
+                   for name, loader in self._loaders.items()}
+        self._executor.shutdown(wait=False)
+        return futures
+
+    def _submit_all(self):
+        self.started_at = time.monotonic()
+        self.ready_at = None
+        self._state = self._new_state()
+        self._futures = self._submit(self._state)
+
+    def _swap_when_loaded(self, reload_id, futures, state, started):
+        wait_futures(futures.values())
+        failed = {name: str(f.exception()) for name, f in futures.items() if f.exception() is not None}
+        with self._lock:
+            if reload_id != self._reload_id:
+                return  # superseded by a newer reload
+            self._reloading = None
+            if failed:
+                self.reload_error = failed
+                logging.error("Model reload failed, still serving generation %d: %s", self.generation, failed)
+                return
+            self._futures, self._state = futures, state
+            self.generation += 1
+            self.started_at, self.ready_at = started, time.monotonic()
+            self.reload_error = None
+        logging.info("Swapped in reloaded model artifacts (generation %d)", self.generation)
+
+    def _artifact_fingerprint(self):
+        fingerprint = []
+        for path in self._watch_paths:
+            try:
+                st = os.stat(path)
+                fingerprint.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                fingerprint.append((path, None, None))
+        return tuple(fingerprint)
+
+    def reload_if_changed(self):
+        """Reload when a watched artifact file changed on disk (checked at most
+        every ``watch_interval`` seconds). Returns the current generation."""
+        if not self._watch_paths:
+            return self.generation
+        now = time.monotonic()
+        with self._lock:
+            if self._executor is None or now - self._checked_at < self._watch_interval:
+                return self.generation
+            self._checked_at = now
+            fingerprint = self._artifact_fingerprint()
+            changed = fingerprint != self._fingerprint
+            self._fingerprint = fingerprint
+        if changed:
+            self.reload()
+        return self.generation
+
+    def _load(self, name, loader, states):
+        self._set(states, name, state=LOADING)
+        t0 = time.perf_counter()
+        try:
+            artifact = loader()
+        except Exception as e:
+            self._set(states, name, state=FAILED, load_seconds=time.perf_counter() - t0, error=str(e))
+            logging.exception("Failed to load model artifact %s", name)
+            raise
+        self._set(states, name, state=READY, load_seconds=time.perf_counter() - t0)
+        logging.info("Loaded model artifact %s in %.3fs", name, states[name]["load_seconds"])
+        with self._lock:
+            if (states is self._state and self.ready_at is None
+                    and all(s["state"] == READY for s in states.values())):
+                self.ready_at = time.monotonic()
+        return artifact
+
+    def _set(self, states, name, **fields):
+        with self._lock:
+            states[name].update(fields)
+
+    def get(self, name, timeout=None):
+        """Return a loaded artifact, starting the loaders if nobody has yet."""
+        self.start()
+        with self._lock:
+            future = self._futures[name]
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            raise ModelNotReady(f"Model artifact {name!r} is still loading")
+        except Exception as e:
+            raise ModelNotReady(f"Model artifact {name!r} failed to load: {e}") from e
+
+    def wait(self, timeout=None):
+        """Block until every artifact is ready; returns False on timeout or failure."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for name in self._loaders:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                self.get(name, timeout=remaining)
+            except ModelNotReady:
+                return False
+        return True
+
+    @property
+    def ready(self):
+        with self._lock:
+            return all(s["state"] == READY for s in self._state.values())
+
+    def status(self):
+        with self._lock:
+            artifacts = {name: dict(s) for name, s in self._state.items()}
+            ready_after = (self.ready_at - self.started_at) if self.ready_at is not None else None
+            reloading = {name: dict(s) for name, s in self._reloading.items()} if self._reloading else None
+            reload_error = self.reload_error
+        return {
+            "ready": all(a["state"] == READY for a in artifacts.values()),
+            "generation": self.generation,
+            "ready_after_seconds": ready_after,
+            "artifacts": artifacts,
+            "reloading": reloading,
+            "reload_error": reload_error,
+        }
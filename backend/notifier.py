@@ -0,0 +1,345 @@
+"""Background email dispatch for subscriber alerts.
+
+/notify only enqueues: each recipient gets a ``queued`` row in the
+``notifications`` table and a job on an in-process queue. Worker threads drain
+the queue in batches over long-lived SMTP sessions (one STARTTLS/login per
+session rather than per message), retry transient failures with exponential
+backoff, and write sent/failed statuses back in bulk.
+
+The in-process queue dies with its process, so ``recover()`` re-enqueues rows
+still ``queued`` and untouched for a grace period. Each row is claimed with a
+conditional UPDATE first, so two processes never both pick it up. The grace
+period has to outlast a live worker's backlog plus retries; otherwise a slow
+message can be sent twice.
+"""
+import os
+import time
+import heapq
+import queue
+import logging
+import smtplib
+import threading
+from email.mime.text import MIMEText
+from email.utils import make_msgid
+from datetime import datetime, timezone
+
+from metrics import outbound
+
+# Subject of recovered rows queued before the subject column existed.
+DEFAULT_SUBJECT = "Breathe-Easy AQI alert"
+
+
+class SMTPSettings:
+    def __init__(self, host=None, port=None, user=None, password=None, starttls=None, timeout=None):
+        self.host = host or os.getenv("SMTP_HOST")
+        self.port = int(port or os.getenv("SMTP_PORT", 587))
+        self.user = user if user is not None else os.getenv("SMTP_USER")
+        self.password = password if password is not None else os.getenv("SMTP_PASS")
+        self.starttls = starttls if starttls is not None else os.getenv("SMTP_STARTTLS", "1") == "1"
+        self.timeout = float(timeout or os.getenv("SMTP_TIMEOUT", 30))
+        self.sender = os.getenv("SMTP_FROM") or self.user
+
+
+class SMTPSession:
+    """One SMTP connection reused across messages, reopened when it drops,
+    goes idle too long or has carried ``max_messages``."""
+
+    def __init__(self, settings, max_messages=100, idle_timeout=60.0):
+        self.settings = settings
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self._smtp = None
+        self._sent = 0
+        self._last_used = 0.0
+        self.connects = 0
+
+    def _open(self):
+        s = self.settings
+        with outbound("smtp_connect"):
+            smtp = smtplib.SMTP(s.host, s.port, timeout=s.timeout)
+            if s.starttls:
+                smtp.starttls()
+            if s.user and s.password:
+                smtp.login(s.user, s.password)
+        self._smtp, self._sent = smtp, 0
+        self.connects += 1
+
+    def close(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except Exception:
+                pass
+
+    def send(self, msg):
+        expired = time.monotonic() - self._last_used > self.idle_timeout
+        if self._smtp is not None and (expired or self._sent >= self.max_messages):
+            self.close()
+        if self._smtp is None:
+            self._open()
+        try:
+            with outbound("smtp"):
+                self._smtp.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPSenderRefused, OSError):
+            # The server may have dropped an idle session; retry once on a fresh one.
+            self.close()
+            self._open()
+            with outbound("smtp"):
+                self._smtp.send_message(msg)
+        self._sent += 1
+        self._last_used = time.monotonic()
+
+
+class NotificationStore:
+    """Delivery status in the ``notifications`` table, written in bulk.
+
+    Jobs are matched to rows by the Message-ID kept in ``provider_id``.
+    """
+
+    def __init__(self, get_connection):
+        self.get_connection = get_connection
+
+    def insert_queued(self, jobs):
+        with self.get_connection() as conn, conn.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO notifications (subscription_id,channel,recipient,subject,payload,provider_id,status) "
+                "VALUES(%s,'email',%s,%s,%s,%s,'queued')",
+                [(j["subscription_id"], j["to"], j["subject"], j["body"], j["message_id"]) for j in jobs]
+            )
+            conn.commit()
+
+    def claim_stale(self, grace, limit=1000):
+        """Claim up to ``limit`` email rows left ``queued`` for over ``grace``
+        seconds; returns them as jobs.
+
+        Claiming touches ``updated_at`` (and fills a missing Message-ID) only
+        if the row is unchanged, so a row goes to exactly one caller and is
+        not claimed again for another ``grace`` seconds.
+        """
+        jobs = []
+        with self.get_connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, subscription_id, recipient, subject, payload, provider_id, updated_at "
+                "FROM notifications WHERE status='queued' AND channel='email' "
+                "AND updated_at < NOW() - INTERVAL %s SECOND ORDER BY id LIMIT %s",
+                (int(grace), int(limit))
+            )
+            for row in cursor.fetchall():
+                message_id = row["provider_id"] or make_msgid(domain="breathe-easy")
+                cursor.execute(
+                    "UPDATE notifications SET updated_at=CURRENT_TIMESTAMP, provider_id=%s "
+                    "WHERE id=%s AND status='queued' AND updated_at=%s",
+                    (message_id, row["id"], row["updated_at"])
+                )
+                if cursor.rowcount == 1:
+                    jobs.append(dict(subscription_id=row["subscription_id"], to=row["recipient"],
+                                     subject=row["subject"] or DEFAULT_SUBJECT, body=row["payload"],
+                                     message_id=message_id, attempts=0))
+            conn.commit()
+        return jobs
+
+    def update_status(self, results):
+        with self.get_connection() as conn, conn.cursor() as cursor:
+            cursor.executemany(
+                "UPDATE notifications SET status=%s, error_message=%s WHERE provider_id=%s",
+                [(status, error, message_id) for message_id, status, error in results]
+            )
+            conn.commit()
+
+
+class NotificationDispatcher:
+    def __init__(self, store, smtp_settings=None, workers=2, batch_size=50, max_retries=3,
+                 backoff_base=2.0, backoff_max=300.0, session_max_messages=100, session_idle_timeout=60.0):
+        self.store = store
+        self.smtp_settings = smtp_settings or SMTPSettings()
+        self.n_workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session_max_messages = session_max_messages
+        self.session_idle_timeout = session_idle_timeout
+        self._queue = queue.Queue()
+        self._retry_heap = []
+        self._retry_cond = threading.Condition()
+        self._threads = []
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = dict(enqueued=0, sent=0, failed=0, retried=0, smtp_connects=0, recovered=0)
+        self._recovery_thread = None
+        self.last_recovery = None
+
+    # -- producer side ---------------------------------------------------------
+    def enqueue(self, subject, body, recipients):
+        """Queue one message per (subscription_id, email); returns the job count."""
+        jobs = [
+            dict(subscription_id=sub_id, to=email, subject=subject, body=body,
+                 message_id=make_msgid(domain="breathe-easy"), attempts=0)
+            for sub_id, email in recipients
+        ]
+        if not jobs:
+            return 0
+        if self.store is not None:
+            self.store.insert_queued(jobs)
+        self.start()
+        for job in jobs:
+            self._queue.put(job)
+        self._count(enqueued=len(jobs))
+        return len(jobs)
+
+    def recover(self, grace=600.0):
+        """Re-enqueue rows left ``queued`` by a process that stopped before
+        sending them; returns how many were claimed."""
+        if self.store is None:
+            return 0
+        jobs = self.store.claim_stale(grace)
+        if jobs:
+            logging.warning("Recovered %d queued notifications left by an earlier process", len(jobs))
+            self.start()
+            for job in jobs:
+                self._queue.put(job)
+        self._count(recovered=len(jobs))
+        self.last_recovery = datetime.now(timezone.utc).isoformat()
+        return len(jobs)
+
+    def start_recovery(self, grace=600.0, interval=300.0):
+        """Run recover() now and then every ``interval`` seconds until stop()."""
+        if self._recovery_thread is not None and self._recovery_thread.is_alive():
+            return self
+
+        def loop():
+            while True:
+                try:
+                    self.recover(grace)
+                except Exception:
+                    logging.exception("Notification recovery failed")
+                if self._stopping.wait(interval):
+                    return
+
+        self._stopping.clear()
+        self._recovery_thread = threading.Thread(target=loop, name="notify-recovery", daemon=True)
+        self._recovery_thread.start()
+        return self
+
+    # -- lifecycle -------------------------------------------------------------
+    def start(self):
+        if self._threads:
+            return self
+        self._stopping.clear()
+        self._threads = [threading.Thread(target=self._worker, name=f"notify-{i}", daemon=True)
+                         for i in range(self.n_workers)]
+        self._threads.append(threading.Thread(target=self._retry_loop, name="notify-retry", daemon=True))
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Finish queued jobs, then stop the workers."""
+        self.join(timeout)
+        self._stopping.set()
+        with self._retry_cond:
+            self._retry_cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        if self._recovery_thread is not None:
+            self._recovery_thread.join(timeout)
+            self._recovery_thread = None
+
+    def join(self, timeout=None):
+        """Wait until every queued job (including pending retries) is settled."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks or self._retry_heap:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    # -- workers ---------------------------------------------------------------
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        session = SMTPSession(self.smtp_settings, self.session_max_messages, self.session_idle_timeout)
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            results = []
+            connects = session.connects
+            for job in batch:
+                try:
+                    session.send(self._message(job))
+                    results.append((job["message_id"], "sent", None))
+                except Exception as e:
+                    session.close()
+                    job["attempts"] += 1
+                    if job["attempts"] <= self.max_retries and not isinstance(e, smtplib.SMTPRecipientsRefused):
+                        self._schedule_retry(job)
+                    else:
+                        logging.warning("Giving up on notification to %s: %s", job["to"], e)
+                        results.append((job["message_id"], "failed", str(e)[:1000]))
+            self._record(results)
+            self._count(smtp_connects=session.connects - connects)
+            for _ in batch:
+                self._queue.task_done()
+        session.close()
+
+    def _message(self, job):
+        msg = MIMEText(job["body"])
+        msg["Subject"] = job["subject"]
+        msg["From"] = self.smtp_settings.sender
+        msg["To"] = job["to"]
+        msg["Message-ID"] = job["message_id"]
+        return msg
+
+    def _record(self, results):
+        sent = sum(1 for _, status, _ in results if status == "sent")
+        self._count(sent=sent, failed=len(results) - sent)
+        if results and self.store is not None:
+            try:
+                self.store.update_status(results)
+            except Exception:
+                logging.exception("Failed to record notification statuses")
+
+    # -- retries ---------------------------------------------------------------
+    def _schedule_retry(self, job):
+        delay = min(self.backoff_max, self.backoff_base ** job["attempts"])
+        with self._retry_cond:
+            heapq.heappush(self._retry_heap, (time.monotonic() + delay, id(job), job))
+            self._retry_cond.notify()
+        self._count(retried=1)
+
+    def _retry_loop(self):
+        with self._retry_cond:
+            while not self._stopping.is_set():
+                now = time.monotonic()
+                while self._retry_heap and self._retry_heap[0][0] <= now:
+                    # Queue before popping so join() never sees the job in neither place.
+                    self._queue.put(self._retry_heap[0][2])
+                    heapq.heappop(self._retry_heap)
+                timeout = self._retry_heap[0][0] - now if self._retry_heap else None
+                self._retry_cond.wait(timeout)
+
+    # -- stats -----------------------------------------------------------------
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(queued=self._queue.qsize(), retry_pending=len(self._retry_heap),
+                     last_recovery=self.last_recovery)
+        return stats
@@ -0,0 +1,152 @@
+"""Cached OpenWeather air-pollution client shared by /live-aqi and /forecast-aqi.
+
+Responses are cached per endpoint and rounded lat/lon. Within ``ttl`` an entry
+is served as is; for ``stale_ttl`` after that it is still served while one
+background refresh runs. Concurrent misses on the same key wait on a single
+upstream fetch instead of each calling OpenWeather. All calls go through one
+keep-alive ``requests.Session``.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import outbound
+
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org")
+
+# OpenWeather refreshes current air pollution data about hourly and the
+# forecast less often; these defaults keep us well inside that cadence.
+ENDPOINTS = {
+    "current": ("/data/2.5/air_pollution", float(os.getenv("OPENWEATHER_CURRENT_TTL", 600))),
+    "forecast": ("/data/2.5/air_pollution/forecast", float(os.getenv("OPENWEATHER_FORECAST_TTL", 1800))),
+}
+
+
+class OpenWeatherClient:
+    def __init__(self, api_key, base_url=OPENWEATHER_BASE_URL, endpoints=ENDPOINTS, precision=2,
+                 stale_ttl=3600.0, timeout=5.0, pool_size=8, maxsize=1024):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.endpoints = dict(endpoints)
+        self.precision = precision
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._entries = {}    # key -> (payload, fetched_at)
+        self._inflight = {}   # key -> Future of the running upstream fetch
+        self._geocoded = {}   # city -> (lat, lon)
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="openweather-refresh")
+        self._stats = dict(hits=0, stale_hits=0, misses=0, coalesced=0,
+                           upstream_calls=0, upstream_errors=0, background_refreshes=0,
+                           forced_refreshes=0)
+
+    def current(self, lat, lon):
+        return self.get("current", lat, lon)
+
+    def forecast(self, lat, lon):
+        return self.get("forecast", lat, lon)
+
+    def key(self, kind, lat, lon):
+        return (kind, round(float(lat), self.precision), round(float(lon), self.precision))
+
+    def get(self, kind, lat, lon):
+        key = self.key(kind, lat, lon)
+        ttl = self.endpoints[kind][1]
+        with self._lock:
+            entry = self._entries.get(key)
+            age = time.monotonic() - entry[1] if entry else None
+            if entry and age < ttl:
+                self._stats["hits"] += 1
+                return entry[0]
+            if entry and age < ttl + self.stale_ttl:
+                self._stats["stale_hits"] += 1
+                if key not in self._inflight:
+                    self._inflight[key] = Future()
+                    self._stats["background_refreshes"] += 1
+                    self._refresher.submit(self._fetch, key)
+                return entry[0]
+        return self._join_or_fetch(key)
+
+    def refresh(self, kind, lat, lon):
+        """Fetch from upstream regardless of cache age (joining a fetch already in flight)."""
+        return self._join_or_fetch(self.key(kind, lat, lon), counter="forced_refreshes")
+
+    def _join_or_fetch(self, key, counter="misses"):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                future = self._inflight[key] = Future()
+                self._stats[counter] += 1
+                leader = True
+        if leader:
+            self._fetch(key)
+        return future.result()
+
+    def geocode(self, city):
+        """(lat, lon) of a city name via the geocoding API; results are kept for good."""
+        with self._lock:
+            if city in self._geocoded:
+                return self._geocoded[city]
+            self._stats["upstream_calls"] += 1
+        with outbound("openweather"):
+            resp = self.session.get(self.base_url + "/geo/1.0/direct",
+                                    params={"q": city, "limit": 1, "appid": self.api_key},
+                                    timeout=self.timeout)
+            resp.raise_for_status()
+        found = resp.json()
+        if not found:
+            raise LookupError(f"OpenWeather has no coordinates for {city!r}")
+        coords = (found[0]["lat"], found[0]["lon"])
+        with self._lock:
+            self._geocoded[city] = coords
+        return coords
+
+    def _fetch(self, key):
+        """Run the upstream call for ``key`` and settle its in-flight future."""
+        kind, lat, lon = key
+        with self._lock:
+            future = self._inflight[key]
+            self._stats["upstream_calls"] += 1
+        try:
+            with outbound("openweather"):
+                resp = self.session.get(
+                    self.base_url + self.endpoints[kind][0],
+                    params={"lat": lat, "lon": lon, "appid": self.api_key},
+                    timeout=self.timeout,
+                )
+                resp.raise_for_status()
+                payload = resp.json()
+        except Exception as e:
+            with self._lock:
+                self._stats["upstream_errors"] += 1
+                del self._inflight[key]
+            logging.warning("OpenWeather %s fetch failed for %s,%s: %s", kind, lat, lon, e)
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._entries[key] = (payload, time.monotonic())
+            if len(self._entries) > self.maxsize:
+                oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                del self._entries[oldest]
+            del self._inflight[key]
+        future.set_result(payload)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), inflight=len(self._inflight))
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = (stats["hits"] + stats["stale_hits"]) / lookups if lookups else None
+        return stats
@@ -0,0 +1,284 @@
+"""Background AQI poller that fills history_aqi on a fixed cadence.
+
+Each cycle polls current air quality for every distinct subscriber city, the
+configured stations and the ``stations`` table through a bounded thread pool,
+keeps the results as the latest in-memory snapshot and writes them to
+history_aqi and the hourly aqi_readings table with one executemany each. Rollups are compacted every
+``compact_every`` cycles. Request handlers read the snapshot instead of calling
+upstream or writing, as long as it is younger than ``max_age`` (two intervals
+by default); an older one means cycles are failing or stuck, so the reading is
+fetched on demand instead. ``on_cycle`` is called with each cycle's readings,
+e.g. to push them to open streams.
+
+Under gunicorn only one worker runs the cycles. The others have no fresh
+snapshot of their own, so they always read through the client's cache, and
+they record new locations in the ``stations`` table, where the polling worker
+picks them up.
+"""
+import time
+import logging
+import threading
+from datetime import date, datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import timeseries
+
+
+def parse_stations(spec):
+    """Parse "Delhi:28.61:77.21,Mumbai:19.08:72.88" into {city: (lat, lon)}."""
+    stations = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        try:
+            city, lat, lon = item.rsplit(":", 2)
+            stations[city.strip()] = (float(lat), float(lon))
+        except ValueError:
+            raise ValueError(f"Bad station {item!r}; expected City:lat:lon")
+    return stations
+
+
+class AQIPoller:
+    def __init__(self, client, get_connection, stations=None, interval=600.0, workers=8, today=date.today,
+                 compact_every=6, on_cycle=None, max_age=None, clock=time.time):
+        self.client = client
+        self.get_connection = get_connection
+        self.stations = dict(stations or {})
+        self.interval = interval
+        self.max_age = max_age or 2 * interval
+        self._clock = clock
+        self.workers = workers
+        self._today = today
+        self.compact_every = compact_every
+        self.on_cycle = on_cycle
+        self._lock = threading.Lock()
+        self._snapshot = {}  # city -> latest reading
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = dict(cycles=0, rows_written=0, readings_written=0, fetch_errors=0, write_errors=0,
+                           last_cycle_seconds=None, last_rows_written=None, last_cycle_at=None,
+                           last_compaction=None, on_demand_fetches=0, stale_served=0)
+
+    # -- stations --------------------------------------------------------------
+    def track(self, city, lat, lon):
+        """Add a location to every following cycle, in whichever process polls."""
+        with self._lock:
+            if city in self.stations:
+                return
+            self.stations[city] = (lat, lon)
+        try:
+            with self.get_connection() as conn, conn.cursor() as cursor:
+                cursor.execute("INSERT IGNORE INTO stations (city,lat,lon) VALUES(%s,%s,%s)", (city, lat, lon))
+                conn.commit()
+        except Exception:
+            logging.exception("Could not record station %s", city)
+
+    def subscriber_cities(self):
+        with self.get_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT DISTINCT city FROM subscriptions WHERE city IS NOT NULL AND city<>''")
+            return [row["city"] for row in cursor.fetchall()]
+
+    def tracked_stations(self, city=None):
+        """{city: (lat, lon)} from the ``stations`` table, or just ``city``'s row."""
+        sql, params = "SELECT city, lat, lon FROM stations", ()
+        if city is not None:
+            sql, params = sql + " WHERE city=%s", (city,)
+        with self.get_connection() as conn, conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return {row["city"]: (float(row["lat"]), float(row["lon"])) for row in cursor.fetchall()}
+
+    def _targets(self):
+        """{city: (lat, lon) or None}; None means geocode it inside the fetch pool."""
+        try:
+            tracked = self.tracked_stations()
+        except Exception:
+            logging.exception("Poller could not list tracked stations")
+            tracked = {}
+        with self._lock:
+            for city, coords in tracked.items():
+                self.stations.setdefault(city, coords)
+            targets = dict(self.stations)
+        try:
+            cities = self.subscriber_cities()
+        except Exception:
+            logging.exception("Poller could not list subscriber cities")
+            cities = []
+        for city in cities:
+            targets.setdefault(city, None)
+        return targets
+
+    # -- one cycle -------------------------------------------------------------
+    def _poll_city(self, city, lat=None, lon=None, cached=False):
+        if lat is None or lon is None:
+            # Geocoding results are cached by the client, so this is a one-off per city.
+            lat, lon = self.client.geocode(city)
+        # Cycles always go upstream; on-demand reads share the client's per-location cache.
+        response = self.client.current(lat, lon) if cached else self.client.refresh("current", lat, lon)
+        data = response["list"][0]
+        return dict(city=city, lat=lat, lon=lon, AQI=data["main"]["aqi"],
+                    components=data["components"], dt=data.get("dt"), fetched_at=self._clock())
+
+    def poll_once(self):
+        """Run one cycle; returns the number of history rows written."""
+        t0 = time.perf_counter()
+        targets = self._targets()
+        readings, errors = [], 0
+        if targets:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(targets))) as pool:
+                futures = {city: pool.submit(self._poll_city, city, *(coords or ())) for city, coords in targets.items()}
+            for city, future in futures.items():
+                try:
+                    readings.append(future.result())
+                except Exception as e:
+                    errors += 1
+                    logging.warning("Poller fetch failed for %s: %s", city, e)
+        with self._lock:
+            for reading in readings:
+                self._snapshot[reading["city"]] = reading
+        if self.on_cycle is not None and readings:
+            try:
+                self.on_cycle(readings)
+            except Exception:
+                logging.exception("Poller on_cycle callback failed")
+
+        written, recorded, write_failed = 0, 0, False
+        if readings:
+            today = self._today().isoformat()
+            rows = [(today, r["city"], r["AQI"], r["components"].get("pm2_5"),
+                     r["components"].get("pm10"), r["components"].get("no2")) for r in readings]
+            try:
+                with self.get_connection() as conn, conn.cursor() as cursor:
+                    cursor.executemany(
+                        "INSERT IGNORE INTO history_aqi (date,city,AQI,`PM2.5`,PM10,NO2) VALUES(%s,%s,%s,%s,%s,%s)",
+                        rows
+                    )
+                    written = max(cursor.rowcount, 0)
+                    recorded = timeseries.insert_readings(conn, [
+                        dict(timeseries.from_openweather(r["components"]), station=r["city"],
+                             ts=datetime.fromtimestamp(r["dt"] or r["fetched_at"], tz=timezone.utc))
+                        for r in readings
+                    ])
+                    conn.commit()
+            except Exception:
+                write_failed = True
+                logging.exception("Poller history write failed")
+
+        elapsed = time.perf_counter() - t0
+        with self._lock:
+            s = self._stats
+            s["cycles"] += 1
+            s["rows_written"] += written
+            s["readings_written"] += recorded
+            s["fetch_errors"] += errors
+            s["write_errors"] += int(write_failed)
+            s["last_cycle_seconds"] = elapsed
+            s["last_rows_written"] = written
+            s["last_cycle_at"] = self._clock()
+            compact_due = self.compact_every and s["cycles"] % self.compact_every == 0
+        logging.info("Poll cycle: %d locations, %d fetch errors, %d rows written in %.2fs",
+                     len(targets), errors, written, elapsed)
+        if compact_due and recorded:
+            self.compact()
+        return written
+
+    def compact(self):
+        try:
+            with self.get_connection() as conn:
+                result = timeseries.compact(conn)
+        except Exception:
+            logging.exception("Rollup compaction failed")
+            return None
+        with self._lock:
+            self._stats["last_compaction"] = result
+        return result
+
+    # -- lifecycle -------------------------------------------------------------
+    def _run(self):
+        while not self._stop.is_set():
+            t0 = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception:
+                logging.exception("Poll cycle failed")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - t0)))
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="aqi-poller", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self):
+        """Whether this process runs the poll cycles."""
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    # -- reads -----------------------------------------------------------------
+    def knows(self, city):
+        """Whether ``city`` is polled (configured, tracked here or by another
+        process, or seen in a cycle)."""
+        with self._lock:
+            if city in self.stations or city in self._snapshot:
+                return True
+        try:
+            tracked = self.tracked_stations(city)
+        except Exception:
+            logging.exception("Could not look up station %s", city)
+            return False
+        with self._lock:
+            self.stations.update(tracked)
+        return city in tracked
+
+    def latest(self, city):
+        with self._lock:
+            return self._snapshot.get(city)
+
+    def is_fresh(self, reading):
+        return self._clock() - reading["fetched_at"] <= self.max_age
+
+    def latest_or_fetch(self, city, lat, lon):
+        """Snapshot for ``city`` while it is younger than ``max_age`` and this
+        process runs the cycles that refresh it.
+
+        A location seen for the first time is tracked from now on. It, an
+        aged-out snapshot and any read in a process that does not poll are
+        fetched now through the client's cache (no history write). If that
+        fetch fails, the old snapshot is returned with ``stale=True``.
+        """
+        reading = self.latest(city)
+        if reading is None:
+            self.track(city, lat, lon)
+        elif self.running and self.is_fresh(reading):
+            return reading
+        try:
+            fresh = self._poll_city(city, lat, lon, cached=True)
+        except Exception as e:
+            if reading is None:
+                raise
+            logging.warning("Live fetch for %s failed, serving a %.0fs old snapshot: %s",
+                            city, self._clock() - reading["fetched_at"], e)
+            with self._lock:
+                self._stats["stale_served"] += 1
+            return dict(reading, stale=True)
+        with self._lock:
+            self._stats["on_demand_fetches"] += 1
+            current = self._snapshot.get(city)
+            if current is None or current["fetched_at"] < fresh["fetched_at"]:
+                self._snapshot[city] = fresh
+        return fresh
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(stations=len(self.stations), snapshot_size=len(self._snapshot),
+                         interval_seconds=self.interval, max_age_seconds=self.max_age,
+                         running=self.running)
+        return stats
@@ -0,0 +1,140 @@
+"""Bounded LRU cache for /predict results keyed on meteorological inputs.
+
+By default (``resolution=0``) a row's exact values are its key and the cache is
+transparent: only a repeat of the same inputs is served from it, and every
+prediction equals the uncached one.
+
+A positive resolution trades accuracy for hit rate. Inputs are snapped to a
+per-feature step, and the snapped values are both the cache key and what the
+ensemble runs on, so a cached response is the same object a fresh computation
+would produce. Every /predict result then changes, cache hit or not: the model
+sees the snapped row, and its output can move by more than the step suggests
+(a 0.004 shift on all four features moved PM2.5 from 1.15 to 3.14). Measure
+with your own inputs before enabling it.
+
+Entries are tagged with the model generation they were computed under and
+dropped when the models are reloaded. Rows with non-finite or out-of-range
+values have no key: they bypass the cache and reach the model unsnapped.
+"""
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Largest |value / resolution| that still gets a key; beyond it the int64
+# conversion would wrap or saturate and distinct inputs would share one.
+MAX_KEY_STEPS = 2 ** 62
+
+
+def parse_resolution(value, n_features):
+    """Parse "0.1" or "1,0.1,0.1,1" into one positive step per feature; "0"
+    (exact keys, no snapping) gives None."""
+    steps = [float(v) for v in str(value).split(",") if v.strip()]
+    if len(steps) == 1:
+        steps = steps * n_features
+    if steps == [0.0] * n_features:
+        return None
+    if len(steps) != n_features or any(not s > 0 for s in steps):
+        raise ValueError(f"Expected 0, or 1 or {n_features} positive resolutions, got {value!r}")
+    return np.asarray(steps, dtype=float)
+
+
+class PredictionCache:
+    def __init__(self, maxsize=4096, ttl=None, resolution=0, n_features=4):
+        self.maxsize = maxsize
+        self.ttl = ttl or None
+        self.resolution = parse_resolution(resolution, n_features)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = None
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+        self.bypassed = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def quantize(self, arr):
+        """Snap an (N, F) array to the resolution; returns (snapped values, row keys).
+
+        Without a resolution the values are returned as given and keyed exactly.
+        Rows with a NaN, an infinity or a value too large to key are returned
+        as given with a None key, so they are never looked up or stored.
+        """
+        arr = np.asarray(arr, dtype=float)
+        if self.resolution is None:
+            keyable = np.isfinite(arr).all(axis=1).tolist()
+            return arr, [tuple(row) if ok else None for row, ok in zip(arr.tolist(), keyable)]
+        with np.errstate(invalid="ignore", over="ignore"):
+            steps = np.round(arr / self.resolution)
+            keyable = (np.isfinite(steps) & (np.abs(steps) < MAX_KEY_STEPS)).all(axis=1)
+        if keyable.all():
+            return steps * self.resolution, [tuple(row) for row in steps.astype(np.int64).tolist()]
+        snapped = np.where(keyable[:, None], steps * self.resolution, arr)
+        int_steps = np.where(keyable[:, None], steps, 0).astype(np.int64).tolist()
+        keys = [tuple(row) if ok else None for row, ok in zip(int_steps, keyable.tolist())]
+        return snapped, keys
+
+    def _is_current(self, generation):
+        # A newer model generation drops every entry; results computed under an
+        # older one (a reload raced the request) are neither served nor stored.
+        if self._generation is None or generation > self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._generation = generation
+        return generation == self._generation
+
+    def get(self, key, generation):
+        with self._lock:
+            if key is None:
+                self.bypassed += 1
+                return None
+            entry = self._entries.get(key) if self._is_current(generation) else None
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, generation, value):
+        if not self.enabled or key is None:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if not self._is_current(generation):
+                return
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "resolution": self.resolution.tolist() if self.resolution is not None else 0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "bypassed": self.bypassed,
+            }
@@ -3,14 +3,6 @@ import sys
 import io
 import contextlib
 import logging
-import warnings
-
-# -----------------------------------------------------------------------------
-# Suppress TensorFlow INFO logs and Keras metric warnings
-# -----------------------------------------------------------------------------
-os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
-logging.getLogger("tensorflow").setLevel(logging.ERROR)
-warnings.filterwarnings("ignore", message="Compiled the loaded model, but the compiled metrics have yet to be built")
 
 # -----------------------------------------------------------------------------
 # Prevent Flask development banner
@@ -27,34 +19,59 @@ load_dotenv()
 # -----------------------------------------------------------------------------
 # Standard imports
 # -----------------------------------------------------------------------------
+import time
 import random
 from datetime import datetime, timedelta, timezone, date
 
 import numpy as np
 import requests
-import pymysql
 import smtplib
 from email.mime.text import MIMEText
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 
-from tensorflow.keras.models import load_model
-from tensorflow.keras.losses import mse
-from joblib import load as joblib_load
-import xgboost as xgb
+from db import get_db_connection, pool as db_pool
+from model_registry import ModelRegistry, ModelNotReady
+from prediction_cache import PredictionCache
+from aqi import compute_real_aqi, compute_real_aqi_rows
+from history import DayCache, parse_history_query, fetch_history_page
+from notifier import NotificationDispatcher, NotificationStore
+from openweather import OpenWeatherClient
+from poller import AQIPoller, parse_stations
+from timeseries import parse_series_query, fetch_series
+from station_buffers import StationBuffers
+from stream import StreamServer
+from alerts import AlertEngine, parse_thresholds
+from batcher import MicroBatcher
+from admission import AdmissionController, Overloaded
+from inference_server import InferenceClient
+from metrics import (REGISTRY, REQUEST_SECONDS, REQUESTS, REQUEST_ERRORS, IN_FLIGHT, STAGE_SECONDS,
+                     CACHE_LOOKUPS, Profiler, outbound)
 
 # -----------------------------------------------------------------------------
 # Configure application & logging
 # -----------------------------------------------------------------------------
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify() with its encoding time recorded as the ``json_encode`` stage."""
+
+    def dumps(self, obj, **kwargs):
+        with STAGE_SECONDS.time("json_encode"):
+            return super().dumps(obj, **kwargs)
+
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 CORS(app)
 
+# Truncated on start; processes that import this module alongside a running
+# API (e.g. inference_server.py) point APP_LOG at their own file.
+APP_LOG = os.getenv("APP_LOG", "app.log")
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
     handlers=[
-        logging.FileHandler("app.log", mode="w", encoding="utf-8"),
+        logging.FileHandler(APP_LOG, mode="w", encoding="utf-8"),
         logging.StreamHandler(sys.stdout)
     ]
 )
@@ -65,12 +82,61 @@ logging.basicConfig(
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 API_KEY = os.getenv("OPENWEATHER_API_KEY")
+IPINFO_URL = os.getenv("IPINFO_URL", "https://ipinfo.io/json")
+# Unix socket of inference_server.py; when set, /predict runs the ensemble there
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET")
+# Shared, cached OpenWeather client (per rounded lat/lon, with request coalescing)
+openweather = OpenWeatherClient(
+    API_KEY,
+    precision=int(os.getenv("OPENWEATHER_COORD_PRECISION", 2)),
+    stale_ttl=float(os.getenv("OPENWEATHER_STALE_TTL", 3600)),
+)
+# Server-sent live AQI/forecast updates per city on STREAM_PORT (GET /stream?city=...)
+stream_server = StreamServer(
+    host=os.getenv("STREAM_HOST", "127.0.0.1"),
+    port=int(os.getenv("STREAM_PORT", 5001)),
+    heartbeat=float(os.getenv("STREAM_HEARTBEAT", 15)),
+    max_connections=int(os.getenv("STREAM_MAX_CONNECTIONS", 10000)),
+    accept=lambda city: aqi_poller.knows(city),
+)
 
-DB_HOST = os.getenv("DB_HOST", "127.0.0.1")
-DB_PORT = int(os.getenv("DB_PORT", 3306))
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASS = os.getenv("DB_PASSWORD")
+def live_payload(reading, city, lat, lon):
+    payload = dict(AQI=reading["AQI"], pollutants=reading["components"], city=city, lat=lat, lon=lon,
+                   observed_at=datetime.fromtimestamp(reading["fetched_at"], tz=timezone.utc).isoformat())
+    if reading.get("stale"):
+        payload["stale"] = True  # upstream failed; this is the last reading we have
+    return payload
+
+def forecast_payload(items, city):
+    return [{"time": datetime.fromtimestamp(item["dt"], tz=timezone.utc).strftime("%I %p"), "aqi": item["main"]["aqi"],
+             "components": item["components"], "city": city} for item in items]
+
+def publish_stream_updates(readings):
+    """Push a poll cycle's readings (and the cached forecast) to cities with open streams."""
+    listened = stream_server.cities()
+    for reading in readings:
+        city = reading["city"]
+        if city not in listened:
+            continue
+        stream_server.publish(city, "live", live_payload(reading, city, reading["lat"], reading["lon"]))
+        try:
+            items = openweather.forecast(reading["lat"], reading["lon"]).get("list", [])
+        except Exception:
+            logging.warning("Stream forecast update failed for %s", city)
+            continue
+        stream_server.publish(city, "forecast", forecast_payload(items, city))
+
+# Polls every subscriber city plus POLL_STATIONS ("City:lat:lon,...") into history_aqi
+aqi_poller = AQIPoller(
+    openweather,
+    get_db_connection,
+    stations=parse_stations(os.getenv("POLL_STATIONS", "")),
+    interval=float(os.getenv("POLL_INTERVAL", 600)),
+    # Older snapshots are refetched on /live-aqi; default two intervals
+    max_age=float(os.getenv("POLL_MAX_AGE", 0)) or None,
+    workers=int(os.getenv("POLL_WORKERS", 8)),
+    compact_every=int(os.getenv("ROLLUP_COMPACT_EVERY", 6)),
+)
 
 meteorological_features = ["RH", "WS (m/s)", "Temp", "BP (mmHg)"]
 pollutants = ["PM2.5", "PM10", "NO2", "SO2", "CO", "Ozone"]
@@ -79,18 +145,8 @@ cached_location = None
 cached_location_time = None
 LOCATION_CACHE_DURATION = timedelta(minutes=10)
 
-# -----------------------------------------------------------------------------
-# Database helper
-# -----------------------------------------------------------------------------
-def get_db_connection():
-    return pymysql.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        user=DB_USER,
-        password=DB_PASS,
-        db=DB_NAME,
-        cursorclass=pymysql.cursors.DictCursor
-    )
+# Rendered /history-aqi pages, valid until the next day boundary
+history_cache = DayCache(maxsize=int(os.getenv("HISTORY_CACHE_SIZE", 256)))
 
 # -----------------------------------------------------------------------------
 # Email helper
@@ -106,32 +162,486 @@ def send_email(to_address, subject, body):
     msg["From"] = smtp_user
     msg["To"] = to_address
 
-    with smtplib.SMTP(smtp_host, smtp_port) as smtp:
+    with outbound("smtp"), smtplib.SMTP(smtp_host, smtp_port) as smtp:
         smtp.starttls()
         smtp.login(smtp_user, smtp_pass)
         smtp.send_message(msg)
 
+# Subscriber alerts go through a background queue; /notify only enqueues.
+notifications = NotificationDispatcher(
+    NotificationStore(get_db_connection),
+    workers=int(os.getenv("NOTIFY_WORKERS", 2)),
+    batch_size=int(os.getenv("NOTIFY_BATCH_SIZE", 50)),
+    max_retries=int(os.getenv("NOTIFY_MAX_RETRIES", 3)),
+    session_max_messages=int(os.getenv("SMTP_SESSION_MAX_MESSAGES", 100)),
+)
+
+def alert_email(alert):
+    city = alert.get('city', '').strip()
+    subject = f"AQI Alert for {city}: {alert.get('pollutant')} High"
+    body = f"{alert.get('message')}\n\nLocation: {city}\nTime:     {alert.get('date')}\n"
+    return subject, body
+
+def dispatch_alerts(events):
+    """Queue one email per subscriber of the city for each alert the engine fired."""
+    cities = sorted({e["city"] for e in events})
+    try:
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, email, city FROM subscriptions WHERE subscription_type='email' AND email IS NOT NULL "
+                "AND city IN (" + ",".join(["%s"] * len(cities)) + ")",
+                cities
+            )
+            subs = cursor.fetchall()
+    except Exception:
+        logging.exception("Could not load subscribers for %d alerts", len(events))
+        return
+    by_city = {}
+    for row in subs:
+        by_city.setdefault(row["city"], []).append((row["id"], row["email"]))
+    for e in events:
+        pollutant = e["pollutant"].upper()
+        subject, body = alert_email(dict(
+            city=e["city"], pollutant=pollutant,
+            message=f"{pollutant} is high: {e['value']:g} (threshold {e['threshold']:g})",
+            date=datetime.fromtimestamp(e["date"], tz=timezone.utc).isoformat(),
+        ))
+        notifications.enqueue(subject, body, by_city.get(e["city"], []))
+
+# Threshold alerts are evaluated here once per poll cycle for every city, not in each browser tab.
+alert_engine = AlertEngine(
+    parse_thresholds(os.getenv("ALERT_THRESHOLDS", "")),
+    clear_ratio=float(os.getenv("ALERT_CLEAR_RATIO", 0.9)),
+    cooldown=float(os.getenv("ALERT_COOLDOWN", 3600)),
+    on_alert=dispatch_alerts,
+)
+
+def on_poll_cycle(readings):
+    try:
+        alert_engine.evaluate(*alert_engine.values_from(readings))
+    except Exception:
+        logging.exception("Alert evaluation failed")
+    publish_stream_updates(readings)
+
+aqi_poller.on_cycle = on_poll_cycle
+
+def start_background_services():
+    """Start the poller (which drives alerts), the SSE stream server and the
+    resending of notifications a stopped process left queued.
+
+    Exactly one process per deployment should run these; wsgi.py picks one
+    worker. BACKGROUND_SERVICES=0 leaves them to the caller.
+    """
+    if os.getenv("POLL_ENABLED", "1" if API_KEY else "0") == "1":
+        aqi_poller.start()
+    if os.getenv("STREAM_ENABLED", "1" if API_KEY else "0") == "1":
+        stream_server.start()
+    if os.getenv("NOTIFY_RECOVERY", "1" if os.getenv("SMTP_HOST") else "0") == "1":
+        notifications.start_recovery(grace=float(os.getenv("NOTIFY_RECOVERY_GRACE", 600)),
+                                     interval=float(os.getenv("NOTIFY_RECOVERY_INTERVAL", 300)))
+
+def stop_background_services(timeout=10):
+    aqi_poller.stop(timeout)
+    stream_server.stop(timeout)
+    notifications.stop(timeout)
+
+if os.getenv("BACKGROUND_SERVICES", "1") == "1":
+    start_background_services()
+
 # -----------------------------------------------------------------------------
 # Load ML models
 # -----------------------------------------------------------------------------
-# 1) XGBoost JSON boosters
-boosters = []
+# Artifacts load concurrently in the background so non-ML routes serve right
+# away; heavy libraries are imported inside the loaders, on first use.
+MODEL_WAIT_TIMEOUT = float(os.getenv("MODEL_WAIT_TIMEOUT", 30))
 n_boosters = len(pollutants)
-for idx in range(n_boosters):
-    booster = xgb.Booster()
-    booster.load_model(os.path.join(MODELS_DIR, f"xgb_booster_{idx}.json"))
-    boosters.append(booster)
+booster_paths = [os.path.join(MODELS_DIR, f"xgb_booster_{idx}.json") for idx in range(n_boosters)]
+
+# 1) XGBoost JSON boosters, compiled into one fused forest (one output per pollutant).
+# Batches above FOREST_FUSED_MAX_ROWS rows run on the native boosters instead,
+# which are faster there and give bit-identical results (benchmarks/bench_forest.py).
+FOREST_FUSED_MAX_ROWS = int(os.getenv("FOREST_FUSED_MAX_ROWS", 32))
+
+def load_boosters():
+    import xgboost
+    return [xgboost.Booster(model_file=path) for path in booster_paths]
+
+def load_forest():
+    from forest import FusedForest, HybridForest
+    return HybridForest(FusedForest.from_json_files(booster_paths), load_boosters, FOREST_FUSED_MAX_ROWS)
 
 # 2) Scalers via joblib
-scaler_meteo     = joblib_load(os.path.join(MODELS_DIR, "scaler_meteo.joblib"))
-pollutant_scaler = joblib_load(os.path.join(MODELS_DIR, "pollutant_scaler.joblib"))
+def joblib_loader(filename):
+    def load():
+        from joblib import load as joblib_load
+        return joblib_load(os.path.join(MODELS_DIR, filename))
+    return load
+
+# 3) LSTM weights exported from the Keras .h5 (python lstm_numpy.py export), run with NumPy.
+# MODEL_PRECISION=float16|int8 serves reduced-precision weights; compare them with
+# benchmarks/bench_precision.py before switching.
+MODEL_PRECISION = os.getenv("MODEL_PRECISION", "float32")
+
+def load_lstm():
+    from lstm_numpy import NumpyLSTMModel
+    return NumpyLSTMModel.load(os.path.join(MODELS_DIR, "lstm_multi_pollutants_model.npz"),
+                               precision=MODEL_PRECISION)
+
+# All of the above in one memory-mapped file, built at deploy time with
+# python model_bundle.py export: nothing to parse, and workers share its pages.
+# It is served only while the artifacts it was built from are unchanged on disk;
+# otherwise (or with MODEL_BUNDLE="") the separate artifacts load. Both are
+# watched, so replacing either reloads.
+MODEL_BUNDLE = os.getenv("MODEL_BUNDLE", os.path.join(MODELS_DIR, "aqi_models.bundle"))
+_stale_bundle_warned = None
+
+def current_bundle():
+    """The ModelBundle to serve from, or None to load the separate artifacts."""
+    global _stale_bundle_warned
+    if not MODEL_BUNDLE or not os.path.exists(MODEL_BUNDLE):
+        return None
+    from model_bundle import open_bundle
+    bundle = open_bundle(MODEL_BUNDLE, verify=os.getenv("MODEL_BUNDLE_VERIFY", "1") == "1")
+    stale = bundle.stale_sources(MODELS_DIR)
+    if stale:
+        if _stale_bundle_warned != (bundle.version, stale):
+            _stale_bundle_warned = (bundle.version, stale)
+            logging.warning("Model bundle %s was built from other versions of %s; loading the separate "
+                            "artifacts (re-run python model_bundle.py export)", bundle.version, ", ".join(stale))
+        return None
+    return bundle
+
+def artifact_loader(from_bundle, from_artifacts):
+    def load():
+        bundle = current_bundle()
+        return from_artifacts() if bundle is None else from_bundle(bundle)
+    return load
+
+model_paths = booster_paths + [
+    os.path.join(MODELS_DIR, name)
+    for name in ("scaler_meteo.joblib", "pollutant_scaler.joblib", "lstm_multi_pollutants_model.npz")
+] + ([MODEL_BUNDLE] if MODEL_BUNDLE else [])
+model_loaders = {
+    "forest": artifact_loader(lambda bundle: bundle.hybrid_forest(FOREST_FUSED_MAX_ROWS), load_forest),
+    "scaler_meteo": artifact_loader(lambda bundle: bundle.scaler("scaler_meteo"),
+                                    joblib_loader("scaler_meteo.joblib")),
+    "pollutant_scaler": artifact_loader(lambda bundle: bundle.scaler("pollutant_scaler"),
+                                        joblib_loader("pollutant_scaler.joblib")),
+    "lstm_model": artifact_loader(lambda bundle: bundle.lstm(precision=MODEL_PRECISION), load_lstm),
+}
+models = ModelRegistry(model_loaders, watch_paths=model_paths,
+                       watch_interval=float(os.getenv("MODEL_WATCH_INTERVAL", 5)))
+# With INFERENCE_SOCKET the models load here only if /predict/station or stateful
+# /observations need them.
+if os.getenv("MODEL_PRELOAD", "0" if INFERENCE_SOCKET else "1") == "1":
+    models.start()
+
+# -----------------------------------------------------------------------------
+# Ensemble inference
+# -----------------------------------------------------------------------------
+FEATURE_ALIASES = {"WS": "WS (m/s)", "BP": "BP (mmHg)"}
+LSTM_TIMESTEPS = 10
+MAX_BATCH_ROWS = int(os.getenv("PREDICT_MAX_BATCH_ROWS", 10000))
+
+# Results cache keyed on the exact inputs; PREDICT_CACHE_SIZE=0 disables it.
+# PREDICT_CACHE_RESOLUTION (one step for all features or one per feature:
+# RH,WS,Temp,BP) opts in to snapping inputs for more hits, at the cost of every
+# prediction being made on the snapped row; see prediction_cache.py.
+prediction_cache = PredictionCache(
+    maxsize=int(os.getenv("PREDICT_CACHE_SIZE", 4096)),
+    ttl=float(os.getenv("PREDICT_CACHE_TTL", 0)),
+    resolution=os.getenv("PREDICT_CACHE_RESOLUTION", "0"),
+    n_features=len(meteorological_features),
+)
 
-# 3) Keras LSTM model, then compile to silence metric warning
-lstm_model = load_model(
-    os.path.join(MODELS_DIR, "lstm_multi_pollutants_model.h5"),
-    custom_objects={"mse": mse}
+# Last LSTM_TIMESTEPS observations per station (POST /observations) for /predict/station.
+# LSTM_MODE=stateful advances a per-station LSTM state on each observation instead.
+station_buffers = StationBuffers(
+    LSTM_TIMESTEPS,
+    len(meteorological_features),
+    capacity=int(os.getenv("STATION_BUFFER_CAPACITY", 1024)),
+    mode=os.getenv("LSTM_MODE", "window"),
 )
-lstm_model.compile(optimizer="adam", loss=mse, metrics=["mse"] )
+
+def normalize_features(data):
+    for old, new in FEATURE_ALIASES.items():
+        if old in data and new not in data:
+            data[new] = data.pop(old)
+    return data
+
+def parse_batch_payload(payload):
+    """Turn a /predict/batch body into an (N, 4) array of meteorological rows.
+
+    Accepts a list of row objects (bare or under "rows") or a columnar object
+    mapping each feature to an equal-length list.
+    """
+    if isinstance(payload, dict) and "rows" in payload:
+        payload = payload["rows"]
+    if isinstance(payload, list):
+        columns = {f: [] for f in meteorological_features}
+        for i, row in enumerate(payload):
+            if not isinstance(row, dict):
+                raise ValueError(f"Row {i} is not an object")
+            row = normalize_features(dict(row))
+            missing = [f for f in meteorological_features if f not in row]
+            if missing:
+                raise ValueError(f"Row {i} missing features: {', '.join(missing)}")
+            for f in meteorological_features:
+                columns[f].append(row[f])
+    elif isinstance(payload, dict):
+        columns = normalize_features(dict(payload))
+        missing = [f for f in meteorological_features if f not in columns]
+        if missing:
+            raise ValueError(f"Missing features: {', '.join(missing)}")
+        if not all(isinstance(columns[f], list) for f in meteorological_features):
+            raise ValueError("Columnar payload values must be lists")
+        if len({len(columns[f]) for f in meteorological_features}) != 1:
+            raise ValueError("Columnar payload lists must have equal length")
+    else:
+        raise ValueError("Expected a list of rows or a columnar object")
+    n_rows = len(columns[meteorological_features[0]])
+    if n_rows > MAX_BATCH_ROWS:
+        raise ValueError(f"Batch too large: {n_rows} rows (max {MAX_BATCH_ROWS})")
+    try:
+        arr = np.array([columns[f] for f in meteorological_features], dtype=float).T
+    except (TypeError, ValueError):
+        raise ValueError("Feature values must be numeric")
+    return arr.reshape(n_rows, len(meteorological_features))
+
+def parse_timestamp(value):
+    """Epoch seconds from a number or an ISO 8601 string (naive means UTC); None stays None."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Bad timestamp {value!r}")
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+def parse_observations(payload):
+    """Turn a /observations body into (stations, (N, 4) rows, (N,) epoch seconds).
+
+    Accepts one observation object, a list of them or {"observations": [...]};
+    each carries "station", the four features and an optional "ts".
+    """
+    if isinstance(payload, dict) and "observations" in payload:
+        payload = payload["observations"]
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list):
+        raise ValueError("Expected an observation object or a list of them")
+    stations, ts = [], []
+    now = time.time()
+    for i, row in enumerate(payload):
+        station = str(row.get("station") or "").strip() if isinstance(row, dict) else ""
+        if not station:
+            raise ValueError(f"Row {i} missing station")
+        stations.append(station)
+        observed = parse_timestamp(row.get("ts"))
+        ts.append(now if observed is None else observed)
+    return stations, parse_batch_payload(payload), np.array(ts, dtype=float)
+
+def ensemble_predict(arr):
+    """Run the XGBoost+LSTM ensemble over an (N, 4) array of raw meteorological rows.
+
+    Returns an (N, 6) array of absolute pollutant concentrations. The single-row
+    /predict route goes through here as well, so batched and per-row results agree.
+    """
+    scaler_meteo = models.get("scaler_meteo", MODEL_WAIT_TIMEOUT)
+    forest = models.get("forest", MODEL_WAIT_TIMEOUT)
+    lstm_model = models.get("lstm_model", MODEL_WAIT_TIMEOUT)
+    pollutant_scaler = models.get("pollutant_scaler", MODEL_WAIT_TIMEOUT)
+    with STAGE_SECONDS.time("scale"):
+        scaled = scaler_meteo.transform(arr)
+    with STAGE_SECONDS.time("forest"):
+        xgb_out = forest.predict(scaled)
+    with STAGE_SECONDS.time("lstm"):
+        seq = np.repeat(scaled[:, None, :], LSTM_TIMESTEPS, axis=1)
+        lstm_out = lstm_model.predict(seq, verbose=0)
+    return combine_outputs(xgb_out, lstm_out, pollutant_scaler)
+
+def xgboost_predict(arr):
+    """The XGBoost half of the ensemble alone: the degraded /predict path under overload."""
+    scaler_meteo = models.get("scaler_meteo", MODEL_WAIT_TIMEOUT)
+    forest = models.get("forest", MODEL_WAIT_TIMEOUT)
+    pollutant_scaler = models.get("pollutant_scaler", MODEL_WAIT_TIMEOUT)
+    with STAGE_SECONDS.time("scale"):
+        scaled = scaler_meteo.transform(arr)
+    with STAGE_SECONDS.time("forest"):
+        xgb_out = forest.predict(scaled)
+    with STAGE_SECONDS.time("inverse_transform"):
+        return np.abs(pollutant_scaler.inverse_transform(xgb_out))
+
+inference_client = InferenceClient(
+    INFERENCE_SOCKET,
+    timeout=float(os.getenv("INFERENCE_TIMEOUT", 30)),
+) if INFERENCE_SOCKET else None
+
+def run_ensemble(arr):
+    """ensemble_predict here, or on the inference server when INFERENCE_SOCKET is set."""
+    if inference_client is None:
+        return ensemble_predict(arr)
+    return inference_client.predict(arr)
+
+def run_fallback(arr):
+    if inference_client is None:
+        return xgboost_predict(arr)
+    return inference_client.predict(arr, fallback=True)
+
+def timed_ensemble(arr):
+    started = time.perf_counter()
+    result = run_ensemble(arr)
+    admission.observe_pass(time.perf_counter() - started)
+    return result
+
+def model_generation():
+    if inference_client is None:
+        return models.reload_if_changed()
+    return inference_client.generation
+
+# Concurrent /predict calls are coalesced into one ensemble pass: the scheduler
+# waits up to PREDICT_BATCH_WINDOW_MS after the oldest queued request or until
+# PREDICT_MAX_BATCH rows are queued. PREDICT_MAX_BATCH=1 disables batching.
+# Against the inference server, PREDICT_BATCH_CONCURRENCY batches are in flight.
+predict_batcher = MicroBatcher(
+    timed_ensemble,
+    window=float(os.getenv("PREDICT_BATCH_WINDOW_MS", 2)) / 1000,
+    max_batch=int(os.getenv("PREDICT_MAX_BATCH", 64)),
+    concurrency=int(os.getenv("PREDICT_BATCH_CONCURRENCY", 4 if INFERENCE_SOCKET else 1)),
+)
+# Degraded rows are batched the same way, apart from the ensemble's queue.
+fallback_batcher = MicroBatcher(
+    run_fallback,
+    window=predict_batcher.window,
+    max_batch=predict_batcher.max_batch,
+    concurrency=predict_batcher.concurrency,
+)
+
+# Overload protection: beyond PREDICT_MAX_IN_FLIGHT concurrent /predict requests
+# per worker the next is shed with a 503. Rows that would miss the request's
+# PREDICT_LATENCY_BUDGET_MS waiting for the ensemble, or arrive while
+# PREDICT_LSTM_MAX_ROWS rows are already on it, get XGBoost alone, flagged
+# "degraded" (PREDICT_DEGRADE=0 turns that off). 0 disables each limit.
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("PREDICT_MAX_IN_FLIGHT", 64)),
+    budget=float(os.getenv("PREDICT_LATENCY_BUDGET_MS", 250)) / 1000,
+    max_lstm_rows=int(os.getenv("PREDICT_LSTM_MAX_ROWS", 0)),
+    degrade=os.getenv("PREDICT_DEGRADE", "1") == "1",
+    max_batch=predict_batcher.max_batch,
+    concurrency=predict_batcher.concurrency,
+)
+
+def combine_outputs(xgb_out, lstm_out, pollutant_scaler):
+    ensemble = (xgb_out + lstm_out) / 2
+    # Changed: Convert negative values to their absolute value instead of clamping to 0
+    with STAGE_SECONDS.time("inverse_transform"):
+        return np.abs(pollutant_scaler.inverse_transform(ensemble))
+
+def record_observations(stations, rows, ts):
+    """Buffer observations; in stateful mode also step the LSTM if it is loaded."""
+    if station_buffers.mode == "stateful" and models.ready:
+        generation = models.reload_if_changed()
+        return station_buffers.append(
+            stations, rows, ts,
+            model=models.get("lstm_model", MODEL_WAIT_TIMEOUT),
+            transform=models.get("scaler_meteo", MODEL_WAIT_TIMEOUT).transform,
+            key=generation,
+        )
+    return station_buffers.append(stations, rows, ts)
+
+def station_predict(stations):
+    """Ensemble predictions from each station's buffered history.
+
+    XGBoost sees the newest observation and the LSTM the real window (or the
+    station's running state in stateful mode). Raises KeyError for a station
+    without observations. Returns (N, 6) concentrations and history lengths.
+    """
+    generation = models.reload_if_changed()
+    scaler_meteo = models.get("scaler_meteo", MODEL_WAIT_TIMEOUT)
+    forest = models.get("forest", MODEL_WAIT_TIMEOUT)
+    lstm_model = models.get("lstm_model", MODEL_WAIT_TIMEOUT)
+    pollutant_scaler = models.get("pollutant_scaler", MODEL_WAIT_TIMEOUT)
+    slots = station_buffers.lookup(stations)
+    windows, lengths = station_buffers.windows(slots)
+    with STAGE_SECONDS.time("scale"):
+        scaled = scaler_meteo.transform(windows.reshape(-1, windows.shape[2])).reshape(windows.shape)
+    with STAGE_SECONDS.time("forest"):
+        xgb_out = forest.predict(scaled[:, -1])
+    with STAGE_SECONDS.time("lstm"):
+        if station_buffers.mode == "stateful":
+            lstm_out = station_buffers.lstm_outputs(slots, lstm_model, scaler_meteo.transform, generation)
+        else:
+            lstm_out = lstm_model.predict(scaled, verbose=0)
+    return combine_outputs(xgb_out, lstm_out, pollutant_scaler), lengths
+
+def compute_predictions(arr, deadline=None):
+    """Formatted ensemble predictions, or XGBoost-only ones marked "degraded"
+    when the admission controller expects the ensemble to miss ``deadline``."""
+    if admission.plan(len(arr), deadline):
+        try:
+            return format_predictions(predict_batcher.submit(arr))
+        finally:
+            admission.release(len(arr))
+    results = format_predictions(fallback_batcher.submit(arr))
+    for result in results:
+        result["degraded"] = True
+    return results
+
+def cached_predict(arr, deadline=None):
+    """Formatted predictions for an (N, 4) array, serving repeats from the cache.
+
+    With a cache resolution set, rows are snapped to it first; either way the
+    ensemble runs once over the rows that missed. Degraded results are not
+    cached.
+    """
+    generation = model_generation()
+    if not prediction_cache.enabled:
+        return compute_predictions(arr, deadline)
+    snapped, keys = prediction_cache.quantize(arr)
+    results = [prediction_cache.get(key, generation) for key in keys]
+    missed = [i for i, result in enumerate(results) if result is None]
+    bypassed = keys.count(None)
+    CACHE_LOOKUPS.inc("predict", "hit", amount=len(keys) - len(missed))
+    CACHE_LOOKUPS.inc("predict", "miss", amount=len(missed) - bypassed)
+    if bypassed:
+        CACHE_LOOKUPS.inc("predict", "bypass", amount=bypassed)
+    if missed:
+        for i, result in zip(missed, compute_predictions(snapped[missed], deadline)):
+            results[i] = result
+            if "degraded" not in result:
+                prediction_cache.put(keys[i], generation, result)
+    return results
+
+def request_deadline():
+    """Deadline of the current /predict request: its start plus the latency
+    budget, which an X-Latency-Budget-Ms header may lower."""
+    state = g.get("metrics")
+    started = state[0] if state is not None else time.perf_counter()
+    try:
+        budget = float(request.headers["X-Latency-Budget-Ms"]) / 1000
+    except (KeyError, ValueError):
+        budget = None
+    return admission.deadline(started, budget)
+
+def prediction_response(body, results):
+    response = jsonify(body)
+    if any("degraded" in result for result in results):
+        response.headers["X-Prediction-Degraded"] = "xgboost-only"
+    return response
+
+def overloaded_response(e):
+    return jsonify(error=str(e)), 503, {"Retry-After": "1"}
+
+def format_predictions(abs_vals):
+    """Response dicts for an (N, 6) array of concentrations, scoring AQI in one pass."""
+    results = []
+    with STAGE_SECONDS.time("aqi"):
+        for row, (overall, indiv) in zip(abs_vals.tolist(), compute_real_aqi_rows(abs_vals, pollutants)):
+            absolute = {pollutants[i]: float(row[i]) for i in range(len(pollutants))}
+            results.append(dict(ensemble_absolute=absolute, computed_AQI=overall, individual_AQI=indiv))
+    return results
 
 # -----------------------------------------------------------------------------
 # Location utility
@@ -142,8 +652,9 @@ def get_dynamic_location():
     if cached_location and cached_location_time and (now - cached_location_time < LOCATION_CACHE_DURATION):
         return cached_location
     try:
-        resp = requests.get("https://ipinfo.io/json", timeout=5)
-        resp.raise_for_status()
+        with outbound("ipinfo"):
+            resp = requests.get(IPINFO_URL, timeout=5)
+            resp.raise_for_status()
         data = resp.json()
         loc = data.get("loc", "")
         city = data.get("city", "").strip()
@@ -156,33 +667,92 @@ def get_dynamic_location():
     return cached_location
 
 # -----------------------------------------------------------------------------
-# AQI computation
+# Request metrics
 # -----------------------------------------------------------------------------
-def compute_real_aqi(absolute_pollutants):
-    breakpoints = {
-        "PM2.5": ([0.0,12.1,35.5,55.5,150.5,250.5,350.5],[0,50,100,150,200,300,400,500]),
-        "PM10":  ([0,55,155,255,355,425,505],[0,50,100,150,200,300,400,500]),
-        "NO2":   ([0,54,101,361,650,1250,1650],[0,50,100,150,200,300,400,500]),
-        "SO2":   ([0,36,76,186,305,605,805],[0,50,100,150,200,300,400,500]),
-        "CO":    ([0,4.5,9.5,12.5,15.5,30.5,40.5],[0,50,100,150,200,300,400,500]),
-        "Ozone": ([0,55,71,86,106,201],[0,50,100,150,200,300,500])
-    }
-    aqi_vals = {}
-    for pol, val in absolute_pollutants.items():
-        conc, aqi = breakpoints[pol]
-        for i in range(1, len(conc)):
-            if val <= conc[i]:
-                aqi_val = aqi[i-1] + (val-conc[i-1])*(aqi[i]-aqi[i-1])/(conc[i]-conc[i-1])
-                break
-        else:
-            aqi_val = aqi[-1]
-        aqi_vals[pol] = aqi_val
-    overall = max(aqi_vals.values()) if aqi_vals else None
-    return overall, aqi_vals
+# PROFILE_SAMPLE_RATE > 0 profiles that fraction of requests and keeps the
+# cProfile stats of those slower than PROFILE_SLOW_MS in PROFILE_DIR.
+profiler = Profiler(
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", 0)),
+    slow_ms=float(os.getenv("PROFILE_SLOW_MS", 500)),
+    directory=os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "profiles")),
+    keep=int(os.getenv("PROFILE_KEEP", 50)),
+)
+
+@app.before_request
+def start_request_metrics():
+    IN_FLIGHT.inc()
+    # [start, profile, status]; one g attribute keeps the per-request cost down.
+    g.metrics = [time.perf_counter(), profiler.start(), 500]
+
+@app.after_request
+def record_response_status(response):
+    state = g.get("metrics")
+    if state is not None:
+        state[2] = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    state = g.pop("metrics", None)
+    if state is None:
+        return
+    start, profile, status = state
+    elapsed = time.perf_counter() - start
+    IN_FLIGHT.dec()
+    # The URL rule, not the path, so /predict/station/<station> stays one series.
+    rule, method = request.url_rule, request.method
+    route = rule.rule if rule is not None else "unmatched"
+    REQUEST_SECONDS.observe(elapsed, route, method)
+    REQUESTS.inc(route, method, str(status))
+    if exc is not None or status >= 500:
+        REQUEST_ERRORS.inc(route)
+    if profile is not None:
+        profiler.finish(profile, elapsed, f"{method} {route}")
+
+# Component counters are read only when /metrics is scraped.
+REGISTRY.collector("aqi_db_pool", "DB connection pool", db_pool.stats)
+REGISTRY.collector("aqi_predict_cache", "Prediction cache", prediction_cache.stats)
+REGISTRY.collector("aqi_predict_batcher", "Prediction micro-batcher", predict_batcher.stats)
+REGISTRY.collector("aqi_predict_fallback_batcher", "Degraded prediction micro-batcher", fallback_batcher.stats)
+REGISTRY.collector("aqi_predict_admission", "Prediction admission control", admission.stats)
+if inference_client is not None:
+    REGISTRY.collector("aqi_inference_client", "Inference server client", inference_client.stats)
+REGISTRY.collector("aqi_history_cache", "History page cache", history_cache.stats)
+REGISTRY.collector("aqi_openweather", "OpenWeather client", openweather.stats)
+REGISTRY.collector("aqi_poller", "Background AQI poller", aqi_poller.stats)
+REGISTRY.collector("aqi_stream", "SSE stream server", stream_server.stats)
+REGISTRY.collector("aqi_alerts", "Alert engine", alert_engine.stats)
+REGISTRY.collector("aqi_notify", "Notification dispatcher", notifications.stats)
+REGISTRY.collector("aqi_station_buffers", "Per-station observation buffers", station_buffers.stats)
+REGISTRY.collector("aqi_profiler", "Sampled request profiler", profiler.stats)
 
 # -----------------------------------------------------------------------------
 # Routes
 # -----------------------------------------------------------------------------
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify(status="ok"), 200
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    if inference_client is not None:
+        try:
+            inference_client.predict(np.zeros((1, len(meteorological_features))))
+            status = dict(ready=True, inference=inference_client.stats())
+        except ModelNotReady as e:
+            status = dict(ready=False, inference=inference_client.stats(), error=str(e))
+        return jsonify(status), (200 if status["ready"] else 503)
+    status = models.status()
+    return jsonify(status), (200 if status["ready"] else 503)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return app.response_class(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route('/db/pool-stats', methods=['GET'])
+def db_pool_stats():
+    return jsonify(db_pool.stats())
+
 @app.route('/test-email', methods=['GET'])
 def test_email():
     smtp_user = os.getenv("SMTP_USER")
@@ -210,8 +780,7 @@ def subscribe():
         if not name or not contact or not city:
             return jsonify(success=False, message="Name, contact, and location are required"), 400
 
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        with get_db_connection() as conn, conn.cursor() as cursor:
             if sub_type=='email':
                 cursor.execute("SELECT id FROM subscriptions WHERE email=%s", (contact,))
             else:
@@ -225,7 +794,6 @@ def subscribe():
                  sub_type, city)
             )
             conn.commit()
-        conn.close()
         return jsonify(success=True, message="Subscription successful!", city=city), 200
     except Exception:
         logging.exception("Error in /api/subscribe")
@@ -234,29 +802,83 @@ def subscribe():
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
-        data = request.json or {}
-        for old,new in {"WS":"WS (m/s)","BP":"BP (mmHg)"}.items():
-            if old in data and new not in data:
-                data[new]=data.pop(old)
+        data = normalize_features(request.json or {})
         missing=[f for f in meteorological_features if f not in data]
         if missing:
             return jsonify(error=f"Missing features: {', '.join(missing)}"),400
         arr=np.array([[data[f] for f in meteorological_features]])
-        scaled=scaler_meteo.transform(arr)
-        dm=xgb.DMatrix(scaled)
-        xgb_out=np.hstack([bst.predict(dm) for bst in boosters])[None,:]
-        seq=np.repeat(scaled,10,axis=0)[None,...]
-        lstm_out=lstm_model.predict(seq)
-        ensemble=(xgb_out+lstm_out)/2
-        abs_vals=pollutant_scaler.inverse_transform(ensemble)[0]
-        # Changed: Convert negative values to their absolute value instead of clamping to 0
-        absolute={pollutants[i]:float(abs(abs_vals[i])) for i in range(len(pollutants))}
-        overall, indiv=compute_real_aqi(absolute)
-        return jsonify(ensemble_absolute=absolute, computed_AQI=overall, individual_AQI=indiv)
+        with admission.admit():
+            results=cached_predict(arr,request_deadline())
+        return prediction_response(results[0],results)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except ModelNotReady as e:
+        return jsonify(error=str(e)),503
     except Exception:
         logging.exception("Error in /predict")
         return jsonify(error="Internal server error"),500
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    try:
+        try:
+            arr=parse_batch_payload(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify(error=str(e)),400
+        if len(arr)==0:
+            return jsonify(predictions=[])
+        with admission.admit():
+            results=cached_predict(arr,request_deadline())
+        return prediction_response(dict(predictions=results),results)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except ModelNotReady as e:
+        return jsonify(error=str(e)),503
+    except Exception:
+        logging.exception("Error in /predict/batch")
+        return jsonify(error="Internal server error"),500
+
+@app.route('/predict/station/<station>', methods=['GET'])
+def predict_station(station):
+    try:
+        try:
+            abs_vals,lengths=station_predict([station])
+        except KeyError:
+            return jsonify(error=f"No observations for station {station!r}"),404
+        result=format_predictions(abs_vals)[0]
+        observed_at=station_buffers.observed_at(station_buffers.lookup([station]))[0]
+        result.update(station=station,history_length=int(lengths[0]),lstm_mode=station_buffers.mode,
+                      observed_at=datetime.fromtimestamp(observed_at,tz=timezone.utc).isoformat())
+        return jsonify(result)
+    except ModelNotReady as e:
+        return jsonify(error=str(e)),503
+    except Exception:
+        logging.exception("Error in /predict/station")
+        return jsonify(error="Internal server error"),500
+
+@app.route('/observations', methods=['POST'])
+def observations():
+    try:
+        try:
+            stations,rows,ts=parse_observations(request.get_json(silent=True))
+            accepted,rejected=record_observations(stations,rows,ts)
+        except ValueError as e:
+            return jsonify(error=str(e)),400
+        return jsonify(accepted=accepted,rejected_stale=rejected)
+    except ModelNotReady as e:
+        return jsonify(error=str(e)),503
+    except Exception:
+        logging.exception("Error in /observations")
+        return jsonify(error="Internal server error"),500
+
+@app.route('/observations/stats', methods=['GET'])
+def observations_stats():
+    return jsonify(station_buffers.stats())
+
+@app.route('/predict/cache-stats', methods=['GET'])
+def predict_cache_stats():
+    return jsonify(prediction_cache.stats())
+
 @app.route('/live-aqi',methods=['GET'])
 def live_aqi():
     lat,lon,city=get_dynamic_location()
@@ -265,23 +887,26 @@ def live_aqi():
     if not API_KEY:
         return jsonify(error="No OpenWeather API key provided."),500
     try:
-        url=f"https://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={API_KEY}"
-        resp=requests.get(url,timeout=5);resp.raise_for_status()
-        data=resp.json()["list"][0]
-        comp=data["components"];aqi_index=data["main"]["aqi"]
-        today_str=date.today().isoformat()
-        conn=get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "INSERT IGNORE INTO history_aqi (date,city,AQI,`PM2.5`,PM10,NO2) VALUES(%s,%s,%s,%s,%s,%s)",
-                (today_str,city,aqi_index,comp.get("pm2_5"),comp.get("pm10"),comp.get("no2"))
-            );conn.commit()
-        conn.close()
-        return jsonify(AQI=aqi_index,pollutants=comp,city=city,lat=lat,lon=lon)
+        reading=aqi_poller.latest_or_fetch(city,lat,lon)
+        payload=live_payload(reading,city,lat,lon)
+        stream_server.publish(city,"live",payload)
+        return jsonify(payload)
     except Exception:
         logging.exception("Error fetching live-aqi")
         return jsonify(error="Live-AQI fetch failed"),500
 
+@app.route('/poller/stats', methods=['GET'])
+def poller_stats():
+    return jsonify(aqi_poller.stats())
+
+@app.route('/stream/stats', methods=['GET'])
+def stream_stats():
+    return jsonify(stream_server.stats())
+
+@app.route('/openweather/cache-stats', methods=['GET'])
+def openweather_cache_stats():
+    return jsonify(openweather.stats())
+
 @app.route('/forecast-aqi',methods=['GET'])
 def forecast_aqi():
     lat,lon,city=get_dynamic_location()
@@ -292,10 +917,8 @@ def forecast_aqi():
         dummy=[{"time":(now+timedelta(hours=3*i)).strftime("%I %p"),"aqi":random.randint(50,200),"city":city,"components":{}}for i in range(6)]
         return jsonify(dummy)
     try:
-        url=f"https://api.openweathermap.org/data/2.5/air_pollution/forecast?lat={lat}&lon={lon}&appid={API_KEY}"
-        resp=requests.get(url,timeout=5);resp.raise_for_status()
-        items=resp.json().get("list",[])
-        forecast=[{"time":datetime.fromtimestamp(item["dt"],tz=timezone.utc).strftime("%I %p"),"aqi":item["main"]["aqi"],"components":item["components"],"city":city}for item in items]
+        forecast=forecast_payload(openweather.forecast(lat,lon).get("list",[]),city)
+        stream_server.publish(city,"forecast",forecast)
         return jsonify(forecast)
     except Exception:
         logging.exception("Error fetching forecast-aqi")
@@ -304,34 +927,69 @@ def forecast_aqi():
 @app.route('/history-aqi',methods=['GET'])
 def history_aqi():
     try:
-        conn=get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT DATE_FORMAT(date,'%Y-%m-%d') AS date,city,AQI,`PM2.5`,PM10,NO2 FROM history_aqi WHERE date<CURDATE() ORDER BY date DESC")
-            rows=cursor.fetchall()
-        conn.close()
-        return jsonify(rows)
+        query=parse_history_query(request.args)
+    except ValueError as e:
+        return jsonify(error=str(e)),400
+    try:
+        today=history_cache.today()
+        entry=history_cache.get(query)
+        cache_status="HIT"
+        if entry is None:
+            cache_status="MISS"
+            with get_db_connection() as conn:
+                rows,next_cursor=fetch_history_page(conn,query,today)
+            entry=history_cache.put(query,jsonify(rows).get_data(),day=today,next_cursor=next_cursor)
+        resp=app.response_class(entry["body"],mimetype="application/json")
+        resp.set_etag(entry["etag"])
+        # Past days never change, so clients may reuse the page until midnight.
+        resp.cache_control.public=True
+        resp.cache_control.max_age=history_cache.seconds_until_rollover()
+        resp.headers["X-Cache"]=cache_status
+        CACHE_LOOKUPS.inc("history",cache_status.lower())
+        if entry["next_cursor"]:
+            resp.headers["X-Next-Cursor"]=entry["next_cursor"]
+        return resp.make_conditional(request)
     except Exception:
         logging.exception("Error fetching history from DB")
         return jsonify(error="History fetch failed"),500
 
+@app.route('/history-aqi/series',methods=['GET'])
+def history_aqi_series():
+    try:
+        query=parse_series_query(request.args)
+    except ValueError as e:
+        return jsonify(error=str(e)),400
+    station,start,end,level,metrics=query
+    try:
+        with get_db_connection() as conn:
+            rows=fetch_series(conn,query)
+        return jsonify(station=station,resolution=level,metrics=list(metrics),rows=rows)
+    except Exception:
+        logging.exception("Error fetching history series")
+        return jsonify(error="History fetch failed"),500
+
 @app.route('/notify',methods=['POST'])
 def notify_subscribers():
     alert=request.get_json() or {}
     city=alert.get('city','').strip()
-    subject=f"AQI Alert for {city}: {alert.get('pollutant')} High"
-    body=f"{alert.get('message')}\n\nLocation: {city}\nTime:     {alert.get('date')}\n"
+    subject,body=alert_email(alert)
     try:
-        conn=get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT email FROM subscriptions WHERE subscription_type='email' AND email IS NOT NULL AND city=%s",(city,))
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT id, email FROM subscriptions WHERE subscription_type='email' AND email IS NOT NULL AND city=%s",(city,))
             subs=cursor.fetchall()
-        conn.close()
-        for row in subs:
-            send_email(row['email'],subject,body)
-        return jsonify(success=True),200
+        queued=notifications.enqueue(subject,body,[(row['id'],row['email']) for row in subs])
+        return jsonify(success=True,queued=queued),202
     except Exception:
         logging.exception("Error in /notify")
         return jsonify(success=False,message="Notification failed"),500
 
+@app.route('/alerts/stats', methods=['GET'])
+def alerts_stats():
+    return jsonify(alert_engine.stats())
+
+@app.route('/notify/stats', methods=['GET'])
+def notify_stats():
+    return jsonify(notifications.stats())
+
 if __name__=='__main__':
-    app.run(host='127.0.0.1', port=5000, debug=False, use_reloader=False)
+    app.run(host='127.0.0.1', port=int(os.getenv("PORT", 5000)), debug=False, use_reloader=False)
@@ -0,0 +1,202 @@
+"""Per-station rolling windows of meteorological observations for the LSTM.
+
+Every station owns one slot in preallocated arrays: a ring of the last
+``timesteps`` raw observations, the write position and the number of
+observations seen. Memory is fixed by ``capacity``; when a new station arrives
+at capacity the least recently updated one is evicted, but never one written
+by the same batch, so a batch may name at most ``capacity`` stations.
+
+Two ways to turn the history into LSTM input:
+
+* ``window`` - the last ``timesteps`` observations are run through the model
+  as one sequence from a zero state (what the model was trained on). Stations
+  with fewer observations are left-padded with their oldest one, so a single
+  observation gives the same result as the old repeated-row input.
+* ``stateful`` - each new observation advances a per-station (h, c) state by
+  one step and the output is kept, so a prediction is a lookup. The state
+  carries the whole stream rather than the last ``timesteps`` steps, which is
+  cheaper but not identical to ``window`` once a station has more history.
+"""
+import time
+import threading
+
+import numpy as np
+
+MODES = ("window", "stateful")
+
+
+class StationBuffers:
+    def __init__(self, timesteps=10, n_features=4, capacity=1024, mode="window"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LSTM mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.timesteps = timesteps
+        self.n_features = n_features
+        self.capacity = capacity
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._slots = {}                 # station -> slot
+        self._names = [None] * capacity  # slot -> station
+        self._values = np.zeros((capacity, timesteps, n_features))
+        self._head = np.zeros(capacity, dtype=np.int64)   # next write position in the ring
+        self._count = np.zeros(capacity, dtype=np.int64)  # observations seen
+        self._observed_at = np.zeros(capacity)            # timestamp of the newest observation
+        self._touched = np.zeros(capacity)                # monotonic time of the last write
+        # Stateful mode: per-layer (h, c) and the model output after the last step.
+        self._states = None
+        self._outputs = None
+        self._state_key = None
+        self._stats = dict(accepted=0, rejected_stale=0, evicted=0, steps=0, reprimes=0)
+
+    # -- writes ----------------------------------------------------------------
+    def _slot_for(self, station, pinned):
+        """Slot of ``station``, claiming one if it is new; slots marked in
+        ``pinned`` (those of the current batch) are never evicted."""
+        slot = self._slots.get(station)
+        if slot is not None:
+            return slot
+        if len(self._slots) < self.capacity:
+            slot = len(self._slots)
+        else:
+            slot = int(np.argmin(np.where(pinned, np.inf, self._touched)))
+            del self._slots[self._names[slot]]
+            self._stats["evicted"] += 1
+        self._slots[station] = slot
+        self._names[slot] = station
+        self._touched[slot] = time.monotonic()
+        self._head[slot] = self._count[slot] = 0
+        self._observed_at[slot] = -np.inf
+        if self._states is not None:
+            for h, c in self._states:
+                h[slot] = c[slot] = 0
+            self._outputs[slot] = 0
+        return slot
+
+    def append(self, stations, rows, ts=None, model=None, transform=None, key=None):
+        """Record observations (N,) stations x (N, n_features) raw rows, oldest first.
+
+        ``ts`` (N,) are epoch seconds (default: now); an observation not newer
+        than the station's last one is rejected. In stateful mode ``model``,
+        ``transform`` (raw -> scaled rows) and ``key`` (the model generation)
+        advance the states; without them the states are rebuilt on next read.
+        Returns (accepted, rejected) counts. Raises ValueError for a batch
+        naming more stations than ``capacity``.
+        """
+        rows = np.asarray(rows, dtype=float).reshape(-1, self.n_features)
+        distinct = len(set(stations))
+        if distinct > self.capacity:
+            raise ValueError(f"Batch names {distinct} stations; at most {self.capacity} fit in the buffers")
+        now = time.time()
+        ts = np.full(len(rows), now) if ts is None else np.asarray(ts, dtype=float)
+        with self._lock:
+            # Round k holds each station's k-th observation of this batch, so
+            # one vectorized step per round keeps per-station order.
+            rounds, seen = [], {}
+            rejected = 0
+            pinned = np.zeros(self.capacity, dtype=bool)
+            for i, station in enumerate(stations):
+                slot = self._slot_for(station, pinned)
+                pinned[slot] = True
+                if ts[i] <= self._observed_at[slot]:
+                    rejected += 1
+                    continue
+                k = seen.get(slot, 0)
+                seen[slot] = k + 1
+                if k == len(rounds):
+                    rounds.append(([], []))
+                rounds[k][0].append(slot)
+                rounds[k][1].append(i)
+                self._observed_at[slot] = ts[i]
+            stepping = self.mode == "stateful" and model is not None and key is not None
+            if stepping and key != self._state_key:
+                self._reprime(model, transform, key)
+            for slots, idx in rounds:
+                slots = np.array(slots)
+                self._values[slots, self._head[slots]] = rows[idx]
+                self._head[slots] = (self._head[slots] + 1) % self.timesteps
+                self._count[slots] += 1
+                self._touched[slots] = time.monotonic()
+                if stepping:
+                    self._step(model, slots, transform(rows[idx]))
+            if self.mode == "stateful" and rounds and not stepping:
+                self._state_key = None
+            accepted = len(rows) - rejected
+            self._stats["accepted"] += accepted
+            self._stats["rejected_stale"] += rejected
+        return accepted, rejected
+
+    # -- reads -----------------------------------------------------------------
+    def lookup(self, stations):
+        """Slots for ``stations``; raises KeyError for one without observations."""
+        with self._lock:
+            return np.array([self._slots[s] for s in stations], dtype=np.int64)
+
+    def windows(self, slots):
+        """(N, timesteps, n_features) raw windows, oldest first, and history lengths."""
+        with self._lock:
+            return self._windows(slots), np.minimum(self._count[slots], self.timesteps)
+
+    def _windows(self, slots):
+        count = np.minimum(self._count[slots], self.timesteps)[:, None]
+        k = np.maximum(np.arange(self.timesteps) - (self.timesteps - count), 0)
+        pos = (self._head[slots, None] - count + k) % self.timesteps
+        return self._values[slots[:, None], pos]
+
+    def observed_at(self, slots):
+        with self._lock:
+            return self._observed_at[slots].copy()
+
+    def lstm_outputs(self, slots, model, transform, key):
+        """Stateful-mode LSTM outputs for ``slots``, rebuilding the states if
+        they were computed with another model generation."""
+        with self._lock:
+            if key != self._state_key:
+                self._reprime(model, transform, key)
+            return self._outputs[slots].copy()
+
+    # -- stateful mode ---------------------------------------------------------
+    def _step(self, model, slots, scaled):
+        states = [(h[slots], c[slots]) for h, c in self._states]
+        out, states = model.step(scaled, states)
+        for (h, c), (new_h, new_c) in zip(self._states, states):
+            h[slots] = new_h
+            c[slots] = new_c
+        self._outputs[slots] = out
+        self._stats["steps"] += len(slots)
+
+    def _reprime(self, model, transform, key):
+        """Rebuild every state from the buffered windows (the older stream is gone)."""
+        self._states = model.initial_state(self.capacity)
+        self._outputs = None
+        slots = np.array(sorted(self._slots.values()), dtype=np.int64)
+        if len(slots):
+            count = np.minimum(self._count[slots], self.timesteps)
+            scaled = transform(self._windows(slots).reshape(-1, self.n_features))
+            scaled = scaled.reshape(len(slots), self.timesteps, self.n_features)
+            states = [(h[slots], c[slots]) for h, c in self._states]
+            for t in range(self.timesteps):
+                # Padded steps before a station's first observation leave its state at zero.
+                active = (t >= self.timesteps - count)[:, None]
+                out, stepped = model.step(scaled[:, t], states)
+                states = [(np.where(active, h1, h0), np.where(active, c1, c0))
+                          for (h0, c0), (h1, c1) in zip(states, stepped)]
+            for (h, c), (new_h, new_c) in zip(self._states, states):
+                h[slots] = new_h
+                c[slots] = new_c
+            self._outputs = np.zeros((self.capacity, out.shape[1]), dtype=out.dtype)
+            self._outputs[slots] = out
+        else:
+            probe, _ = model.step(np.zeros((1, self.n_features)), model.initial_state(1))
+            self._outputs = np.zeros((self.capacity, probe.shape[1]), dtype=probe.dtype)
+        self._state_key = key
+        self._stats["reprimes"] += 1
+
+    def nbytes(self):
+        arrays = [self._values, self._head, self._count, self._observed_at, self._touched]
+        if self._states is not None:
+            arrays += [a for pair in self._states for a in pair] + [self._outputs]
+        return sum(a.nbytes for a in arrays)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, mode=self.mode, stations=len(self._slots), capacity=self.capacity,
+                        timesteps=self.timesteps, bytes=self.nbytes())
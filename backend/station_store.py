@@ -0,0 +1,185 @@
+"""Memory-mapped per-station arrays for windowed reads.
+
+Each station is a directory with one float32 file per variable, sampled on a
+fixed hourly grid from ``start`` (missing hours are NaN), and a ``meta.json``
+holding the grid. Row ``i`` is time ``start + i * step``, so a window maps to a
+slice by arithmetic and ``read_window`` returns read-only ``np.memmap`` views:
+no parsing, no copy, and the OS page cache is shared by every process that
+opens the store.
+
+    <root>/<station>/meta.json
+    <root>/<station>/<variable>.f32
+
+Usage:
+    python station_store.py build --parquet store --out station_arrays
+"""
+import os
+import json
+import shutil
+import argparse
+import threading
+
+import numpy as np
+
+STEP_SECONDS = 3600
+META = "meta.json"
+
+
+def _file_name(column):
+    # Column names such as "WS (m/s)" are not valid file names as-is.
+    return "".join(ch if ch.isalnum() or ch in ".-_" else "_" for ch in column) + ".f32"
+
+
+def _to_seconds(t):
+    return int(np.datetime64(t, "s").astype(np.int64))
+
+
+def write_station(root, station, ts, columns, step=STEP_SECONDS, source=None):
+    """Write one station from timestamps (N,) and {column: values (N,)}.
+
+    Timestamps are floored to the grid; duplicates keep the last value.
+    The station directory is replaced atomically.
+    """
+    ts = (np.asarray(ts, dtype="datetime64[s]").astype(np.int64) // step) * step
+    if len(ts) == 0:
+        raise ValueError(f"No rows for station {station}")
+    start, end = int(ts.min()), int(ts.max())
+    length = (end - start) // step + 1
+    rows = (ts - start) // step
+
+    staging = os.path.join(root, f".{station}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    files = {}
+    for name, values in columns.items():
+        grid = np.full(length, np.nan, dtype=np.float32)
+        grid[rows] = np.asarray(values, dtype=np.float32)
+        grid.tofile(os.path.join(staging, _file_name(name)))
+        files[name] = _file_name(name)
+    meta = {"station": station, "start": start, "step": step, "length": int(length),
+            "dtype": "float32", "columns": files, "source": source}
+    with open(os.path.join(staging, META), "w") as f:
+        json.dump(meta, f, indent=1)
+    final = os.path.join(root, station)
+    shutil.rmtree(final, ignore_errors=True)
+    os.replace(staging, final)
+    return meta
+
+
+class StationStore:
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._maps = {}
+
+    def stations(self):
+        return sorted(d for d in os.listdir(self.root)
+                      if not d.startswith(".") and os.path.exists(os.path.join(self.root, d, META)))
+
+    def meta(self, station):
+        meta = self._meta.get(station)
+        if meta is None:
+            try:
+                with open(os.path.join(self.root, station, META)) as f:
+                    meta = json.load(f)
+            except FileNotFoundError:
+                raise KeyError(station)
+            self._meta[station] = meta
+        return meta
+
+    def columns(self, station):
+        return list(self.meta(station)["columns"])
+
+    def time_range(self, station):
+        """(first, last) timestamp on the station's grid."""
+        m = self.meta(station)
+        first = np.datetime64(m["start"], "s")
+        return first, first + np.timedelta64(m["step"] * (m["length"] - 1), "s")
+
+    def _array(self, station, column):
+        key = (station, column)
+        arr = self._maps.get(key)
+        if arr is None:
+            m = self.meta(station)
+            if column not in m["columns"]:
+                raise KeyError(f"{station} has no column {column!r}")
+            with self._lock:
+                arr = self._maps.get(key)
+                if arr is None:
+                    arr = np.memmap(os.path.join(self.root, station, m["columns"][column]),
+                                    dtype=np.float32, mode="r", shape=(m["length"],))
+                    self._maps[key] = arr
+        return arr
+
+    def read_window(self, station, start, end, columns=None):
+        """Values in [start, end) clipped to the stored range.
+
+        Returns ``{"ts": datetime64[s] (T,), column: float32 view (T,), ...}``;
+        the column arrays are read-only slices of the memory map.
+        """
+        m = self.meta(station)
+        step, length = m["step"], m["length"]
+        lo = max(0, -(-(_to_seconds(start) - m["start"]) // step))
+        hi = min(length, -(-(_to_seconds(end) - m["start"]) // step))
+        hi = max(hi, lo)
+        out = {"ts": (np.arange(lo, hi, dtype=np.int64) * step + m["start"]).astype("datetime64[s]")}
+        for column in (columns or m["columns"]):
+            out[column] = self._array(station, column)[lo:hi]
+        return out
+
+    def last_hours(self, station, n, columns=None, end=None):
+        """The ``n`` grid points ending at ``end`` (default: the newest stored hour)."""
+        m = self.meta(station)
+        if end is None:
+            end = np.datetime64(m["start"] + m["step"] * m["length"], "s")
+        end = np.datetime64(end, "s")
+        return self.read_window(station, end - np.timedelta64(n * m["step"], "s"), end, columns)
+
+    def close(self):
+        with self._lock:
+            self._maps.clear()
+            self._meta.clear()
+
+
+def build_from_parquet(parquet_dir, out_dir, stations=None, log=print):
+    """Convert the ingest.py Parquet store; stations whose source is unchanged are skipped."""
+    import pyarrow.dataset as ds
+    from ingest import load_manifest, VALUE_COLUMNS
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(parquet_dir)
+    dataset = ds.dataset(parquet_dir, format="parquet", partitioning="hive",
+                         exclude_invalid_files=True, ignore_prefixes=[".", "_"])
+    built = skipped = 0
+    for station, entry in sorted(manifest.items()):
+        if entry.get("status") != "ingested" or (stations and station not in stations):
+            continue
+        source = {k: entry.get(k) for k in ("size", "mtime_ns")}
+        try:
+            with open(os.path.join(out_dir, station, META)) as f:
+                if json.load(f).get("source") == source:
+                    skipped += 1
+                    continue
+        except FileNotFoundError:
+            pass
+        table = dataset.to_table(columns=["ts"] + VALUE_COLUMNS, filter=ds.field("station") == station)
+        columns = {c: table.column(c).to_numpy(zero_copy_only=False) for c in VALUE_COLUMNS}
+        write_station(out_dir, station, table.column("ts").to_numpy(), columns, source=source)
+        built += 1
+    log(f"Built {built} stations, {skipped} unchanged, into {out_dir}")
+    return built, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build memory-mapped station arrays.")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--parquet", default="store", help="output directory of ingest.py")
+    parser.add_argument("--out", default="station_arrays")
+    parser.add_argument("--stations", nargs="*")
+    args = parser.parse_args()
+    build_from_parquet(args.parquet, args.out, args.stations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Server-sent events stream of live AQI and forecast updates per city.
+
+Flask serves one request per thread, so open streams are held by a small
+asyncio server running in a background thread instead (``STREAM_PORT``); an
+idle connection costs a socket and a coroutine, not a thread.
+
+    GET /stream?city=Delhi        Accept: text/event-stream
+
+``publish(city, kind, data)`` is thread-safe. Each update is encoded once and
+written to every listener of that city. A client whose socket buffer is over
+``high_water`` bytes gets at most one pending frame per kind instead: a newer
+update replaces the unsent one, and a client still blocked after
+``write_timeout`` is dropped (EventSource reconnects). Event ids increase
+across the server; on reconnect the ``Last-Event-ID`` header limits the
+initial snapshot to frames newer than it. Idle streams get a comment line
+every ``heartbeat`` seconds so proxies keep them open.
+"""
+import json
+import time
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit, parse_qs
+
+MAX_HEADER_BYTES = 8192
+
+RESPONSE_HEADERS = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: text/event-stream\r\n"
+    b"Cache-Control: no-cache\r\n"
+    b"Connection: keep-alive\r\n"
+    b"Access-Control-Allow-Origin: *\r\n"
+    b"X-Accel-Buffering: no\r\n"
+    b"\r\n"
+)
+
+
+def _error(status, message):
+    body = json.dumps({"error": message}).encode()
+    return (f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+            f"Access-Control-Allow-Origin: *\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n").encode() + body
+
+
+def raise_fd_limit():
+    """Lift the soft open-files limit to the hard one so thousands of streams fit."""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        return hard
+    except (ImportError, ValueError, OSError):
+        return None
+
+
+class _Client:
+    __slots__ = ("city", "writer", "pending", "flushing", "last_write")
+
+    def __init__(self, city, writer):
+        self.city = city
+        self.writer = writer
+        self.pending = {}  # kind -> newest frame held back while the socket is behind
+        self.flushing = None
+        self.last_write = time.monotonic()
+
+
+class StreamServer:
+    def __init__(self, host="127.0.0.1", port=5001, heartbeat=15.0, retry_ms=5000, write_timeout=10.0,
+                 max_connections=10000, high_water=65536, accept=None):
+        self.host = host
+        self.port = port
+        self.heartbeat = heartbeat
+        self.retry_ms = retry_ms
+        self.write_timeout = write_timeout
+        self.max_connections = max_connections
+        self.high_water = high_water
+        self.accept = accept  # callable(city) -> bool; unknown cities get a 404
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._latest = {}      # (city, kind) -> (event id, data, frame)
+        self._listeners = {}   # city -> set of _Client (event loop thread only)
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._started = threading.Event()
+        self._stats = dict(connections=0, peak_connections=0, connects=0, rejected=0, published=0,
+                           unchanged=0, frames_sent=0, superseded=0, slow_disconnects=0, heartbeats=0)
+
+    # -- publishing (any thread) -----------------------------------------------
+    def publish(self, city, kind, data):
+        """Send ``data`` as a ``kind`` event to every listener of ``city``.
+
+        Returns False when it equals the last ``kind`` update for the city."""
+        with self._lock:
+            last = self._latest.get((city, kind))
+            if last is not None and last[1] == data:
+                self._stats["unchanged"] += 1
+                return False
+            self._next_id += 1
+            event_id = self._next_id
+            frame = f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+            self._latest[(city, kind)] = (event_id, data, frame)
+            self._stats["published"] += 1
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._fan_out, city, kind, frame)
+        return True
+
+    def cities(self):
+        """Cities with at least one open stream."""
+        with self._lock:
+            return {city for city, clients in self._listeners.items() if clients}
+
+    # -- event loop ------------------------------------------------------------
+    def _fan_out(self, city, kind, frame):
+        now = time.monotonic()
+        for client in self._listeners.get(city, ()):
+            transport = client.writer.transport
+            if client.flushing is None and transport.get_write_buffer_size() < self.high_water:
+                transport.write(frame)
+                client.last_write = now
+                self._stats["frames_sent"] += 1
+                continue
+            if kind in client.pending:
+                self._stats["superseded"] += 1
+            client.pending[kind] = frame
+            if client.flushing is None:
+                client.flushing = asyncio.ensure_future(self._flush(client))
+
+    async def _flush(self, client):
+        """Wait for a lagging socket to drain, then send what is still current."""
+        try:
+            while client.pending:
+                await asyncio.wait_for(client.writer.drain(), self.write_timeout)
+                frames = list(client.pending.values())
+                client.pending.clear()
+                client.writer.write(b"".join(frames))
+                client.last_write = time.monotonic()
+                self._stats["frames_sent"] += len(frames)
+        except asyncio.TimeoutError:
+            self._stats["slow_disconnects"] += 1
+            client.writer.transport.abort()
+        except (ConnectionError, OSError):
+            client.writer.transport.abort()
+        finally:
+            client.flushing = None
+
+    async def _heartbeats(self):
+        while True:
+            await asyncio.sleep(self.heartbeat / 2)
+            cutoff = time.monotonic() - self.heartbeat
+            for clients in list(self._listeners.values()):
+                for client in list(clients):
+                    if client.last_write < cutoff and client.flushing is None:
+                        client.writer.transport.write(b": ping\n\n")
+                        client.last_write = time.monotonic()
+                        self._stats["heartbeats"] += 1
+
+    async def _read_request(self, reader):
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=10)
+        if len(head) > MAX_HEADER_BYTES:
+            raise ValueError("headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        return method, urlsplit(target), headers
+
+    async def _handle(self, reader, writer):
+        try:
+            method, url, headers = await self._read_request(reader)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+            writer.close()
+            return
+        city = (parse_qs(url.query).get("city") or [""])[0].strip()
+        reply = None
+        if method != "GET" or url.path != "/stream":
+            reply = _error("404 Not Found", "Unknown path")
+        elif not city:
+            reply = _error("400 Bad Request", "Missing city")
+        elif self.accept is not None and not self.accept(city):
+            reply = _error("404 Not Found", f"City {city!r} is not being polled")
+        elif self._stats["connections"] >= self.max_connections:
+            reply = _error("503 Service Unavailable", "Too many streams")
+        if reply is not None:
+            with self._lock:
+                self._stats["rejected"] += 1
+            writer.write(reply)
+            writer.close()
+            return
+
+        try:
+            last_seen = int(headers.get("last-event-id") or 0)
+        except ValueError:
+            last_seen = 0
+        client = _Client(city, writer)
+        with self._lock:
+            self._listeners.setdefault(city, set()).add(client)
+            s = self._stats
+            s["connections"] += 1
+            s["connects"] += 1
+            s["peak_connections"] = max(s["peak_connections"], s["connections"])
+            snapshot = sorted(v for (c, _), v in self._latest.items() if c == city and v[0] > last_seen)
+        try:
+            writer.write(RESPONSE_HEADERS + f"retry: {self.retry_ms}\n\n".encode()
+                         + b"".join(frame for _, _, frame in snapshot))
+            # SSE clients send nothing after the request; EOF means they are gone.
+            while await reader.read(1024):
+                pass
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            if client.flushing is not None:
+                client.flushing.cancel()
+            with self._lock:
+                self._listeners[city].discard(client)
+                if not self._listeners[city]:
+                    del self._listeners[city]
+                self._stats["connections"] -= 1
+            writer.close()
+
+    async def _serve(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._started.set()
+        heartbeats = asyncio.ensure_future(self._heartbeats())
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            heartbeats.cancel()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._serve())
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            logging.exception("Stream server stopped")
+        finally:
+            self._started.set()
+
+    # -- lifecycle -------------------------------------------------------------
+    def start(self):
+        if self._thread is None:
+            raise_fd_limit()
+            self._loop = asyncio.new_event_loop()
+            self._started.clear()
+            self._thread = threading.Thread(target=self._run, name="aqi-stream", daemon=True)
+            self._thread.start()
+            self._started.wait(10)
+            logging.info("AQI stream listening on %s:%d", self.host, self.port)
+        return self
+
+    def stop(self, timeout=5):
+        if self._thread is None:
+            return
+        loop = self._loop
+
+        def shutdown():
+            self._server.close()
+            for task in asyncio.all_tasks(loop):
+                task.cancel()
+        loop.call_soon_threadsafe(shutdown)
+        self._thread.join(timeout)
+        self._thread = None
+        self._loop = None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, cities=sum(1 for c in self._listeners.values() if c),
+                        latest_events=len(self._latest), port=self.port)
@@ -0,0 +1,304 @@
+"""Hourly per-station AQI readings with daily and monthly rollups.
+
+Readings live in ``aqi_readings`` keyed by (station, ts) with all six
+pollutants and ``us_aqi``, the US EPA AQI (0-500) computed from them. It is
+named apart from history_aqi.AQI, which holds OpenWeather's 1-5 index. A
+compaction job recomputes mean/max/p95 rollups for the days and months touched
+since its last run (tracked through ``inserted_at``), so chart queries over
+long ranges read a few hundred pre-aggregated rows instead of every hourly
+reading. Each run re-reads ``overlap`` seconds before its watermark, because
+``inserted_at`` is stamped when a row is written, not when its transaction
+commits: rows committed late would otherwise fall behind an advanced watermark
+and never be rolled up.
+
+Usage:
+    python timeseries.py compact [--full]
+"""
+import time
+import argparse
+from datetime import date, datetime, timedelta
+from collections import OrderedDict
+
+import numpy as np
+
+from aqi import POLLUTANTS, compute_aqi_array
+
+METRICS = ["us_aqi"] + POLLUTANTS
+STATS = ("mean", "max", "p95")
+# Seconds before the watermark each compaction re-reads; must exceed the
+# longest transaction writing aqi_readings.
+LATE_COMMIT_SECONDS = 300
+
+# Level -> (table, nominal bucket width in seconds), finest first
+LEVELS = OrderedDict([
+    ("hour", ("aqi_readings", 3600)),
+    ("day", ("aqi_rollup_daily", 86400)),
+    ("month", ("aqi_rollup_monthly", 2629746)),
+])
+RESOLUTIONS = {"hour": 3600, "day": 86400, "week": 7 * 86400, "month": 2629746, "year": 31556952}
+DEFAULT_MAX_POINTS = 1000
+
+# OpenWeather component names -> our pollutant columns (CO arrives in µg/m³, we store mg/m³)
+OPENWEATHER_COMPONENTS = {"PM2.5": ("pm2_5", 1.0), "PM10": ("pm10", 1.0), "NO2": ("no2", 1.0),
+                          "SO2": ("so2", 1.0), "CO": ("co", 1e-3), "Ozone": ("o3", 1.0)}
+
+
+def _col(name):
+    return f"`{name}`"
+
+
+def rollup_columns(metrics=METRICS):
+    return [f"{m}_{s}" for m in metrics for s in STATS]
+
+
+def _str(value):
+    # pymysql returns date/datetime objects, other drivers ISO strings
+    return str(value) if value is not None else None
+
+
+def from_openweather(components):
+    """Pollutant dict from an OpenWeather ``components`` payload."""
+    return {pol: (components[key] * scale if components.get(key) is not None else None)
+            for pol, (key, scale) in OPENWEATHER_COMPONENTS.items()}
+
+
+# -----------------------------------------------------------------------------
+# Writes
+# -----------------------------------------------------------------------------
+def insert_readings(conn, readings):
+    """Upsert readings: dicts with station, ts (datetime) and pollutant values.
+
+    A missing ``us_aqi`` is computed from whichever pollutants are present.
+    """
+    if not readings:
+        return 0
+    conc = np.array([[np.nan if r.get(p) is None else r[p] for p in POLLUTANTS] for r in readings], dtype=float)
+    _, individual = compute_aqi_array(np.nan_to_num(conc))
+    individual[np.isnan(conc)] = np.nan
+    has_any = ~np.isnan(conc).all(axis=1)
+    computed = np.full(len(readings), np.nan)
+    computed[has_any] = np.nanmax(individual[has_any], axis=1)
+    rows = []
+    for r, aqi_value, values in zip(readings, computed.tolist(), conc.tolist()):
+        aqi_value = r.get("us_aqi", aqi_value if aqi_value == aqi_value else None)
+        ts = r["ts"].replace(minute=0, second=0, microsecond=0)
+        rows.append([r["station"], ts.strftime("%Y-%m-%d %H:%M:%S"), aqi_value]
+                    + [None if v != v else v for v in values])
+    cols = ", ".join(["station", "ts"] + [_col(m) for m in METRICS])
+    with conn.cursor() as cursor:
+        cursor.executemany(
+            f"REPLACE INTO aqi_readings ({cols}) VALUES ({', '.join(['%s'] * (len(METRICS) + 2))})",
+            rows
+        )
+    return len(rows)
+
+
+# -----------------------------------------------------------------------------
+# Rollups
+# -----------------------------------------------------------------------------
+def rollup(ts, values, level):
+    """Aggregate readings of one station into ``level`` ("day" or "month") buckets.
+
+    ``ts`` is datetime64 (N,), ``values`` (N, M) with NaN for missing. Returns
+    (bucket dates (G,), row counts (G,), stats (G, M, 3) as mean/max/p95),
+    with p95 interpolated like ``np.nanpercentile``.
+    """
+    unit = "datetime64[D]" if level == "day" else "datetime64[M]"
+    bucket = ts.astype(unit).astype("datetime64[D]")
+    order = np.argsort(bucket, kind="stable")
+    bucket, vals = bucket[order], np.asarray(values, dtype=float)[order]
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    counts = np.diff(np.r_[starts, len(bucket)])
+    group = np.repeat(np.arange(len(starts)), counts)
+
+    valid = ~np.isnan(vals)
+    n_valid = np.add.reduceat(valid, starts, axis=0)
+    sums = np.add.reduceat(np.where(valid, vals, 0.0), starts, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sums / n_valid
+    mx = np.fmax.reduceat(vals, starts, axis=0)
+
+    p95 = np.full(mean.shape, np.nan)
+    for j in range(vals.shape[1]):
+        col = vals[:, j]
+        ranked = col[np.lexsort((col, group))]  # by group, then value, NaN last
+        has = n_valid[:, j] > 0
+        pos = (n_valid[has, j] - 1) * 0.95
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, n_valid[has, j] - 1)
+        frac = pos - lo
+        a, b = ranked[starts[has] + lo], ranked[starts[has] + hi]
+        p95[has, j] = a + (b - a) * frac
+
+    stats = np.stack([mean, mx, p95], axis=2)
+    return bucket[starts], counts, stats
+
+
+def _rollup_rows(station, ts, values, level):
+    buckets, counts, stats = rollup(ts, values, level)
+    flat = stats.reshape(len(buckets), -1)
+    return [[station, str(b), int(n)] + [None if v != v else v for v in row]
+            for b, n, row in zip(buckets, counts.tolist(), flat.tolist())]
+
+
+def _write_rollups(cursor, level, rows):
+    if not rows:
+        return
+    table = LEVELS[level][0]
+    cols = ", ".join(["station", "bucket", "n"] + [_col(c) for c in rollup_columns()])
+    cursor.executemany(
+        f"REPLACE INTO {table} ({cols}) VALUES ({', '.join(['%s'] * (len(rollup_columns()) + 3))})",
+        rows
+    )
+
+
+def _month_start(d):
+    return d.replace(day=1)
+
+
+def _next_month(d):
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def compact(conn, full=False, overlap=LATE_COMMIT_SECONDS):
+    """Recompute rollups for every (station, day/month) touched since the last
+    run, less ``overlap`` seconds (rebuilding a bucket twice is harmless).
+
+    Returns counts of rebuilt daily and monthly buckets.
+    """
+    t0 = time.perf_counter()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT watermark FROM aqi_rollup_state WHERE name='rollups'")
+        row = cursor.fetchone()
+        watermark = None if full or not row else row["watermark"]
+        cursor.execute("SELECT MAX(inserted_at) AS wm, CURRENT_TIMESTAMP AS now FROM aqi_readings")
+        row = cursor.fetchone()
+        # inserted_at has one-second resolution: only advance past a second that
+        # has fully elapsed, so rows still landing in it are seen next run.
+        new_watermark = row["wm"] if row["wm"] is not None and _str(row["wm"]) < _str(row["now"]) else watermark
+        if watermark is None:
+            cursor.execute("SELECT DISTINCT station, DATE(ts) AS day FROM aqi_readings")
+        else:
+            since = datetime.fromisoformat(_str(watermark)) - timedelta(seconds=overlap)
+            cursor.execute("SELECT DISTINCT station, DATE(ts) AS day FROM aqi_readings WHERE inserted_at>%s",
+                           (since.strftime("%Y-%m-%d %H:%M:%S"),))
+        dirty = {}
+        for r in cursor.fetchall():
+            dirty.setdefault(r["station"], set()).add(date.fromisoformat(_str(r["day"])[:10]))
+
+    cols = ", ".join(["ts"] + [_col(m) for m in METRICS])
+    n_days = n_months = 0
+    for station, days in dirty.items():
+        months = sorted({_month_start(d) for d in days})
+        with conn.cursor() as cursor:
+            # Whole months are re-read: monthly p95 needs every hourly value.
+            cursor.execute(
+                f"SELECT {cols} FROM aqi_readings WHERE station=%s AND ts>=%s AND ts<%s ORDER BY ts",
+                (station, f"{months[0]} 00:00:00", f"{_next_month(months[-1])} 00:00:00")
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                continue
+            ts = np.array([_str(r["ts"]).replace(" ", "T") for r in rows], dtype="datetime64[s]")
+            values = np.array([[np.nan if r[m] is None else float(r[m]) for m in METRICS] for r in rows])
+            day_of = ts.astype("datetime64[D]")
+            wanted = np.isin(day_of, np.array(sorted(days), dtype="datetime64[D]"))
+            month_of = ts.astype("datetime64[M]")
+            in_months = np.isin(month_of, np.array(months, dtype="datetime64[M]"))
+            daily = _rollup_rows(station, ts[wanted], values[wanted], "day")
+            monthly = _rollup_rows(station, ts[in_months], values[in_months], "month")
+            _write_rollups(cursor, "day", daily)
+            _write_rollups(cursor, "month", monthly)
+        conn.commit()
+        n_days += len(daily)
+        n_months += len(monthly)
+
+    if new_watermark is not None:
+        with conn.cursor() as cursor:
+            cursor.execute("REPLACE INTO aqi_rollup_state (name, watermark) VALUES ('rollups', %s)", (new_watermark,))
+        conn.commit()
+    return {"stations": len(dirty), "days": n_days, "months": n_months, "seconds": time.perf_counter() - t0}
+
+
+# -----------------------------------------------------------------------------
+# Reads
+# -----------------------------------------------------------------------------
+def choose_level(start, end, resolution="auto", max_points=DEFAULT_MAX_POINTS):
+    """Storage level for a query over [start, end] (inclusive dates).
+
+    An explicit resolution gets the coarsest level no wider than it (week ->
+    day, year -> month); "auto" gets the finest level that fits the range in
+    ``max_points`` buckets.
+    """
+    if resolution == "auto":
+        span = ((end - start).days + 1) * 86400
+        for level, (_, width) in LEVELS.items():
+            if span / width <= max_points:
+                return level
+        return "month"
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"'resolution' must be one of auto, {', '.join(RESOLUTIONS)}")
+    fitting = [level for level, (_, width) in LEVELS.items() if width <= RESOLUTIONS[resolution]]
+    return fitting[-1]
+
+
+def parse_series_query(args, max_points_limit=10000):
+    station = (args.get("station") or args.get("city") or "").strip()
+    if not station:
+        raise ValueError("'station' is required")
+    try:
+        end = date.fromisoformat(args["to"]) if args.get("to") else date.today()
+        start = date.fromisoformat(args["from"]) if args.get("from") else end - timedelta(days=30)
+    except ValueError:
+        raise ValueError("'from' and 'to' must be YYYY-MM-DD dates")
+    if start > end:
+        raise ValueError("'from' must not be after 'to'")
+    try:
+        max_points = int(args.get("max_points", DEFAULT_MAX_POINTS))
+    except ValueError:
+        raise ValueError("'max_points' must be an integer")
+    if not 1 <= max_points <= max_points_limit:
+        raise ValueError(f"'max_points' must be between 1 and {max_points_limit}")
+    metrics = tuple(m.strip() for m in args.get("metrics", "").split(",") if m.strip()) or tuple(METRICS)
+    unknown = [m for m in metrics if m not in METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+    level = choose_level(start, end, args.get("resolution", "auto"), max_points)
+    return (station, start, end, level, metrics)
+
+
+def fetch_series(conn, query):
+    """Rows for a parsed series query, oldest first."""
+    station, start, end, level, metrics = query
+    table = LEVELS[level][0]
+    if level == "hour":
+        cols = ["ts"] + list(metrics)
+        where = "ts>=%s AND ts<%s"
+        params = (station, f"{start} 00:00:00", f"{end + timedelta(days=1)} 00:00:00")
+    else:
+        cols = ["bucket", "n"] + rollup_columns(metrics)
+        where = "bucket>=%s AND bucket<=%s"
+        params = (station, str(_month_start(start) if level == "month" else start), str(end))
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {', '.join(_col(c) for c in cols)} FROM {table} WHERE station=%s AND {where} "
+            f"ORDER BY {cols[0]}",
+            params
+        )
+        rows = cursor.fetchall()
+    key = cols[0]
+    return [dict(r, **{key: _str(r[key])}) for r in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain AQI rollup tables.")
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument("--full", action="store_true", help="rebuild every rollup, ignoring the watermark")
+    args = parser.parse_args()
+    from db import get_db_connection
+    with get_db_connection() as conn:
+        print(compact(conn, full=args.full))
+
+
+if __name__ == "__main__":
+    main()
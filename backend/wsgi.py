@@ -0,0 +1,86 @@
+"""Production entry point: gunicorn workers forked from a master that loaded the models.
+
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+
+With ``preload_app`` (see gunicorn.conf.py) this module is imported once in
+the master. It loads every model artifact, runs one inference so lazily built
+state exists before the fork, and freezes the GC so collections in the workers
+do not write to (and un-share) the pages holding the model arrays. Workers
+then share that memory copy-on-write.
+
+The poller and the SSE stream server must run in exactly one process: every
+worker waits on an exclusive lock on one file (named by gunicorn.conf.py after
+the master's pid), and the holder starts them. When that worker exits the
+kernel releases the lock and a waiting worker takes over. The other workers
+serve /live-aqi through the OpenWeather cache and record new locations in the
+``stations`` table, which the polling worker reads every cycle. Notification
+workers start lazily in whichever worker enqueues.
+"""
+import os
+import gc
+import time
+import fcntl
+import logging
+import threading
+
+# The gunicorn hooks start background services per worker instead.
+os.environ["BACKGROUND_SERVICES"] = "0"
+
+import numpy as np  # noqa: E402
+
+import real_time_api as api  # noqa: E402
+from model_registry import ModelNotReady  # noqa: E402
+
+app = api.app
+
+MODEL_LOAD_TIMEOUT = float(os.getenv("MODEL_LOAD_TIMEOUT", 300))
+WARMUP_ROW = np.array([[60.0, 2.0, 28.0, 750.0]])  # RH, WS, Temp, BP
+
+
+def warm_up():
+    """One uncached ensemble inference; returns its duration in seconds."""
+    t0 = time.perf_counter()
+    api.format_predictions(api.run_ensemble(WARMUP_ROW))
+    return time.perf_counter() - t0
+
+
+def preload():
+    """Run in the master before forking workers (in each worker without preload_app)."""
+    if api.inference_client is not None:
+        # Connections must not be opened before the fork; workers connect on first use.
+        logging.info("Inference runs on %s; models are not loaded here", api.INFERENCE_SOCKET)
+    else:
+        api.models.start()
+        if not api.models.wait(MODEL_LOAD_TIMEOUT):
+            raise RuntimeError(f"Models failed to load: {api.models.status()}")
+        logging.info("Models loaded in %d; warm-up inference %.1f ms", os.getpid(), warm_up() * 1000)
+    gc.collect()
+    gc.freeze()
+
+
+def _run_services_when_elected(lock_path):
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+    fcntl.flock(fd, fcntl.LOCK_EX)  # held until this process exits
+    logging.info("Worker %d runs the poller and stream server", os.getpid())
+    api.start_background_services()
+
+
+def post_fork(lock_path):
+    """Run in each worker before it accepts requests."""
+    try:
+        logging.info("Worker %d warm-up inference %.1f ms", os.getpid(), warm_up() * 1000)
+    except ModelNotReady as e:  # the inference server may still be starting
+        logging.warning("Worker %d warm-up skipped: %s", os.getpid(), e)
+    threading.Thread(target=_run_services_when_elected, args=(lock_path,),
+                     name="services-election", daemon=True).start()
+
+
+def shutdown():
+    """Graceful worker exit: stop polling and streaming, flush queued notifications."""
+    api.stop_background_services(timeout=float(os.getenv("SHUTDOWN_TIMEOUT", 10)))
+    api.db_pool.close_all()
+    if api.inference_client is not None:
+        api.inference_client.close()
+
+
+preload()
@@ -79,16 +79,8 @@ export default function AlertNotifications() {
             date: new Date().toISOString(),
           };
           addAlert(alertRecord);
-          // Inside your useEffect, right after addAlert(alertRecord);
-          fetch(`${process.env.REACT_APP_API_URL}/notify`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(alertRecord),
-          })
-            .then(res => {
-              if (!res.ok) console.error('Notify endpoint error');
-            })
-            .catch(err => console.error('Error calling /notify:', err));
+          // Subscriber emails are sent by the backend alert engine once per
+          // threshold crossing, so tabs no longer call /notify themselves.
           // Update the last notification timestamp for this pollutant.
           lastNotifiedRef.current[normKey] = now;
         }
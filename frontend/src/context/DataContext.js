@@ -3,6 +3,16 @@ import React, { createContext, useState, useEffect } from 'react';
 
 export const DataContext = createContext();
 
+// If temperature data isn't available, simulate it.
+const withTemp = (items) =>
+  items.map((item) => ({
+    ...item,
+    temp:
+      item.temp !== undefined
+        ? item.temp
+        : Math.round(Math.random() * 15 + 20),
+  }));
+
 export const DataProvider = ({ children }) => {
   const [liveAqi, setLiveAqi] = useState(null);
   const [pollutants, setPollutants] = useState(null);
@@ -45,6 +55,7 @@ export const DataProvider = ({ children }) => {
   }, [alertHistory]);
 
   const API_URL = process.env.REACT_APP_API_URL || 'http://127.0.0.1:5000';
+  const STREAM_URL = process.env.REACT_APP_STREAM_URL || 'http://127.0.0.1:5001';
 
   // Fetch live AQI data & extract pollutants from the response
   useEffect(() => {
@@ -73,15 +84,7 @@ export const DataProvider = ({ children }) => {
       .then((response) => response.json())
       .then((data) => {
         if (!data.error) {
-          const updatedData = data.map((item) => ({
-            ...item,
-            // If temperature data isn't available, simulate it.
-            temp:
-              item.temp !== undefined
-                ? item.temp
-                : Math.round(Math.random() * 15 + 20),
-          }));
-          setForecastData(updatedData);
+          setForecastData(withTemp(data));
         } else {
           console.error('Forecast AQI error:', data.error);
         }
@@ -89,6 +92,25 @@ export const DataProvider = ({ children }) => {
       .catch((err) => console.error('Error fetching forecast-aqi:', err));
   }, [API_URL]);
 
+  // Subscribe to pushed live/forecast updates for the city once it is known.
+  // EventSource reconnects on its own and resumes from the last event id.
+  useEffect(() => {
+    if (!location.city || typeof EventSource === 'undefined') return undefined;
+    const source = new EventSource(
+      `${STREAM_URL}/stream?city=${encodeURIComponent(location.city)}`
+    );
+    source.addEventListener('live', (event) => {
+      const data = JSON.parse(event.data);
+      setLiveAqi(data);
+      setPollutants(data.pollutants);
+    });
+    source.addEventListener('forecast', (event) => {
+      setForecastData(withTemp(JSON.parse(event.data)));
+    });
+    source.onerror = () => console.warn('AQI stream interrupted; reconnecting');
+    return () => source.close();
+  }, [STREAM_URL, location.city]);
+
   // Fetch historical AQI data
   useEffect(() => {
     fetch(`${API_URL}/history-aqi`)